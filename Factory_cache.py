@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+"""
+Factory Cache - Bounded LRU result cache shared by the Factory Prompts nodes
+Results are keyed by a canonical form of the node inputs plus the tag catalog version,
+and hit/miss counters are kept per node so caching can be verified in production
+"""
+
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_SIZE = 1024
+
+_MISS = object()
+
+
+def input_key(node_name, version, inputs):
+    """Canonical, hashable key for a node's inputs (order of the inputs does not matter)"""
+    return (node_name, version, frozenset(inputs.items()))
+
+
+def input_hash(node_name, version, inputs):
+    """Stable hex digest of a node's inputs, used as the IS_CHANGED value"""
+    canonical = repr((node_name, version, sorted(inputs.items())))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Thread-safe LRU mapping with hit/miss counters"""
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.node_counters = {}
+
+    def get(self, key, default=None, counter=None):
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                if counter is not None:
+                    self.node_counters.setdefault(counter, [0, 0])[1] += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if counter is not None:
+                self.node_counters.setdefault(counter, [0, 0])[0] += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.node_counters.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "nodes": {name: {"hits": hits, "misses": misses}
+                          for name, (hits, misses) in self.node_counters.items()},
+            }
+
+
+RESULT_CACHE = ResultCache()
+
+
+def get_cache_stats():
+    """Hit/miss counters of the shared node result cache"""
+    return RESULT_CACHE.stats()
+
+
+def connected_outputs(prompt, unique_id):
+    """
+    Output indices of node unique_id that some node of the workflow reads, taken from
+    ComfyUI's hidden PROMPT input; None when that is unknown (every output is needed).
+    """
+    if not isinstance(prompt, dict) or unique_id is None:
+        return None
+    unique_id = str(unique_id)
+    outputs = set()
+    for node in prompt.values():
+        inputs = node.get("inputs") if isinstance(node, dict) else None
+        if not isinstance(inputs, dict):
+            continue
+        for value in inputs.values():
+            if isinstance(value, list) and len(value) == 2 and str(value[0]) == unique_id:
+                outputs.add(value[1])
+    return frozenset(outputs)
+
+
+def cached_result(version=None, outputs=False):
+    """
+    Decorator for a node's FUNCTION method: identical keyword inputs (and catalog version,
+    if version() is given) return the stored result instead of recomputing it.
+    Results must be immutable, since they are shared between callers.
+    With outputs=True the hidden PROMPT/UNIQUE_ID inputs ("prompt", "unique_id") are
+    replaced by outputs=frozenset of the connected output indices (None if unknown).
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            node_name = type(self).__name__
+            if outputs and ("prompt" in kwargs or "unique_id" in kwargs):
+                kwargs["outputs"] = connected_outputs(kwargs.pop("prompt", None), kwargs.pop("unique_id", None))
+            try:
+                key = (input_key(node_name, version() if version else "", kwargs), args)
+                hash(key)
+            except TypeError:
+                # Unhashable input (e.g. a list from another node): compute without caching
+                return method(self, *args, **kwargs)
+            result = RESULT_CACHE.get(key, _MISS, node_name)
+            if result is _MISS:
+                result = method(self, *args, **kwargs)
+                RESULT_CACHE.put(key, result)
+            return result
+        return wrapper
+    return decorate
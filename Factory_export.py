@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+
+"""
+Factory Prompt Export - Stream generated prompts to JSONL/CSV for dataset builds
+Lazily yields (seed, positive, negative, selection record) rows with bounded memory
+Rows are a pure function of their seed, so an export can resume from any seed offset
+
+Usage:
+    python Factory_export.py --count 1000000 --output prompts.jsonl
+    python Factory_export.py --count 1000000 --output prompts.jsonl --resume
+    python Factory_export.py --count 10000000 --output prompts.jsonl --workers 32
+    python Factory_export.py --count 1000000 --output prompts.jsonl --unique
+    python Factory_export.py --count 500 --set source_style=realistic --set lighting=golden_hour -o out.csv
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from .Factory_negative_generator import FactoryPromptsNegativeGenerator
+    from .Factory_prompt_generator import FactoryPromptsPositiveNode
+    from .Factory_prompt_space import PromptSpace
+    from .Factory_random import prompt_seed
+    from .Factory_tag_catalog import get_catalog, install_catalog
+except ImportError:
+    from Factory_negative_generator import FactoryPromptsNegativeGenerator
+    from Factory_prompt_generator import FactoryPromptsPositiveNode
+    from Factory_prompt_space import PromptSpace
+    from Factory_random import prompt_seed
+    from Factory_tag_catalog import get_catalog, install_catalog
+
+DEFAULT_CHUNK_SIZE = 256
+DEFAULT_SHARD_SIZE = 10000
+CSV_FIELDS = ("seed", "positive", "negative", "selections")
+
+
+def default_inputs(input_types):
+    """Widget defaults of an INPUT_TYPES structure as a plain kwargs dict"""
+    inputs = {}
+    for section in ("required", "optional"):
+        for name, spec in input_types.get(section, {}).items():
+            if len(spec) > 1 and "default" in spec[1]:
+                inputs[name] = spec[1]["default"]
+    return inputs
+
+
+def negative_builder(negative):
+    """
+    Function PromptSpec -> negative prompt for export negative settings: build_negative_prompt
+    kwargs, plus "selection_aware": True to drop terms each prompt's selections contradict.
+    """
+    if negative is None:
+        return lambda spec: ""
+    settings = dict(negative)
+    generator = FactoryPromptsNegativeGenerator()
+    if settings.pop("selection_aware", False):
+        return lambda spec: generator.build_negative_prompt(prompt_spec=spec, **settings)
+    # Negatives do not depend on the prompt, so build the string once
+    negative_prompt = generator.build_negative_prompt(**settings)
+    return lambda spec: negative_prompt
+
+
+def iter_prompts(start_seed=0, count=None, params=None, negative=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield (seed, positive, negative, record) for seeds start_seed, start_seed + 1, ...
+
+    Args:
+        start_seed: Seed of the first row; row i uses start_seed + i
+        count: Number of rows, or None for an endless stream
+        params: Positive node inputs overriding the widget defaults
+        negative: Negative settings (see negative_builder), or None for no negative
+        chunk_size: Prompts generated per batch call; bounds memory use
+    """
+    node = FactoryPromptsPositiveNode()
+    inputs = default_inputs(FactoryPromptsPositiveNode.INPUT_TYPES())
+    inputs.update(params or {})
+    inputs.pop("seed", None)
+
+    negative_for = negative_builder(negative)
+
+    produced = 0
+    while count is None or produced < count:
+        size = chunk_size if count is None else min(chunk_size, count - produced)
+        chunk_seed = prompt_seed(start_seed, produced)
+        prompts, summaries, specs = node.generate_batch(seed=chunk_seed, batch_size=size, **inputs)
+        for i, (positive, summary, spec) in enumerate(zip(prompts, summaries, specs)):
+            seed = prompt_seed(chunk_seed, i)
+            record = {"seed": seed, "selections": summary.split("\n")}
+            yield seed, positive, negative_for(spec), record
+        produced += size
+
+
+def iter_unique_prompts(key=0, count=None, params=None, negative=None, start=0):
+    """
+    Yield (index, positive, negative, record) for distinct prompts, in the order of the
+    prompt space permutation selected by key, beginning at permutation position start.
+    Stops early if the inputs cannot produce count distinct prompts.
+    """
+    inputs = default_inputs(FactoryPromptsPositiveNode.INPUT_TYPES())
+    inputs.update(params or {})
+    space = PromptSpace(**inputs)
+
+    negative_for = negative_builder(negative)
+
+    for index, spec in space.sample_unique_specs(count, key, start):
+        yield index, spec.render(), negative_for(spec), {"index": index, "selections": spec.summary().split("\n")}
+
+
+def count_existing_rows(path, fmt, truncate=False):
+    """
+    Complete rows already written to an export file (for --resume). A row cut short by
+    an interrupted write is not counted; with truncate it is removed from the file, so
+    appended rows start on a fresh line.
+    """
+    if not os.path.exists(path):
+        return 0
+    rows = 0
+    end = 0
+    in_quotes = False
+    with open(path, 'rb') as f:
+        offset = 0
+        for line in f:
+            offset += len(line)
+            if fmt == "csv":
+                # A quoted field may hold newlines: the record ends at a newline outside quotes
+                in_quotes ^= line.count(b'"') % 2 == 1
+                if in_quotes:
+                    continue
+            if not line.endswith(b"\n"):
+                break
+            end = offset
+            if line.strip():
+                rows += 1
+    if truncate and end < offset:
+        print(f"Dropping an incomplete last row from {path}", file=sys.stderr)
+        os.truncate(path, end)
+    return max(0, rows - 1) if fmt == "csv" else rows
+
+
+def write_rows(rows, f, fmt, write_header=True):
+    """Stream rows to an open text file as JSONL or CSV; returns the number written"""
+    written = 0
+    if fmt == "csv":
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(CSV_FIELDS)
+        for seed, positive, negative, record in rows:
+            writer.writerow((seed, positive, negative, "\n".join(record["selections"])))
+            written += 1
+    else:
+        for seed, positive, negative, record in rows:
+            row = {"seed": seed, "positive": positive, "negative": negative, "selections": record["selections"]}
+            f.write(json.dumps(row, ensure_ascii=False))
+            f.write("\n")
+            written += 1
+    return written
+
+
+def _init_worker(catalog):
+    # Runs once per worker process: reuse the parent's parsed catalog instead of re-reading the JSON
+    install_catalog(catalog)
+
+
+def _export_shard(shard):
+    """Worker task: render one shard of rows to JSONL/CSV text"""
+    start_seed, count, params, negative, chunk_size, fmt = shard
+    buffer = io.StringIO()
+    write_rows(iter_prompts(start_seed, count, params, negative, chunk_size), buffer, fmt, write_header=False)
+    return buffer.getvalue()
+
+
+def bulk_export(f, start_seed, count, params=None, negative=None, fmt="jsonl", workers=None,
+                shard_size=DEFAULT_SHARD_SIZE, chunk_size=DEFAULT_CHUNK_SIZE, write_header=True):
+    """
+    Generate count rows across a process pool and write them to f in seed order.
+    Shard k covers seeds start_seed + k * shard_size onwards, so the output is identical to a
+    single-process export. At most two shards per worker are in flight, bounding memory.
+    Returns the number of rows written.
+    """
+    workers = workers or os.cpu_count() or 1
+    if fmt == "csv" and write_header:
+        csv.writer(f).writerow(CSV_FIELDS)
+
+    shards = (
+        (prompt_seed(start_seed, offset), min(shard_size, count - offset), params, negative, chunk_size, fmt)
+        for offset in range(0, count, shard_size)
+    )
+    written = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(get_catalog(),)) as pool:
+        pending = deque()
+        for shard in shards:
+            pending.append((shard[1], pool.submit(_export_shard, shard)))
+            if len(pending) >= workers * 2:
+                size, future = pending.popleft()
+                f.write(future.result())
+                written += size
+        while pending:
+            size, future = pending.popleft()
+            f.write(future.result())
+            written += size
+    return written
+
+
+def parse_assignments(assignments):
+    """--set name=value pairs -> dict, converting ints and booleans"""
+    params = {}
+    for assignment in assignments or ():
+        name, _, value = assignment.partition("=")
+        if value.lower() in ("true", "false"):
+            params[name] = value.lower() == "true"
+        else:
+            try:
+                params[name] = int(value)
+            except ValueError:
+                params[name] = value
+    return params
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Stream Factory Prompts to JSONL or CSV")
+    parser.add_argument("-o", "--output", default="-", help="output file, or - for stdout")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="defaults to the output extension, else jsonl")
+    parser.add_argument("--start-seed", type=int, default=0)
+    parser.add_argument("--count", type=int, required=True)
+    parser.add_argument("--set", action="append", dest="params", metavar="NAME=VALUE",
+                        help="positive node input, e.g. --set source_style=realistic")
+    parser.add_argument("--negative-preset", default="standard",
+                        help="negative preset, or 'none' to leave negatives empty")
+    parser.add_argument("--selection-aware-negatives", action="store_true",
+                        help="drop negative terms that contradict each prompt's selections")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes; 0 uses every CPU core")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE,
+                        help="rows per worker task when --workers is not 1")
+    parser.add_argument("--unique", action="store_true",
+                        help="emit distinct prompts only; --start-seed selects the order and the seed column holds the prompt index")
+    parser.add_argument("--resume", action="store_true",
+                        help="append to output, continuing after the rows it already holds")
+    return parser
+
+
+def main(argv=None):
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.unique and args.workers != 1:
+        parser.error("--unique runs in a single process; drop --workers")
+    fmt = args.format or ("csv" if args.output.endswith(".csv") else "jsonl")
+    negative = None if args.negative_preset == "none" else {"preset": args.negative_preset}
+    if negative is not None and args.selection_aware_negatives:
+        negative["selection_aware"] = True
+
+    done = count_existing_rows(args.output, fmt, truncate=True) if args.resume and args.output != "-" else 0
+    remaining = max(0, args.count - done)
+    first_seed = prompt_seed(args.start_seed, done)
+    params = parse_assignments(args.params)
+
+    def export(f, write_header):
+        if args.unique:
+            rows = iter_unique_prompts(args.start_seed, remaining, params, negative, start=done)
+            return write_rows(rows, f, fmt, write_header)
+        if args.workers == 1:
+            rows = iter_prompts(first_seed, remaining, params, negative, args.chunk_size)
+            return write_rows(rows, f, fmt, write_header)
+        return bulk_export(f, first_seed, remaining, params, negative, fmt, args.workers or None,
+                           args.shard_size, args.chunk_size, write_header)
+
+    if args.output == "-":
+        written = export(sys.stdout, True)
+    else:
+        with open(args.output, 'a' if done else 'w', encoding='utf-8', newline='') as f:
+            written = export(f, not done)
+    print(f"Wrote {written} rows ({done} already present)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+"""
+Factory Metrics - Optional per-stage timing for the Factory Prompts nodes
+Records time spent in catalog access, parameter dispatch, sampling, emphasis rendering,
+summary building and joining, plus call counts and the result cache hit rates.
+
+Off by default. Enable it with the FACTORY_PROMPTS_METRICS=1 environment variable or
+enable_metrics(); while it is off, instrumented code only tests METRICS.enabled.
+Set FACTORY_PROMPTS_METRICS_FILE to also keep a Prometheus text file up to date
+(e.g. for the node_exporter textfile collector); a background thread rewrites it every
+DUMP_INTERVAL seconds and once more at exit, so node calls never wait on the file.
+"""
+
+import atexit
+import os
+import sys
+import threading
+import time
+from time import perf_counter_ns
+
+try:
+    from .Factory_cache import get_cache_stats
+except ImportError:
+    from Factory_cache import get_cache_stats
+
+STAGES = ("catalog", "dispatch", "sampling", "emphasis", "summary", "join")
+
+# Seconds between background rewrites of the Prometheus text file
+DUMP_INTERVAL = 10.0
+
+
+def _env_flag(name):
+    return os.environ.get(name, "").strip().lower() not in ("", "0", "false", "no", "off")
+
+
+class StageMetrics:
+    """Thread-safe per-node, per-stage timing counters"""
+
+    def __init__(self, enabled=False, dump_path=None):
+        self.enabled = enabled
+        self.dump_path = dump_path
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._calls = {}
+        self._dumper = None
+
+    def start(self, node):
+        """Count a call of node and return a start timestamp, or 0 when metrics are off"""
+        if not self.enabled:
+            return 0
+        with self._lock:
+            self._calls[node] = self._calls.get(node, 0) + 1
+        return perf_counter_ns()
+
+    def lap(self, node, stage, since):
+        """Record the time since `since` against stage; returns the start of the next stage"""
+        elapsed = perf_counter_ns() - since
+        with self._lock:
+            entry = self._stages.get((node, stage))
+            if entry is None:
+                self._stages[(node, stage)] = [1, elapsed, elapsed]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed
+                if elapsed > entry[2]:
+                    entry[2] = elapsed
+        # Bookkeeping is not charged to the next stage
+        return perf_counter_ns()
+
+    def start_dumper(self):
+        """Start the background thread that keeps dump_path up to date (idempotent)"""
+        with self._lock:
+            if self._dumper is not None or not self.dump_path:
+                return
+            self._dumper = threading.Thread(target=self._dump_loop, name="factory-prompts-metrics", daemon=True)
+        self._dumper.start()
+        atexit.register(self.dump)
+
+    def _dump_loop(self):
+        while True:
+            time.sleep(DUMP_INTERVAL)
+            self.dump()
+
+    def dump(self):
+        """Write the Prometheus text file now, if metrics are on and a path is set"""
+        if self.enabled and self.dump_path:
+            write_prometheus(self.dump_path)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._calls.clear()
+
+    def snapshot(self):
+        """{node: {"calls": n, "stages": {stage: {count, total_seconds, mean_seconds, max_seconds}}}}"""
+        with self._lock:
+            calls = dict(self._calls)
+            stages = {key: tuple(entry) for key, entry in self._stages.items()}
+        nodes = {node: {"calls": count, "stages": {}} for node, count in calls.items()}
+        for (node, stage), (count, total, peak) in stages.items():
+            nodes.setdefault(node, {"calls": 0, "stages": {}})["stages"][stage] = {
+                "count": count,
+                "total_seconds": total / 1e9,
+                "mean_seconds": total / count / 1e9,
+                "max_seconds": peak / 1e9,
+            }
+        return nodes
+
+
+METRICS = StageMetrics(_env_flag("FACTORY_PROMPTS_METRICS"), os.environ.get("FACTORY_PROMPTS_METRICS_FILE") or None)
+
+
+def enable_metrics(enabled=True, dump_path=None):
+    """Turn stage timing on or off; dump_path keeps a Prometheus text file updated"""
+    METRICS.enabled = enabled
+    if dump_path is not None:
+        METRICS.dump_path = dump_path
+    if enabled:
+        METRICS.start_dumper()
+
+
+def get_stats():
+    """Stage timings, call counts and result cache counters as a plain dict"""
+    return {"enabled": METRICS.enabled, "nodes": METRICS.snapshot(), "cache": get_cache_stats()}
+
+
+if METRICS.enabled:
+    METRICS.start_dumper()
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(stats=None):
+    """Render get_stats() in the Prometheus text exposition format"""
+    stats = stats or get_stats()
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{_label(item)}"' for key, item in labels)
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+    nodes = stats["nodes"]
+    stage_rows = [(node, stage, values) for node, info in sorted(nodes.items())
+                  for stage, values in sorted(info["stages"].items())]
+    metric("factory_prompts_calls_total", "counter", "Node function executions (cache misses).",
+           [((("node", node),), info["calls"]) for node, info in sorted(nodes.items())])
+    metric("factory_prompts_stage_seconds_total", "counter", "Time spent per generation stage.",
+           [((("node", node), ("stage", stage)), values["total_seconds"]) for node, stage, values in stage_rows])
+    metric("factory_prompts_stage_runs_total", "counter", "Times each generation stage ran.",
+           [((("node", node), ("stage", stage)), values["count"]) for node, stage, values in stage_rows])
+    metric("factory_prompts_stage_max_seconds", "gauge", "Slowest single run of each generation stage.",
+           [((("node", node), ("stage", stage)), values["max_seconds"]) for node, stage, values in stage_rows])
+
+    cache = stats["cache"]
+    cache_nodes = sorted(cache["nodes"].items())
+    metric("factory_prompts_cache_hits_total", "counter", "Result cache hits.",
+           [((("node", node),), counts["hits"]) for node, counts in cache_nodes])
+    metric("factory_prompts_cache_misses_total", "counter", "Result cache misses.",
+           [((("node", node),), counts["misses"]) for node, counts in cache_nodes])
+    metric("factory_prompts_cache_hit_ratio", "gauge", "Result cache hit rate over all nodes.",
+           [((), cache["hit_rate"])])
+    metric("factory_prompts_cache_entries", "gauge", "Results currently held in the cache.",
+           [((), cache["size"])])
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    """Atomically write prometheus_text() to path"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(prometheus_text())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error writing metrics file: {e}", file=sys.stderr)
@@ -1,6 +1,406 @@
-import random
+import sys
 from typing import List, Dict, Any
 
+try:
+    from .Factory_cache import cached_result, input_hash
+    from .Factory_metrics import METRICS
+    from .Factory_prompt_ast import BOOST_WEIGHT, WEIGHT_SYNTAXES, WEIGHTED_VARIANTS, Term, parse_terms
+    from .Factory_prompt_spec import PROMPT_SPEC_TYPE
+    from .Factory_tag_catalog import get_catalog
+    from .Factory_tokens import CHUNK_TOKENS, TokenCounts, budget_summary, fit_parts
+except ImportError:
+    from Factory_cache import cached_result, input_hash
+    from Factory_metrics import METRICS
+    from Factory_prompt_ast import BOOST_WEIGHT, WEIGHT_SYNTAXES, WEIGHTED_VARIANTS, Term, parse_terms
+    from Factory_prompt_spec import PROMPT_SPEC_TYPE
+    from Factory_tag_catalog import get_catalog
+    from Factory_tokens import CHUNK_TOKENS, TokenCounts, budget_summary, fit_parts
+
+
+# Base quality negatives - always included
+BASE_QUALITY = (
+    "lowres", "bad_anatomy", "bad_hands", "text", "error",
+    "missing_fingers", "extra_digit", "fewer_digits", "cropped",
+    "worst_quality", "low_quality", "normal_quality",
+    "jpeg_artifacts", "signature", "watermark", "username", "blurry"
+)
+
+# Enhanced quality negatives for higher standards
+ENHANCED_QUALITY = (
+    "bad_proportions", "bad_perspective", "bad_shading",
+    "bad_composition", "bad_lighting", "overexposed", "underexposed",
+    "noise", "grainy", "pixelated", "compression_artifacts",
+    "aliasing", "distorted", "deformed", "malformed"
+)
+
+# Anatomy and body negatives
+ANATOMY_NEGATIVES = (
+    "bad_anatomy", "bad_hands", "bad_feet", "bad_face",
+    "missing_fingers", "extra_digit", "fewer_digits", "extra_fingers",
+    "mutated_hands", "poorly_drawn_hands", "poorly_drawn_face",
+    "mutation", "deformed", "ugly", "blurry_face", "disfigured",
+    "extra_limbs", "missing_limbs", "extra_arms", "missing_arms",
+    "extra_legs", "missing_legs", "fused_fingers", "too_many_fingers",
+    "long_neck", "duplicate", "morbid", "mutilated", "extra_head",
+    "poorly_drawn_eyes", "bad_eyes", "crossed_eyes", "extra_tongue",
+    "multiple_tongues", "deformed_tongue", "elongated_tongue"
+)
+
+# Non-realistic style control negatives
+NON_REALISTIC_STYLE_CONTROL = (
+    "source_cartoon", "source_furry", "source_pony", "western_comic",
+    "cartoon", "disney", "pixar", "anime_style", "manga_style",
+    "chibi", "cel_shading", "flat_colors", "simplified_art"
+)
+
+# Realistic style control negatives
+REALISTIC_STYLE_CONTROL = (
+    "3d", "realistic", "photorealistic", "photo", "photography",
+    "real_person", "live_action", "cgi", "render", "blender",
+    "unreal_engine", "ray_tracing", "hyperrealistic", "lifelike"
+)
+
+# Art medium negatives
+UNWANTED_MEDIUMS = (
+    "sketch", "pencil_sketch", "rough_sketch", "draft",
+    "unfinished", "incomplete", "work_in_progress", "wip",
+    "traditional_media", "pencil_drawing", "charcoal",
+    "crayon", "chalk", "pastel", "watercolor_paper",
+    "canvas_texture", "paper_texture", "scan_artifacts"
+)
+
+# Color and saturation control
+COLOR_NEGATIVES = (
+    "monochrome", "grayscale", "greyscale", "black_and_white",
+    "sepia", "desaturated", "oversaturated", "color_bleeding",
+    "bad_colors", "ugly_colors", "neon_colors", "garish",
+    "overexposed_colors", "washed_out", "faded_colors"
+)
+
+# Composition and framing negatives
+COMPOSITION_NEGATIVES = (
+    "bad_composition", "bad_framing", "cut_off", "cropped_head",
+    "cropped_body", "out_of_frame", "off_center", "unbalanced",
+    "awkward_pose", "stiff_pose", "unnatural_pose", "forced_smile",
+    "bad_perspective", "wrong_perspective", "floating"
+)
+
+# Background and environment negatives
+BACKGROUND_NEGATIVES = (
+    "cluttered_background", "busy_background", "distracting_background",
+    "bad_background", "messy_background", "noisy_background",
+    "artifacts_in_background", "floating_objects", "inconsistent_lighting",
+    "multiple_light_sources", "confusing_background"
+)
+
+# Text and UI element negatives
+TEXT_NEGATIVES = (
+    "text", "words", "letters", "numbers", "symbols",
+    "watermark", "signature", "artist_name", "copyright",
+    "logo", "brand", "website", "url", "username",
+    "speech_bubble", "thought_bubble", "text_bubble",
+    "caption", "subtitle", "overlay_text", "ui_elements"
+)
+
+# Clothing and fashion negatives
+CLOTHING_NEGATIVES = (
+    "bad_clothing", "poorly_drawn_clothes", "floating_clothes",
+    "clipping_clothes", "transparent_clothes", "see_through_clothes",
+    "torn_clothes", "damaged_clothes", "wrinkled_clothes",
+    "ill_fitting_clothes", "oversized_clothes", "undersized_clothes"
+)
+
+# Expression and emotion negatives
+EXPRESSION_NEGATIVES = (
+    "dead_eyes", "empty_eyes", "soulless_eyes", "scary_eyes",
+    "angry_expression", "sad_expression", "depressed_expression",
+    "forced_expression", "unnatural_expression", "blank_expression",
+    "emotionless", "creepy_smile", "evil_smile"
+)
+
+# Hair negatives
+HAIR_NEGATIVES = (
+    "bad_hair", "poorly_drawn_hair", "floating_hair", "messy_hair",
+    "tangled_hair", "unrealistic_hair", "bad_hair_physics",
+    "clipping_hair", "hair_artifacts", "inconsistent_hair_color"
+)
+
+# NSFW content filters (for SFW generations)
+NSFW_FILTERS = (
+    "nsfw", "explicit", "nude", "naked", "topless", "bottomless",
+    "underwear", "lingerie", "bikini", "swimsuit", "revealing_clothes",
+    "cleavage", "exposed_skin", "suggestive", "provocative",
+    "sexual", "erotic", "adult_content", "mature_content"
+)
+
+# Violence and disturbing content filters
+VIOLENCE_FILTERS = (
+    "violence", "blood", "gore", "death", "killing", "murder",
+    "torture", "pain", "suffering", "injury", "wound", "scar",
+    "bruise", "cut", "bleeding", "dark_themes", "disturbing",
+    "nightmare", "horror", "scary", "frightening"
+)
+
+# Technical artifact negatives
+TECHNICAL_NEGATIVES = (
+    "compression_artifacts", "jpeg_artifacts", "aliasing", "moire",
+    "banding", "posterization", "color_banding", "pixelation",
+    "blur_artifacts", "sharpening_artifacts", "noise_artifacts",
+    "upscaling_artifacts", "interpolation_artifacts"
+)
+
+
+# Category name -> terms, in canonical render order (a term renders at its first category)
+CATEGORY_TERMS = {
+    "base_quality": BASE_QUALITY,
+    "enhanced_quality": ENHANCED_QUALITY,
+    "anatomy": ANATOMY_NEGATIVES,
+    "composition": COMPOSITION_NEGATIVES,
+    "background": BACKGROUND_NEGATIVES,
+    "text_elements": TEXT_NEGATIVES,
+    "clothing": CLOTHING_NEGATIVES,
+    "expressions": EXPRESSION_NEGATIVES,
+    "hair": HAIR_NEGATIVES,
+    "unwanted_mediums": UNWANTED_MEDIUMS,
+    "technical": TECHNICAL_NEGATIVES,
+    "color_control": COLOR_NEGATIVES,
+    "non_realistic_style_control": NON_REALISTIC_STYLE_CONTROL,
+    "realistic_style_control": REALISTIC_STYLE_CONTROL,
+    "nsfw_filters": NSFW_FILTERS,
+    "violence_filters": VIOLENCE_FILTERS,
+}
+
+# Categories added on top of the base quality negatives by each preset
+PRESET_CATEGORIES = {
+    "minimal": (),
+    "standard": ("enhanced_quality", "anatomy", "composition", "text_elements"),
+    "comprehensive": ("enhanced_quality", "anatomy", "composition", "background",
+                      "text_elements", "clothing", "hair", "technical"),
+    "professional": ("enhanced_quality", "anatomy", "composition", "background",
+                     "text_elements", "clothing", "expressions", "hair",
+                     "unwanted_mediums", "technical"),
+    "anime_focused": ("enhanced_quality", "anatomy", "non_realistic_style_control", "composition",
+                      "text_elements", "unwanted_mediums"),
+}
+
+# Terms emphasized by strength_boost (weighted BOOST_WEIGHT)
+CRITICAL_TERMS = ("bad_anatomy", "bad_hands", "bad_face", "worst_quality", "low_quality")
+
+# Weight syntax of the negative nodes unless chosen otherwise: (term:1.2)
+NEGATIVE_SYNTAX = "a1111"
+
+# Catalog section declaring the negative terms a selected positive tag contradicts:
+#     "_conflicts": {"tags": {"neon_light": ["neon_colors"], ...},
+#                    "categories": {"multi_character_positions.group_character.social": ["busy_background"], ...}}
+# "categories" applies to every tag of a category (dotted key path); a tag always contradicts
+# the term it equals (messy_hair -> messy_hair)
+CONFLICTS_KEY = "_conflicts"
+
+
+class NegativeTermTable:
+    """
+    Compiled negative vocabulary shared by all negative nodes.
+    Every unique term owns one bit; categories and presets are precomputed bitmasks,
+    so composing a prompt is a bitwise OR and dedup is free. Rendering walks the set
+    bits in canonical order, using boosted variants pre-rendered per weight syntax.
+    """
+
+    RENDER_CACHE_SIZE = 4096
+
+    def __init__(self, category_terms, preset_categories, critical_terms):
+        self.terms = []
+        self.index = {}
+        self.category_masks = {}
+        for category, terms in category_terms.items():
+            mask = 0
+            for term in terms:
+                bit = self.index.get(term)
+                if bit is None:
+                    bit = len(self.terms)
+                    self.index[term] = bit
+                    self.terms.append(term)
+                mask |= 1 << bit
+            self.category_masks[category] = mask
+        self.terms = tuple(self.terms)
+
+        base = self.category_masks["base_quality"]
+        self.preset_masks = {preset: base | self.mask(categories)
+                             for preset, categories in preset_categories.items()}
+
+        self.critical = frozenset(critical_terms)
+        self.boost_weights = tuple(BOOST_WEIGHT if term in self.critical else 1.0 for term in self.terms)
+        self._boosted = {}
+        self._rendered = {}
+        self._token_counts = None
+
+    def variants(self, strength_boost=False, syntax=NEGATIVE_SYNTAX):
+        """Every term as written in the prompt, indexed by bit"""
+        if not strength_boost:
+            return self.terms
+        variants = self._boosted.get(syntax)
+        if variants is None:
+            boosted = WEIGHTED_VARIANTS[syntax, BOOST_WEIGHT]
+            variants = tuple(boosted[term] if term in self.critical else term for term in self.terms)
+            self._boosted[syntax] = variants
+        return variants
+
+    def nodes(self, mask, strength_boost=False):
+        """The terms of mask as prompt AST Terms, in canonical order"""
+        nodes = []
+        remaining = mask
+        while remaining:
+            low = remaining & -remaining
+            bit = low.bit_length() - 1
+            nodes.append(Term(self.terms[bit], self.boost_weights[bit] if strength_boost else 1.0))
+            remaining ^= low
+        return nodes
+
+    def mask(self, categories):
+        """OR of the bitmasks of the named categories (unknown names are ignored)"""
+        mask = 0
+        category_masks = self.category_masks
+        for category in categories:
+            mask |= category_masks.get(category, 0)
+        return mask
+
+    def compile_conflicts(self, catalog):
+        """Inverted index for one catalog snapshot: positive tag -> mask of the negative terms it contradicts"""
+        conflicts = {term: 1 << bit for bit, term in enumerate(self.terms)}
+        section = catalog.section(CONFLICTS_KEY)
+        section = section if isinstance(section, dict) else {}
+
+        def add(tags, terms, source):
+            mask = 0
+            for term in terms:
+                bit = self.index.get(term)
+                if bit is None:
+                    print(f"Ignoring conflict {source} -> '{term}': not a negative term", file=sys.stderr)
+                else:
+                    mask |= 1 << bit
+            for tag in tags:
+                conflicts[tag] = conflicts.get(tag, 0) | mask
+
+        for tag, terms in (section.get("tags") or {}).items():
+            add((tag,), terms, tag)
+        for path, terms in (section.get("categories") or {}).items():
+            tags = catalog.category(tuple(path.split(".")))
+            if not tags:
+                print(f"Conflicts name category '{path}', which holds no tags", file=sys.stderr)
+            add(tags, terms, path)
+        return conflicts
+
+    def selection_conflicts(self, tags, catalog=None):
+        """
+        Mask of the terms contradicted by any of the selected positive tags, per the
+        catalog they were drawn from (the shared catalog by default)
+        """
+        if catalog is None:
+            catalog = get_catalog()
+        conflicts = catalog.derived("negative_conflicts", self.compile_conflicts)
+        mask = 0
+        for tag in tags:
+            mask |= conflicts.get(tag, 0)
+        return mask
+
+    @property
+    def token_counts(self):
+        """Per-term CLIP token counts, filled in on first use"""
+        if self._token_counts is None:
+            self._token_counts = TokenCounts()
+        return self._token_counts
+
+    def custom_extra(self, mask, custom_terms, strength_boost=False, syntax=NEGATIVE_SYNTAX):
+        """
+        (mask, extra parts) for parsed custom terms (split_custom_negatives). A custom term
+        the mask already covers is skipped, unless it carries its own weight: then it
+        replaces the table's term, whose bit is cleared from the returned mask.
+        """
+        extra = []
+        index = self.index
+        boosted = WEIGHTED_VARIANTS[syntax, BOOST_WEIGHT]
+        for source, key, weight in custom_terms:
+            bit = index.get(key)
+            if bit is not None and (mask >> bit) & 1:
+                if weight == 1.0:
+                    continue
+                mask &= ~(1 << bit)
+            extra.append(boosted[key] if strength_boost and weight == 1.0 and key in self.critical else source)
+        return mask, extra
+
+    def render_budget(self, mask, custom_terms=(), strength_boost=False, token_budget=CHUNK_TOKENS,
+                      chunk_breaks=False, syntax=NEGATIVE_SYNTAX):
+        """
+        render() within token_budget CLIP tokens: custom terms are always kept, boosted
+        terms outlast plain ones, and later categories are dropped first.
+        Returns (prompt, budget summary line).
+        """
+        extra = []
+        if custom_terms:
+            mask, extra = self.custom_extra(mask, custom_terms, strength_boost, syntax)
+        variants = self.variants(strength_boost, syntax)
+        weights = self.boost_weights
+        parts = []
+        priorities = []
+        remaining = mask
+        while remaining:
+            low = remaining & -remaining
+            bit = low.bit_length() - 1
+            parts.append(variants[bit])
+            priorities.append(weights[bit] if strength_boost else 1.0)
+            remaining ^= low
+        parts.extend(extra)
+        priorities.extend([None] * len(extra))
+        prompt, dropped, tokens, chunks = fit_parts(parts, priorities, token_budget, chunk_breaks,
+                                                    self.token_counts)
+        return prompt, budget_summary(tokens, chunks, [parts[i] for i in dropped])
+
+    def render(self, mask, custom_terms=(), strength_boost=False, syntax=NEGATIVE_SYNTAX):
+        """Join the terms of mask in canonical order, then any custom terms not already present"""
+        extra = None
+        if custom_terms:
+            # Custom terms go last; ones the mask already covers are skipped
+            mask, extra = self.custom_extra(mask, custom_terms, strength_boost, syntax)
+        key = (mask, strength_boost, syntax)
+        rendered = self._rendered.get(key)
+        if rendered is None:
+            variants = self.variants(strength_boost, syntax)
+            parts = []
+            remaining = mask
+            while remaining:
+                low = remaining & -remaining
+                parts.append(variants[low.bit_length() - 1])
+                remaining ^= low
+            rendered = ", ".join(parts)
+            if len(self._rendered) >= self.RENDER_CACHE_SIZE:
+                self._rendered.clear()
+            self._rendered[key] = rendered
+
+        if not extra:
+            return rendered
+        return ", ".join(extra) if not rendered else rendered + ", " + ", ".join(extra)
+
+
+_term_table = None
+
+
+def negative_term_table():
+    """The shared compiled term table, built on first use"""
+    global _term_table
+    if _term_table is None:
+        _term_table = NegativeTermTable(CATEGORY_TERMS, PRESET_CATEGORIES, CRITICAL_TERMS)
+    return _term_table
+
+
+def split_custom_negatives(custom_negatives):
+    """
+    Custom negatives text -> tuple of distinct (source text, term key, weight), parsed once
+    per distinct text; weighted groups like (a, b:1.2) stay one term
+    """
+    if not custom_negatives or not custom_negatives.strip():
+        return ()
+    return parse_terms(custom_negatives)
+
+
 
 class FactoryPromptsNegativeGenerator:
     """
@@ -9,168 +409,34 @@ class FactoryPromptsNegativeGenerator:
     """
     
     def __init__(self):
-        # Base quality negatives - always included
-        self.base_quality = [
-            "lowres", "bad_anatomy", "bad_hands", "text", "error",
-            "missing_fingers", "extra_digit", "fewer_digits", "cropped",
-            "worst_quality", "low_quality", "normal_quality", 
-            "jpeg_artifacts", "signature", "watermark", "username", "blurry"
-        ]
-        
-        # Enhanced quality negatives for higher standards
-        self.enhanced_quality = [
-            "bad_proportions", "bad_perspective", "bad_shading",
-            "bad_composition", "bad_lighting", "overexposed", "underexposed",
-            "noise", "grainy", "pixelated", "compression_artifacts",
-            "aliasing", "distorted", "deformed", "malformed"
-        ]
-        
-        # Anatomy and body negatives
-        self.anatomy_negatives = [
-            "bad_anatomy", "bad_hands", "bad_feet", "bad_face",
-            "missing_fingers", "extra_digit", "fewer_digits", "extra_fingers",
-            "mutated_hands", "poorly_drawn_hands", "poorly_drawn_face",
-            "mutation", "deformed", "ugly", "blurry_face", "disfigured",
-            "extra_limbs", "missing_limbs", "extra_arms", "missing_arms",
-            "extra_legs", "missing_legs", "fused_fingers", "too_many_fingers",
-            "long_neck", "duplicate", "morbid", "mutilated", "extra_head",
-            "poorly_drawn_eyes", "bad_eyes", "crossed_eyes", "extra_tongue",
-            "multiple_tongues", "deformed_tongue", "elongated_tongue"
-        ]
-        
-        # Non-realistic style control negatives
-        self.non_realistic_style_control = [
-            "source_cartoon", "source_furry", "source_pony", "western_comic",
-            "cartoon", "disney", "pixar", "anime_style", "manga_style",
-            "chibi", "cel_shading", "flat_colors", "simplified_art"
-        ]
-        
-        # Realistic style control negatives  
-        self.realistic_style_control = [
-            "3d", "realistic", "photorealistic", "photo", "photography",
-            "real_person", "live_action", "cgi", "render", "blender", 
-            "unreal_engine", "ray_tracing", "hyperrealistic", "lifelike"
-        ]
-        
-        # Art medium negatives
-        self.unwanted_mediums = [
-            "sketch", "pencil_sketch", "rough_sketch", "draft",
-            "unfinished", "incomplete", "work_in_progress", "wip",
-            "traditional_media", "pencil_drawing", "charcoal",
-            "crayon", "chalk", "pastel", "watercolor_paper",
-            "canvas_texture", "paper_texture", "scan_artifacts"
-        ]
-        
-        # Color and saturation control
-        self.color_negatives = [
-            "monochrome", "grayscale", "greyscale", "black_and_white",
-            "sepia", "desaturated", "oversaturated", "color_bleeding",
-            "bad_colors", "ugly_colors", "neon_colors", "garish",
-            "overexposed_colors", "washed_out", "faded_colors"
-        ]
-        
-        # Composition and framing negatives
-        self.composition_negatives = [
-            "bad_composition", "bad_framing", "cut_off", "cropped_head",
-            "cropped_body", "out_of_frame", "off_center", "unbalanced",
-            "awkward_pose", "stiff_pose", "unnatural_pose", "forced_smile",
-            "bad_perspective", "wrong_perspective", "floating"
-        ]
-        
-        # Background and environment negatives
-        self.background_negatives = [
-            "cluttered_background", "busy_background", "distracting_background",
-            "bad_background", "messy_background", "noisy_background",
-            "artifacts_in_background", "floating_objects", "inconsistent_lighting",
-            "multiple_light_sources", "confusing_background"
-        ]
-        
-        # Text and UI element negatives
-        self.text_negatives = [
-            "text", "words", "letters", "numbers", "symbols",
-            "watermark", "signature", "artist_name", "copyright",
-            "logo", "brand", "website", "url", "username",
-            "speech_bubble", "thought_bubble", "text_bubble",
-            "caption", "subtitle", "overlay_text", "ui_elements"
-        ]
-        
-        # Clothing and fashion negatives
-        self.clothing_negatives = [
-            "bad_clothing", "poorly_drawn_clothes", "floating_clothes",
-            "clipping_clothes", "transparent_clothes", "see_through_clothes",
-            "torn_clothes", "damaged_clothes", "wrinkled_clothes",
-            "ill_fitting_clothes", "oversized_clothes", "undersized_clothes"
-        ]
-        
-        # Expression and emotion negatives
-        self.expression_negatives = [
-            "dead_eyes", "empty_eyes", "soulless_eyes", "scary_eyes",
-            "angry_expression", "sad_expression", "depressed_expression",
-            "forced_expression", "unnatural_expression", "blank_expression",
-            "emotionless", "creepy_smile", "evil_smile"
-        ]
-        
-        # Hair negatives
-        self.hair_negatives = [
-            "bad_hair", "poorly_drawn_hair", "floating_hair", "messy_hair",
-            "tangled_hair", "unrealistic_hair", "bad_hair_physics",
-            "clipping_hair", "hair_artifacts", "inconsistent_hair_color"
-        ]
-        
-        # NSFW content filters (for SFW generations)
-        self.nsfw_filters = [
-            "nsfw", "explicit", "nude", "naked", "topless", "bottomless",
-            "underwear", "lingerie", "bikini", "swimsuit", "revealing_clothes",
-            "cleavage", "exposed_skin", "suggestive", "provocative",
-            "sexual", "erotic", "adult_content", "mature_content"
-        ]
-        
-        # Violence and disturbing content filters
-        self.violence_filters = [
-            "violence", "blood", "gore", "death", "killing", "murder",
-            "torture", "pain", "suffering", "injury", "wound", "scar",
-            "bruise", "cut", "bleeding", "dark_themes", "disturbing",
-            "nightmare", "horror", "scary", "frightening"
-        ]
-        
-        # Technical artifact negatives
-        self.technical_negatives = [
-            "compression_artifacts", "jpeg_artifacts", "aliasing", "moire",
-            "banding", "posterization", "color_banding", "pixelation",
-            "blur_artifacts", "sharpening_artifacts", "noise_artifacts",
-            "upscaling_artifacts", "interpolation_artifacts"
-        ]
+        # Term lists are shared module-level tuples; nothing is rebuilt per instance
+        self.base_quality = BASE_QUALITY
+        self.enhanced_quality = ENHANCED_QUALITY
+        self.anatomy_negatives = ANATOMY_NEGATIVES
+        self.non_realistic_style_control = NON_REALISTIC_STYLE_CONTROL
+        self.realistic_style_control = REALISTIC_STYLE_CONTROL
+        self.unwanted_mediums = UNWANTED_MEDIUMS
+        self.color_negatives = COLOR_NEGATIVES
+        self.composition_negatives = COMPOSITION_NEGATIVES
+        self.background_negatives = BACKGROUND_NEGATIVES
+        self.text_negatives = TEXT_NEGATIVES
+        self.clothing_negatives = CLOTHING_NEGATIVES
+        self.expression_negatives = EXPRESSION_NEGATIVES
+        self.hair_negatives = HAIR_NEGATIVES
+        self.nsfw_filters = NSFW_FILTERS
+        self.violence_filters = VIOLENCE_FILTERS
+        self.technical_negatives = TECHNICAL_NEGATIVES
 
     def get_base_negatives(self) -> List[str]:
         """Always included base negative prompts"""
-        return self.base_quality.copy()
+        return list(self.base_quality)
 
     def get_category_negatives(self, categories: List[str]) -> List[str]:
         """Get negatives from specific categories"""
         negatives = []
-        
-        category_map = {
-            "enhanced_quality": self.enhanced_quality,
-            "anatomy": self.anatomy_negatives,
-            "non_realistic_style_control": self.non_realistic_style_control,
-            "realistic_style_control": self.realistic_style_control,
-            "unwanted_mediums": self.unwanted_mediums,
-            "color_control": self.color_negatives,
-            "composition": self.composition_negatives,
-            "background": self.background_negatives,
-            "text_elements": self.text_negatives,
-            "clothing": self.clothing_negatives,
-            "expressions": self.expression_negatives,
-            "hair": self.hair_negatives,
-            "nsfw_filters": self.nsfw_filters,
-            "violence_filters": self.violence_filters,
-            "technical": self.technical_negatives
-        }
-        
         for category in categories:
-            if category in category_map:
-                negatives.extend(category_map[category])
-        
+            if category != "base_quality" and category in CATEGORY_TERMS:
+                negatives.extend(CATEGORY_TERMS[category])
         return negatives
 
     def build_negative_prompt(self, 
@@ -180,7 +446,11 @@ class FactoryPromptsNegativeGenerator:
                             include_nsfw_filters: bool = False,
                             include_violence_filters: bool = False,
                             custom_negatives: str = "",
-                            strength_boost: bool = False) -> str:
+                            strength_boost: bool = False,
+                            token_budget: int = 0,
+                            chunk_breaks: bool = False,
+                            prompt_spec=None,
+                            weight_syntax: str = NEGATIVE_SYNTAX) -> str:
         """
         Build comprehensive negative prompt based on settings
         
@@ -192,75 +462,47 @@ class FactoryPromptsNegativeGenerator:
             include_violence_filters: Add violence/disturbing content filters
             custom_negatives: Additional custom negative terms
             strength_boost: Add emphasis to critical negatives
+            token_budget: Maximum CLIP tokens (0 = unlimited); custom negatives are always kept
+            chunk_breaks: Put BREAK between 75-token chunks instead of splitting terms
+            prompt_spec: Positive PromptSpec; terms contradicting its selections are dropped
+            weight_syntax: How boosted terms are written (brackets, a1111 or plain)
         """
+        node_name = type(self).__name__
+        started = METRICS.start(node_name)
+        table = negative_term_table()
+        if started:
+            started = METRICS.lap(node_name, "catalog", started)
+        category_masks = table.category_masks
         
-        negatives = self.get_base_negatives()
-        
-        # Apply presets
-        if preset == "minimal":
-            # Just base quality negatives
-            pass
-        elif preset == "standard":
-            negatives.extend(self.get_category_negatives([
-                "enhanced_quality", "anatomy", "composition", "text_elements"
-            ]))
-        elif preset == "comprehensive":
-            negatives.extend(self.get_category_negatives([
-                "enhanced_quality", "anatomy", "composition", "background",
-                "text_elements", "clothing", "hair", "technical"
-            ]))
-        elif preset == "professional":
-            negatives.extend(self.get_category_negatives([
-                "enhanced_quality", "anatomy", "composition", "background",
-                "text_elements", "clothing", "expressions", "hair", 
-                "unwanted_mediums", "technical"
-            ]))
-        elif preset == "anime_focused":
-            negatives.extend(self.get_category_negatives([
-                "enhanced_quality", "anatomy", "non_realistic_style_control", "composition",
-                "text_elements", "unwanted_mediums"
-            ]))
+        # Presets are precomputed masks; unknown presets fall back to base quality only
+        mask = table.preset_masks.get(preset, category_masks["base_quality"])
         
         # Add custom categories
         if custom_categories:
-            negatives.extend(self.get_category_negatives(custom_categories))
+            mask |= table.mask(custom_categories)
         
         # Add optional filters
         if include_style_control:
-            negatives.extend(self.non_realistic_style_control)
-            negatives.extend(self.realistic_style_control)
-        
+            mask |= category_masks["non_realistic_style_control"] | category_masks["realistic_style_control"]
         if include_nsfw_filters:
-            negatives.extend(self.nsfw_filters)
-        
+            mask |= category_masks["nsfw_filters"]
         if include_violence_filters:
-            negatives.extend(self.violence_filters)
-        
-        # Add custom negatives
-        if custom_negatives.strip():
-            custom_terms = [term.strip() for term in custom_negatives.split(",") if term.strip()]
-            negatives.extend(custom_terms)
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_negatives = []
-        for negative in negatives:
-            if negative not in seen:
-                unique_negatives.append(negative)
-                seen.add(negative)
-        
-        # Apply strength boost to critical terms
-        if strength_boost:
-            critical_terms = ["bad_anatomy", "bad_hands", "bad_face", "worst_quality", "low_quality"]
-            boosted_negatives = []
-            for negative in unique_negatives:
-                if negative in critical_terms:
-                    boosted_negatives.append(f"({negative}:1.2)")
-                else:
-                    boosted_negatives.append(negative)
-            unique_negatives = boosted_negatives
-        
-        return ", ".join(unique_negatives)
+            mask |= category_masks["violence_filters"]
+        
+        # Selection-aware: drop terms the positive selections contradict
+        if prompt_spec is not None:
+            mask &= ~table.selection_conflicts(prompt_spec.iter_tags(), prompt_spec.catalog)
+        
+        if started:
+            started = METRICS.lap(node_name, "dispatch", started)
+        if token_budget:
+            negative_prompt = table.render_budget(mask, split_custom_negatives(custom_negatives), strength_boost,
+                                                  token_budget, chunk_breaks, weight_syntax)[0]
+        else:
+            negative_prompt = table.render(mask, split_custom_negatives(custom_negatives), strength_boost, weight_syntax)
+        if started:
+            METRICS.lap(node_name, "join", started)
+        return negative_prompt
 
     def get_preset_description(self, preset: str) -> str:
         """Get description of what each preset includes"""
@@ -300,12 +542,23 @@ class PonyNegativeNode:
                 "extra_categories": (["none", "enhanced_quality", "anatomy", "unwanted_mediums", 
                                    "color_control", "composition", "background", "text_elements", 
                                    "clothing", "expressions", "hair", "technical"], {"default": "none"}),
+                "prompt_spec": (PROMPT_SPEC_TYPE,),
+                "token_budget": ("INT", {"default": 0, "min": 0, "max": 10 * CHUNK_TOKENS, "step": 1}),
+                "chunk_breaks": ("BOOLEAN", {"default": False}),
+                "weight_syntax": (list(WEIGHT_SYNTAXES), {"default": NEGATIVE_SYNTAX}),
             }
         }
     
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # Pure function of the inputs: only re-run when they change
+        return input_hash(cls.__name__, "", kwargs)
+    
+    @cached_result()
     def generate_negative(self, preset, include_style_control, include_nsfw_filters, 
                          include_violence_filters, strength_boost, custom_negatives="", 
-                         extra_categories="none"):
+                         extra_categories="none", token_budget=0, chunk_breaks=False, prompt_spec=None,
+                         weight_syntax=NEGATIVE_SYNTAX):
         
         # Convert extra_categories to list
         extra_cats = [extra_categories] if extra_categories != "none" else []
@@ -318,7 +571,11 @@ class PonyNegativeNode:
             include_nsfw_filters=include_nsfw_filters,
             include_violence_filters=include_violence_filters,
             custom_negatives=custom_negatives,
-            strength_boost=strength_boost
+            strength_boost=strength_boost,
+            token_budget=token_budget,
+            chunk_breaks=chunk_breaks,
+            prompt_spec=prompt_spec,
+            weight_syntax=weight_syntax
         )
         
         return (negative,)
@@ -359,85 +616,69 @@ class PonyNegativeCategorizedNode:
                 "technical_artifacts": ("BOOLEAN", {"default": False}),
                 "strength_boost": ("BOOLEAN", {"default": False}),
                 "custom_negatives": ("STRING", {"multiline": True, "default": ""}),
+                "prompt_spec": (PROMPT_SPEC_TYPE,),
+                "token_budget": ("INT", {"default": 0, "min": 0, "max": 10 * CHUNK_TOKENS, "step": 1}),
+                "chunk_breaks": ("BOOLEAN", {"default": False}),
+                "weight_syntax": (list(WEIGHT_SYNTAXES), {"default": NEGATIVE_SYNTAX}),
             }
         }
     
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        return input_hash(cls.__name__, "", kwargs)
+    
+    @cached_result()
     def generate_categorized_negative(self, base_quality, enhanced_quality, anatomy_control,
                                     non_realistic_style_control, realistic_style_control, composition, text_removal, unwanted_mediums=False,
                                     color_control=False, background_control=False, clothing_control=False,
                                     expression_control=False, hair_control=False, nsfw_filters=False,
                                     violence_filters=False, technical_artifacts=False, strength_boost=False,
-                                    custom_negatives=""):
-        
-        negatives = []
-        
-        # Add base categories based on selections
-        if base_quality:
-            negatives.extend(self.generator.get_base_negatives())
-        
-        # Build category list
-        categories = []
-        if enhanced_quality:
-            categories.append("enhanced_quality")
-        if anatomy_control:
-            categories.append("anatomy")
-        if unwanted_mediums:
-            categories.append("unwanted_mediums")
-        if color_control:
-            categories.append("color_control")
-        if composition:
-            categories.append("composition")
-        if background_control:
-            categories.append("background")
-        if text_removal:
-            categories.append("text_elements")
-        if clothing_control:
-            categories.append("clothing")
-        if expression_control:
-            categories.append("expressions")
-        if hair_control:
-            categories.append("hair")
-        if technical_artifacts:
-            categories.append("technical")
-        
-        # Add category negatives
-        negatives.extend(self.generator.get_category_negatives(categories))
-        
-        # Add optional style control filters
-        if non_realistic_style_control:
-            negatives.extend(self.generator.non_realistic_style_control)
-        if realistic_style_control:
-            negatives.extend(self.generator.realistic_style_control)
-        if nsfw_filters:
-            negatives.extend(self.generator.nsfw_filters)
-        if violence_filters:
-            negatives.extend(self.generator.violence_filters)
-        
-        # Add custom negatives
-        if custom_negatives.strip():
-            custom_terms = [term.strip() for term in custom_negatives.split(",") if term.strip()]
-            negatives.extend(custom_terms)
-        
-        # Remove duplicates
-        seen = set()
-        unique_negatives = []
-        for negative in negatives:
-            if negative not in seen:
-                unique_negatives.append(negative)
-                seen.add(negative)
-        
-        # Apply strength boost
-        if strength_boost:
-            critical_terms = ["bad_anatomy", "bad_hands", "bad_face", "worst_quality", "low_quality"]
-            boosted_negatives = []
-            for negative in unique_negatives:
-                if negative in critical_terms:
-                    boosted_negatives.append(f"({negative}:1.2)")
-                else:
-                    boosted_negatives.append(negative)
-            unique_negatives = boosted_negatives
-        
-        return (", ".join(unique_negatives),)
+                                    custom_negatives="", token_budget=0, chunk_breaks=False, prompt_spec=None,
+                                    weight_syntax=NEGATIVE_SYNTAX):
+        
+        node_name = type(self).__name__
+        started = METRICS.start(node_name)
+        table = negative_term_table()
+        if started:
+            started = METRICS.lap(node_name, "catalog", started)
+        category_masks = table.category_masks
+        
+        # Each enabled toggle ORs in its precomputed category mask
+        toggles = (
+            (base_quality, "base_quality"),
+            (enhanced_quality, "enhanced_quality"),
+            (anatomy_control, "anatomy"),
+            (unwanted_mediums, "unwanted_mediums"),
+            (color_control, "color_control"),
+            (composition, "composition"),
+            (background_control, "background"),
+            (text_removal, "text_elements"),
+            (clothing_control, "clothing"),
+            (expression_control, "expressions"),
+            (hair_control, "hair"),
+            (technical_artifacts, "technical"),
+            (non_realistic_style_control, "non_realistic_style_control"),
+            (realistic_style_control, "realistic_style_control"),
+            (nsfw_filters, "nsfw_filters"),
+            (violence_filters, "violence_filters"),
+        )
+        mask = 0
+        for enabled, category in toggles:
+            if enabled:
+                mask |= category_masks[category]
+        if prompt_spec is not None:
+            mask &= ~table.selection_conflicts(prompt_spec.iter_tags(), prompt_spec.catalog)
+        
+        if started:
+            started = METRICS.lap(node_name, "dispatch", started)
+        if token_budget:
+            negative_prompt = table.render_budget(mask, split_custom_negatives(custom_negatives), strength_boost,
+                                                  token_budget, chunk_breaks, weight_syntax)[0]
+        else:
+            negative_prompt = table.render(mask, split_custom_negatives(custom_negatives), strength_boost, weight_syntax)
+        if started:
+            METRICS.lap(node_name, "join", started)
+        return (negative_prompt,)
 
 
 class PonyNegativeToggleNode:
@@ -487,9 +728,22 @@ class PonyNegativeToggleNode:
                 # Enhancement Options
                 "strength_boost": ("BOOLEAN", {"default": False}),
                 "custom_negatives": ("STRING", {"multiline": True, "default": ""}),
+                
+                # Positive selections; contradicted negatives are dropped
+                "prompt_spec": (PROMPT_SPEC_TYPE,),
+                
+                # CLIP token budget (0 = unlimited)
+                "token_budget": ("INT", {"default": 0, "min": 0, "max": 10 * CHUNK_TOKENS, "step": 1}),
+                "chunk_breaks": ("BOOLEAN", {"default": False}),
+                "weight_syntax": (list(WEIGHT_SYNTAXES), {"default": NEGATIVE_SYNTAX}),
             }
         }
     
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        return input_hash(cls.__name__, "", kwargs)
+    
+    @cached_result()
     def generate_negative_toggles(self, seed, base_quality=True, enhanced_quality=False, 
                                  technical_artifacts=False, anatomy_control=True, 
                                  expression_control=False, hair_control=False, 
@@ -498,105 +752,76 @@ class PonyNegativeToggleNode:
                                  background_control=False, text_removal=True, 
                                  clothing_control=False, nsfw_filters=False, 
                                  violence_filters=False, strength_boost=False, 
-                                 custom_negatives=""):
-        
-        # Set random seed for reproducible results
-        if seed != 0:
-            random.seed(seed)
-        
-        negatives = []
+                                 custom_negatives="", token_budget=0, chunk_breaks=False, prompt_spec=None,
+                                 weight_syntax=NEGATIVE_SYNTAX):
+        
+        # Output is a pure function of the toggles; seed is kept for workflow compatibility
+        # and no longer reseeds the process-wide random module
+        
+        node_name = type(self).__name__
+        started = METRICS.start(node_name)
+        table = negative_term_table()
+        if started:
+            started = METRICS.lap(node_name, "catalog", started)
+        category_masks = table.category_masks
+        
+        # Toggles in summary order, each with its precomputed category mask
+        toggles = (
+            (base_quality, "base_quality", "Base Quality"),
+            (enhanced_quality, "enhanced_quality", "Enhanced Quality"),
+            (technical_artifacts, "technical", "Technical Artifacts"),
+            (anatomy_control, "anatomy", "Anatomy Control"),
+            (expression_control, "expressions", "Expression Control"),
+            (hair_control, "hair", "Hair Control"),
+            (non_realistic_style_control, "non_realistic_style_control", "Non-Realistic Style Control"),
+            (realistic_style_control, "realistic_style_control", "Realistic Style Control"),
+            (unwanted_mediums, "unwanted_mediums", "Unwanted Mediums"),
+            (color_control, "color_control", "Color Control"),
+            (composition, "composition", "Composition"),
+            (background_control, "background", "Background Control"),
+            (text_removal, "text_elements", "Text Removal"),
+            (clothing_control, "clothing", "Clothing Control"),
+            (nsfw_filters, "nsfw_filters", "NSFW Filters"),
+            (violence_filters, "violence_filters", "Violence Filters"),
+        )
+        mask = 0
         enabled_categories = []
-        
-        # Add base categories based on toggles
-        if base_quality:
-            negatives.extend(self.generator.get_base_negatives())
-            enabled_categories.append("Base Quality")
-        
-        # Build category list based on toggles
-        categories = []
-        if enhanced_quality:
-            categories.append("enhanced_quality")
-            enabled_categories.append("Enhanced Quality")
-        if technical_artifacts:
-            categories.append("technical")
-            enabled_categories.append("Technical Artifacts")
-        if anatomy_control:
-            categories.append("anatomy")
-            enabled_categories.append("Anatomy Control")
-        if expression_control:
-            categories.append("expressions")
-            enabled_categories.append("Expression Control")
-        if hair_control:
-            categories.append("hair")
-            enabled_categories.append("Hair Control")
-        if non_realistic_style_control:
-            categories.append("non_realistic_style_control")
-            enabled_categories.append("Non-Realistic Style Control")
-        if realistic_style_control:
-            categories.append("realistic_style_control")
-            enabled_categories.append("Realistic Style Control")
-        if unwanted_mediums:
-            categories.append("unwanted_mediums")
-            enabled_categories.append("Unwanted Mediums")
-        if color_control:
-            categories.append("color_control")
-            enabled_categories.append("Color Control")
-        if composition:
-            categories.append("composition")
-            enabled_categories.append("Composition")
-        if background_control:
-            categories.append("background")
-            enabled_categories.append("Background Control")
-        if text_removal:
-            categories.append("text_elements")
-            enabled_categories.append("Text Removal")
-        if clothing_control:
-            categories.append("clothing")
-            enabled_categories.append("Clothing Control")
-        
-        # Add category negatives
-        if categories:
-            negatives.extend(self.generator.get_category_negatives(categories))
-        
-        # Add optional filters
-        if nsfw_filters:
-            negatives.extend(self.generator.get_category_negatives(["nsfw_filters"]))
-            enabled_categories.append("NSFW Filters")
-        
-        if violence_filters:
-            negatives.extend(self.generator.get_category_negatives(["violence_filters"]))
-            enabled_categories.append("Violence Filters")
+        for enabled, category, label in toggles:
+            if enabled:
+                mask |= category_masks[category]
+                enabled_categories.append(label)
         
         # Add custom negatives
-        if custom_negatives.strip():
-            custom_terms = [term.strip() for term in custom_negatives.split(",") if term.strip()]
-            negatives.extend(custom_terms)
+        custom_terms = split_custom_negatives(custom_negatives)
+        if custom_terms:
             enabled_categories.append(f"Custom ({len(custom_terms)} terms)")
         
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_negatives = []
-        for negative in negatives:
-            if negative not in seen:
-                unique_negatives.append(negative)
-                seen.add(negative)
+        if prompt_spec is not None:
+            conflicting = mask & table.selection_conflicts(prompt_spec.iter_tags(), prompt_spec.catalog)
+            if conflicting:
+                mask ^= conflicting
+                enabled_categories.append(f"Selection-Aware ({bin(conflicting).count('1')} conflicting terms dropped)")
         
-        # Apply strength boost to critical terms
         if strength_boost:
-            critical_terms = ["bad_anatomy", "bad_hands", "bad_face", "worst_quality", "low_quality"]
-            boosted_negatives = []
-            for negative in unique_negatives:
-                if negative in critical_terms:
-                    boosted_negatives.append(f"({negative}:1.2)")
-                else:
-                    boosted_negatives.append(negative)
-            unique_negatives = boosted_negatives
             enabled_categories.append("Strength Boost")
+        if started:
+            started = METRICS.lap(node_name, "dispatch", started)
+        
+        if token_budget:
+            negative_prompt, budget_line = table.render_budget(mask, custom_terms, strength_boost,
+                                                               token_budget, chunk_breaks, weight_syntax)
+            enabled_categories.append(budget_line)
+        else:
+            negative_prompt = table.render(mask, custom_terms, strength_boost, weight_syntax)
+        if started:
+            started = METRICS.lap(node_name, "join", started)
         
         # Create category summary
         category_summary = ", ".join(enabled_categories) if enabled_categories else "No categories enabled"
+        if started:
+            METRICS.lap(node_name, "summary", started)
         
-        return (", ".join(unique_negatives), category_summary)
+        return (negative_prompt, category_summary)
 
 
 # Node registration
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+
+"""
+Factory Prompt AST - Weighted prompt terms and the syntaxes they are written in
+A prompt is a sequence of Term (text, weight) and Group (terms sharing a weight) nodes.
+Both generators describe emphasis as weights: the positive emphasis levels are 1.1 per
+bracket level and the negative strength boost is 1.2, so one syntax setting renders
+both outputs consistently:
+    brackets  nested parentheses, 1.1 per level ((tag) = 1.1, [tag] = 1 / 1.1)
+    a1111     (tag:1.21)
+    plain     weights dropped
+Rendered variants of each (tag, weight, syntax) are cached, so the generators look them
+up instead of formatting strings per tag.
+
+parse_prompt() reads user text in the same A1111 grammar ((a, b:1.2), [tag], \\( escapes)
+and splits it on top-level commas only; parse_terms() also drops repeats, treating tag,
+(tag) and (tag:1.1) as one term. Both are cached, since custom text rarely changes.
+"""
+
+import functools
+import math
+import re
+
+WEIGHT_SYNTAXES = ("brackets", "a1111", "plain")
+DEFAULT_SYNTAX = "brackets"
+
+# Weight of one level of parentheses
+EMPHASIS_STEP = 1.1
+
+# Bracket depth of each emphasis level (medium adds none)
+EMPHASIS_DEPTHS = {"low": 1, "high": 2, "very_high": 3}
+EMPHASIS_WEIGHTS = {"medium": 1.0, **{level: EMPHASIS_STEP ** depth for level, depth in EMPHASIS_DEPTHS.items()}}
+
+# Weight of the critical negatives with strength_boost
+BOOST_WEIGHT = 1.2
+
+# Rendered tags kept per (syntax, weight), and (syntax, weight) tables kept
+VARIANT_CACHE_SIZE = 65536
+VARIANT_TABLES = 1024
+
+# Distinct custom texts whose parse is kept
+PARSE_CACHE_SIZE = 1024
+
+# Escapes, brackets, commas, a ":weight" closing a group, runs of other text, stray colons
+TOKEN_PATTERN = re.compile(r"\\.|[()\[\],]|:\s*[-+]?(?:\d+\.?\d*|\.\d+)\s*(?=\))|[^\\()\[\],:]+|:")
+
+
+def bracket_depth(weight):
+    """Nesting depth that best approximates weight (negative for square brackets)"""
+    if weight <= 0:
+        return 0
+    return round(math.log(weight) / math.log(EMPHASIS_STEP))
+
+
+def format_weight(weight):
+    """Weight with at most two decimals, as written in (tag:weight)"""
+    return f"{weight:.2f}".rstrip("0").rstrip(".")
+
+
+def render_brackets(text, weight):
+    depth = bracket_depth(weight)
+    if depth > 0:
+        return "(" * depth + text + ")" * depth
+    if depth < 0:
+        return "[" * -depth + text + "]" * -depth
+    return text
+
+
+def render_a1111(text, weight):
+    written = format_weight(weight)
+    return text if written == "1" else f"({text}:{written})"
+
+
+def render_plain(text, weight):
+    return text
+
+
+SERIALIZERS = {"brackets": render_brackets, "a1111": render_a1111, "plain": render_plain}
+
+
+def serializer(syntax):
+    """(text, weight) -> str function of a weight syntax"""
+    try:
+        return SERIALIZERS[syntax]
+    except KeyError:
+        raise ValueError(f"Unknown weight syntax '{syntax}', expected one of {', '.join(WEIGHT_SYNTAXES)}") from None
+
+
+def emphasis_level(weight):
+    """Emphasis level whose weight is closest to weight"""
+    return min(EMPHASIS_WEIGHTS, key=lambda level: abs(EMPHASIS_WEIGHTS[level] - weight))
+
+
+class Term:
+    """One tag or phrase with its weight"""
+
+    __slots__ = ("text", "weight")
+
+    def __init__(self, text, weight=1.0):
+        self.text = text
+        self.weight = weight
+
+    def __repr__(self):
+        return f"Term({self.text!r}, {self.weight:g})"
+
+    def __eq__(self, other):
+        return isinstance(other, Term) and (self.text, self.weight) == (other.text, other.weight)
+
+    def __hash__(self):
+        return hash((self.text, self.weight))
+
+    def render(self, syntax=DEFAULT_SYNTAX):
+        if not self.text:
+            return ""
+        return WEIGHTED_VARIANTS[syntax, self.weight][self.text]
+
+
+class Group:
+    """Nodes written as one unit, e.g. the quality tags, with an optional shared weight"""
+
+    __slots__ = ("children", "weight")
+
+    def __init__(self, children, weight=1.0):
+        self.children = tuple(children)
+        self.weight = weight
+
+    def __repr__(self):
+        return f"Group({list(self.children)!r}, {self.weight:g})"
+
+    def __eq__(self, other):
+        return isinstance(other, Group) and (self.children, self.weight) == (other.children, other.weight)
+
+    def __hash__(self):
+        return hash((self.children, self.weight))
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def render(self, syntax=DEFAULT_SYNTAX):
+        inner = serialize(self.children, syntax)
+        return serializer(syntax)(inner, self.weight) if inner else ""
+
+
+def serialize(nodes, syntax=DEFAULT_SYNTAX):
+    """Comma-separated prompt text of a sequence of nodes"""
+    return ", ".join(text for text in (node.render(syntax) for node in nodes) if text)
+
+
+class RenderedTags(dict):
+    """tag -> tag written with one weight in one syntax, rendered on first use"""
+
+    def __init__(self, render, weight):
+        super().__init__()
+        self.render = render
+        self.weight = weight
+
+    def __missing__(self, tag):
+        rendered = self.render(tag, self.weight)
+        if len(self) >= VARIANT_CACHE_SIZE:
+            self.clear()
+        self[tag] = rendered
+        return rendered
+
+
+class WeightedVariants(dict):
+    """(syntax, weight) -> RenderedTags; rendering only depends on the tag text, so one cache serves every catalog"""
+
+    def __missing__(self, key):
+        syntax, weight = key
+        tags = RenderedTags(serializer(syntax), weight)
+        if len(self) >= VARIANT_TABLES:
+            self.clear()
+        self[key] = tags
+        return tags
+
+
+WEIGHTED_VARIANTS = WeightedVariants()
+
+
+def emphasis_variants(emphasis_level, syntax=DEFAULT_SYNTAX):
+    """tag -> tag rendered with emphasis_level in syntax (unknown levels add no weight)"""
+    return WEIGHTED_VARIANTS[syntax, EMPHASIS_WEIGHTS.get(emphasis_level, 1.0)]
+
+
+def term_key(node):
+    """Dedup key of a node: its text without weights, whitespace collapsed (case is kept)"""
+    if isinstance(node, Term):
+        return " ".join(node.text.split())
+    return ", ".join(term_key(child) for child in node.children)
+
+
+def _finish_unit(pieces):
+    """Node of one comma-separated unit from its text pieces and nested nodes, or None if empty"""
+    nodes = []
+    text = []
+    for piece in pieces:
+        if isinstance(piece, str):
+            text.append(piece)
+            continue
+        if "".join(text).strip():
+            nodes.append(Term(" ".join("".join(text).split())))
+        text = []
+        nodes.append(piece)
+    if "".join(text).strip():
+        nodes.append(Term(" ".join("".join(text).split())))
+    if not nodes:
+        return None
+    return nodes[0] if len(nodes) == 1 else Group(nodes)
+
+
+def _close_group(frame):
+    """Node of a bracketed group: its units with the group weight (1.1 per "(", 1 / 1.1 per "[")"""
+    opener, children, pieces, weight = frame
+    node = _finish_unit(pieces)
+    if node is not None:
+        children.append(node)
+    if weight is None:
+        weight = EMPHASIS_STEP if opener == "(" else 1 / EMPHASIS_STEP
+    if not children:
+        return None
+    if len(children) == 1:
+        child = children[0]
+        if isinstance(child, Term):
+            return Term(child.text, child.weight * weight)
+        return Group(child.children, child.weight * weight)
+    return Group(children, weight)
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_prompt(text):
+    """
+    Tuple of (source text, node) per top-level comma-separated unit of text.
+    Commas inside brackets do not split; "\\(" and friends are literal brackets; unclosed
+    groups run to the end of the text and stray closing brackets are ignored.
+    """
+    units = []
+    # Frames are [opener, finished child nodes, pieces of the current unit, explicit weight]
+    stack = [[None, [], [], None]]
+    start = 0
+    for match in TOKEN_PATTERN.finditer(text or ""):
+        token = match.group()
+        frame = stack[-1]
+        if token == ",":
+            if len(stack) == 1:
+                node = _finish_unit(frame[2])
+                if node is not None:
+                    units.append((text[start:match.start()].strip(), node))
+                frame[2] = []
+                start = match.end()
+            else:
+                node = _finish_unit(frame[2])
+                if node is not None:
+                    frame[1].append(node)
+                frame[2] = []
+        elif token in ("(", "["):
+            stack.append([token, [], [], None])
+        elif token in (")", "]"):
+            if len(stack) > 1 and stack[-1][0] == ("(" if token == ")" else "["):
+                node = _close_group(stack.pop())
+                if node is not None:
+                    stack[-1][2].append(node)
+        elif token[0] == ":" and len(token) > 1 and frame[0] == "(":
+            frame[3] = float(token[1:])
+        elif token[0] == "\\":
+            frame[2].append(token[1:])
+        else:
+            frame[2].append(token)
+    while len(stack) > 1:
+        node = _close_group(stack.pop())
+        if node is not None:
+            stack[-1][2].append(node)
+    node = _finish_unit(stack[0][2])
+    if node is not None:
+        units.append(((text or "")[start:].strip(), node))
+    return tuple(units)
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_terms(text):
+    """Tuple of (source text, dedup key, weight) per distinct top-level unit, first occurrence kept"""
+    terms = []
+    seen = set()
+    for source, node in parse_prompt(text):
+        key = term_key(node)
+        if key and key not in seen:
+            seen.add(key)
+            terms.append((source, key, node.weight))
+    return tuple(terms)
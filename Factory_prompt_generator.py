@@ -8,199 +8,422 @@ Works with all checkpoint types (Pony, SDXL, SD1.5, etc.)
 GitHub-compliant SFW content only
 """
 
-import json
-import os
-import random
+import sys
+
+try:
+    from .Factory_cache import cached_result, connected_outputs, input_hash
+    from .Factory_metrics import METRICS
+    from .Factory_random import PromptRandom, prompt_seed
+    from .Factory_rules import RULES_KEY, CompatibilityRules
+    from .Factory_tag_catalog import FrozenDict, FrozenList, catalog_version, get_catalog
+    from .Factory_prompt_ast import DEFAULT_SYNTAX, WEIGHT_SYNTAXES, emphasis_variants, parse_terms
+    from .Factory_prompt_spec import PROMPT_SPEC_TYPE, PromptSpec, apply_emphasis
+    from .Factory_tokens import CHUNK_TOKENS
+except ImportError:
+    from Factory_cache import cached_result, connected_outputs, input_hash
+    from Factory_metrics import METRICS
+    from Factory_random import PromptRandom, prompt_seed
+    from Factory_rules import RULES_KEY, CompatibilityRules
+    from Factory_tag_catalog import FrozenDict, FrozenList, catalog_version, get_catalog
+    from Factory_prompt_ast import DEFAULT_SYNTAX, WEIGHT_SYNTAXES, emphasis_variants, parse_terms
+    from Factory_prompt_spec import PROMPT_SPEC_TYPE, PromptSpec, apply_emphasis
+    from Factory_tokens import CHUNK_TOKENS
+
+EMPHASIS_LEVELS = ["low", "medium", "high", "very_high"]
+
+# Optional dropdown inputs, in widget order, with the catalog path(s) feeding each one
+TAG_DROPDOWNS = (
+    # Character Features
+    ("hair_color", (("character_features", "hair_colors"),)),
+    ("hair_length", (("character_features", "hair_lengths"),)),
+    ("hair_style", (("character_features", "hair_styles"),)),
+    ("eye_color", (("character_features", "eye_colors"),)),
+    ("skin_color", (("character_features", "skin_colors"),)),
+    ("expression", (("character_features", "expressions"),)),
+
+    # Separated Body Features
+    ("body_type", (("body_features", "body_types"),)),
+    ("chest_type", (("body_features", "chest_types"),)),
+    ("hip_type", (("body_features", "hip_types"),)),
+    ("leg_type", (("body_features", "leg_types"),)),
+
+    # SFW Poses only
+    ("pose", (("poses",),)),
+
+    # Multi-Character Position System (SFW only)
+    ("multi_char_position", (
+        ("multi_character_positions", "two_character", "casual"),
+        ("multi_character_positions", "two_character", "friendly"),
+        ("multi_character_positions", "two_character", "romantic"),
+        ("multi_character_positions", "three_character", "casual"),
+        ("multi_character_positions", "three_character", "friendly"),
+        ("multi_character_positions", "group_character", "social"),
+        ("multi_character_positions", "group_character", "collaborative"),
+    )),
+
+    # Individual Character Actions (SFW only)
+    ("character_1_action", (("individual_actions", "character_1"),)),
+    ("character_2_action", (("individual_actions", "character_2"),)),
+    ("character_3_action", (("individual_actions", "character_3"),)),
+
+    # Camera and Composition
+    ("camera_shot", (("technical", "camera_shots"),)),
+
+    # Locations
+    ("indoor_location", (("environments", "indoor"),)),
+    ("outdoor_location", (("environments", "outdoor"),)),
+    ("fantasy_location", (("environments", "fantasy"),)),
+
+    # Artistic Elements
+    ("lighting", (("lighting",),)),
+    ("emotion", (("emotions",),)),
+
+    # Clothing Categories (SFW only)
+    ("school_uniform_top", (("clothing", "school_uniform", "tops"),)),
+    ("school_uniform_bottom", (("clothing", "school_uniform", "bottoms"),)),
+    ("school_uniform_footwear", (("clothing", "school_uniform", "footwear"),)),
+    ("casual_top", (("clothing", "casual", "tops"),)),
+    ("casual_bottom", (("clothing", "casual", "bottoms"),)),
+    ("casual_dress", (("clothing", "casual", "dresses"),)),
+    ("formal_top", (("clothing", "formal", "tops"),)),
+    ("formal_bottom", (("clothing", "formal", "bottoms"),)),
+    ("formal_dress", (("clothing", "formal", "dresses"),)),
+    ("accessories", (("clothing", "accessories"),)),
+    ("underwear_top", (("clothing", "underwear", "tops", "items"),)),
+    ("underwear_top_color", (("clothing", "underwear", "tops", "colors"),)),
+    ("underwear_bottom", (("clothing", "underwear", "bottoms", "items"),)),
+    ("underwear_bottom_color", (("clothing", "underwear", "bottoms", "colors"),)),
+
+    # Technical Settings
+    ("quality", (("technical", "quality"),)),
+    ("composition", (("technical", "composition"),)),
+    ("color_scheme", (("technical", "color_schemes"),)),
+    ("time_period", (("technical", "time_periods"),)),
+    ("weather", (("technical", "weather"),)),
+    ("special_effects", (("technical", "special_effects"),)),
+    ("image_style", (("technical", "image_styles"),)),
+)
+DROPDOWN_PATHS = dict(TAG_DROPDOWNS)
+
+# Emphasis input that weights each tag input, by widget group
+INPUT_EMPHASIS = {
+    **dict.fromkeys(("hair_color", "hair_length", "hair_style", "eye_color", "skin_color", "expression",
+                     "body_type", "chest_type", "hip_type", "leg_type"), "character_emphasis"),
+    **dict.fromkeys(("pose", "character_1_action", "character_2_action", "character_3_action"), "pose_emphasis"),
+    **dict.fromkeys(("indoor_location", "outdoor_location", "fantasy_location"), "location_emphasis"),
+    **dict.fromkeys(("school_uniform_top", "school_uniform_bottom", "school_uniform_footwear", "casual_top",
+                     "casual_bottom", "casual_dress", "formal_top", "formal_bottom", "formal_dress",
+                     "accessories", "underwear_top", "underwear_top_color", "underwear_bottom",
+                     "underwear_bottom_color"), "clothing_emphasis"),
+    **dict.fromkeys(("camera_shot", "lighting", "emotion", "quality", "composition", "color_scheme",
+                     "time_period", "weather", "special_effects", "image_style"), "art_style_emphasis"),
+}
+
+# Summary labels that are not just the input name in title case
+INPUT_LABELS = {"multi_char_position": "Multi-Character Position"}
+
+
+def create_dropdown_options(tag_list):
+    """Create dropdown options with random + tags (SFW only, no 'none' option)"""
+    return ["random"] + list(tag_list)
+
+
+def build_input_types(catalog):
+    """Build the INPUT_TYPES structure once per catalog snapshot (dropdowns list core tags, so no pack is parsed)"""
+    optional = {}
+    for name, paths in TAG_DROPDOWNS:
+        tag_list = []
+        for path in paths:
+            tag_list.extend(catalog.core_category(path))
+        optional[name] = (FrozenList(create_dropdown_options(tag_list)), FrozenDict({"default": "random"}))
+
+    # Emphasis Controls - Add weight to specific categories
+    for name in EMPHASIS_INPUTS:
+        optional[name] = (FrozenList(EMPHASIS_LEVELS), FrozenDict({"default": "medium"}))
+
+    # Restrict random multi-character positions to ones that fit character_count/preference
+    optional["match_position_to_characters"] = ("BOOLEAN", FrozenDict({"default": False}))
+
+    optional["custom_elements"] = ("STRING", FrozenDict({"multiline": True, "default": ""}))
+
+    # CLIP token budget (0 = unlimited); chunk_breaks puts BREAK between 75-token chunks
+    optional["token_budget"] = ("INT", FrozenDict({"default": 0, "min": 0, "max": 10 * CHUNK_TOKENS,
+                                                  "step": 1}))
+    optional["chunk_breaks"] = ("BOOLEAN", FrozenDict({"default": False}))
+
+    # How emphasis is written: ((tag)), (tag:1.21) or without weights
+    optional["weight_syntax"] = (FrozenList(WEIGHT_SYNTAXES), FrozenDict({"default": DEFAULT_SYNTAX}))
+
+    return FrozenDict({
+        "required": FrozenDict({
+            "quality_level": (FrozenList(["high", "medium", "varied"]), FrozenDict({"default": "high"})),
+            "source_style": (FrozenList(["anime", "cartoon", "realistic", "photorealistic", "furry", "mixed"]), FrozenDict({"default": "anime"})),
+            "character_count": (FrozenList(CHARACTER_COUNTS), FrozenDict({"default": "1girl"})),
+            "character_preference": (FrozenList(CHARACTER_PREFERENCES), FrozenDict({"default": "single"})),
+            "clothing_style": (FrozenList(["school", "casual", "formal", "traditional", "fantasy", "mixed"]), FrozenDict({"default": "casual"})),
+            "location_type": (FrozenList(["indoor", "outdoor", "mixed"]), FrozenDict({"default": "indoor"})),
+            "include_artist": ("BOOLEAN", FrozenDict({"default": True})),
+            "seed": ("INT", FrozenDict({"default": 0, "min": 0, "max": 0xffffffffffffffff})),
+        }),
+        "optional": FrozenDict(optional),
+        # Workflow and node id, used to skip outputs nothing reads
+        "hidden": FrozenDict(HIDDEN_INPUTS),
+    })
+
+
+# Resolver kinds used by the compiled parameter table
+RESOLVE_TAG = 0
+RESOLVE_ARTIST = 1
+RESOLVE_MULTI_CHAR = 2
+# A tag input a pack adds tags to, resolved (and the pack parsed) when it is first drawn
+RESOLVE_PACK = 3
+
+HIDDEN_INPUTS = {"prompt": "PROMPT", "unique_id": "UNIQUE_ID"}
+
+# Rendered random steps kept per catalog snapshot (PromptSegments)
+SEGMENT_CACHE_SIZE = 65536
+
+EMPHASIS_INPUTS = ("character_emphasis", "pose_emphasis", "clothing_emphasis",
+                   "location_emphasis", "art_style_emphasis")
+
+QUALITY_CHOICES = ("masterpiece", "best_quality", "high_quality", "normal_quality")
+
+SOURCE_MAP = {
+    "anime": "source_anime",
+    "cartoon": "source_cartoon",
+    "realistic": "source_realistic",
+    "photorealistic": "source_pony",
+    "furry": "source_furry",
+    "mixed": "source_anime"
+}
+
+MULTI_CHAR_GROUPS = ("two_character", "three_character", "group_character")
+MULTI_CHAR_MOODS = ("casual", "friendly", "romantic", "social", "collaborative")
+
+CHARACTER_COUNTS = ("1girl", "1boy", "2girls", "2boys", "1girl_1boy", "3girls", "3boys", "2girls_1boy",
+                    "1girl_2boys", "4girls", "4boys", "5girls", "5boys", "6+girls", "6+boys",
+                    "multiple_girls", "multiple_boys", "crowd")
+CHARACTER_PREFERENCES = ("single", "couple", "group", "crowd")
+
+# Which position groups fit each character count / preference (single characters fit none)
+COUNT_POSITION_GROUPS = {
+    "1girl": (), "1boy": (),
+    "2girls": ("two_character",), "2boys": ("two_character",), "1girl_1boy": ("two_character",),
+    "3girls": ("three_character",), "3boys": ("three_character",),
+    "2girls_1boy": ("three_character",), "1girl_2boys": ("three_character",),
+}
+GROUP_COUNT_POSITION_GROUPS = ("group_character",)  # every larger count
+PREFERENCE_POSITION_GROUPS = {
+    "single": (),
+    "couple": ("two_character",),
+    "group": ("three_character", "group_character"),
+    "crowd": ("group_character",),
+}
+
+
+class MultiCharIndex:
+    """
+    Flat index of the multi-character positions, built once per catalog snapshot.
+    positions holds every distinct position, lookup maps position -> (group, mood),
+    and filtered holds the positions that fit each (character_count, character_preference).
+    """
+
+    def __init__(self, catalog):
+        lookup = {}
+        by_group = {group: [] for group in MULTI_CHAR_GROUPS}
+        for group in MULTI_CHAR_GROUPS:
+            for mood in MULTI_CHAR_MOODS:
+                for position in catalog.category(("multi_character_positions", group, mood)):
+                    if position not in lookup:
+                        lookup[position] = (group, mood)
+                        by_group[group].append(position)
+        self.lookup = lookup
+        self.positions = tuple(lookup)
+        self.by_group = {group: tuple(positions) for group, positions in by_group.items()}
+
+        self.filtered = {}
+        for count in CHARACTER_COUNTS:
+            count_groups = COUNT_POSITION_GROUPS.get(count, GROUP_COUNT_POSITION_GROUPS)
+            for preference in CHARACTER_PREFERENCES:
+                # The preference narrows the count's groups when the two overlap
+                groups = tuple(group for group in count_groups if group in PREFERENCE_POSITION_GROUPS[preference])
+                groups = groups or count_groups
+                self.filtered[(count, preference)] = tuple(
+                    position for group in groups for position in self.by_group[group])
+
+    def for_characters(self, character_count, character_preference):
+        """Positions that fit the characters; unknown combinations get every position"""
+        return self.filtered.get((character_count, character_preference), self.positions)
+
+
+def tag_source(name):
+    """
+    Work out how generate_prompts treats an optional input, from its name alone.
+    Returns (kind, catalog paths, display label, emphasis input, required input) or None
+    if the input does not contribute tags. Tag inputs read the same paths as their dropdown.
+    """
+    if name == "artist_style":
+        return (RESOLVE_ARTIST, (("artists",),), "Artist Style", "art_style_emphasis", None)
+    paths = DROPDOWN_PATHS.get(name)
+    if paths is None:
+        return None
+    label = INPUT_LABELS.get(name) or name.replace("_", " ").title()
+    if name == "multi_char_position":
+        return (RESOLVE_MULTI_CHAR, paths, label, None, None)
+    # Clothing colors only count when the matching clothing item is an input too
+    item = name[:-len("_color")] if name.endswith("_color") else None
+    return (RESOLVE_TAG, paths, label, INPUT_EMPHASIS[name], item if item in DROPDOWN_PATHS else None)
+
+
+def build_rules(catalog):
+    """Compile the catalog's compatibility rules over the node's input slots"""
+    slot_names = [name for name, _paths in TAG_DROPDOWNS] + ["artist_style"]
+    rules = CompatibilityRules(catalog.section(RULES_KEY), slot_names)
+    for name in rules.bits:
+        if name not in slot_names and tag_source(name) is None:
+            print(f"Compatibility rules name '{name}', which is not an input of the positive node", file=sys.stderr)
+    return rules
+
+
+def rule_inputs(quality_level, source_style, character_count, character_preference,
+                clothing_style, location_type, kwargs):
+    """Every input value a compatibility rule can look at"""
+    inputs = dict(kwargs)
+    inputs.update(quality_level=quality_level, source_style=source_style, character_count=character_count,
+                  character_preference=character_preference, clothing_style=clothing_style,
+                  location_type=location_type)
+    return inputs
+
+
+class PromptSegments(dict):
+    """
+    Rendered random steps of one catalog snapshot, so re-queuing with one widget changed
+    only recomputes that widget's segment. Maps (random stream key, input name, emphasis
+    level, weight syntax, id of the tag choices) -> (choices, tag index, prompt part,
+    summary line); the stored choices confirm the id still names the same tag list.
+    """
+
+    def segment(self, key, rng, choices, value, text, stream, syntax):
+        index = rng.first_index(stream, len(choices), getattr(choices, "alias", None))
+        tag = choices[index]
+        segment = (choices, index, emphasis_variants(value, syntax)[tag] if value is not None else tag,
+                   text.format(tag))
+        if len(self) >= SEGMENT_CACHE_SIZE:
+            self.clear()
+        self[key] = segment
+        return segment
+
+
+def resolve_paths(catalog, paths):
+    """Tag tuple of an input: its one catalog category, or its categories merged in order"""
+    if len(paths) == 1:
+        return catalog.category(paths[0])
+    return tuple(dict.fromkeys(tag for path in paths for tag in catalog.category(path)))
+
+
+class TagResolverTable(dict):
+    """
+    Compiled parameter dispatch for one catalog snapshot.
+    Maps input name -> (kind, tag tuple, label, emphasis input, required input) or None.
+    Every node input is resolved against the catalog when the table is built, and inputs
+    whose paths hold no tags are reported once, in a single message; names outside the
+    node's own inputs are compiled on first use and kept. Inputs a tag pack adds to are
+    RESOLVE_PACK entries holding their catalog paths until load_pack_input() resolves them.
+    """
+
+    def __init__(self, catalog):
+        super().__init__()
+        self.catalog = catalog
+        self.rules = catalog.derived("compat_rules", build_rules)
+        self.segments = PromptSegments()
+        self["artist_style"]
+        missing = []
+        for name, paths in TAG_DROPDOWNS:
+            source = self[name]
+            if source[0] == RESOLVE_PACK:
+                continue
+            if source[0] == RESOLVE_MULTI_CHAR:
+                empty = not any(catalog.owned_by_pack(path) for path in paths) and not self.multi_char.positions
+            else:
+                empty = not source[1]
+            if empty:
+                missing.append(f"{name} ({', '.join('/'.join(path) for path in paths)})")
+        self.missing = tuple(missing)
+        if missing:
+            print(f"Factory Prompts: {len(missing)} inputs have no tags in {catalog.path or 'the tag catalog'} "
+                  f"and are skipped when left on random: {'; '.join(missing)}", file=sys.stderr)
+
+    @property
+    def multi_char(self):
+        return self.catalog.derived("multi_char_index", MultiCharIndex)
+
+    def __missing__(self, name):
+        source = tag_source(name)
+        if source is not None:
+            kind, paths, label, emphasis_input, required_input = source
+            if kind == RESOLVE_TAG and any(self.catalog.owned_by_pack(path) for path in paths):
+                source = (RESOLVE_PACK, paths, label, emphasis_input, required_input)
+            else:
+                source = (kind, resolve_paths(self.catalog, paths), label, emphasis_input, required_input)
+        self[name] = source
+        return source
+
+    def load_pack_input(self, name):
+        """Resolve a RESOLVE_PACK input to its merged tags, parsing the packs it reads"""
+        kind, paths, label, emphasis_input, required_input = self[name]
+        if kind == RESOLVE_PACK:
+            self[name] = (RESOLVE_TAG, resolve_paths(self.catalog, paths), label, emphasis_input, required_input)
+        return self[name]
+
 
 class FactoryPromptsPositiveNode:
     """
     A streamlined node that uses JSON-based tags and accumulates selections into a prompt.
     Features separated body types and clothing color options.
     Works with all checkpoint types.
+    Tag data comes from the shared process-wide catalog, so instances are cheap.
     """
-    
-    def __init__(self):
-        # Load tags from JSON file
-        self.tags = self.load_tags()
-    
+
+    @property
+    def tags(self):
+        return get_catalog().tags
+
     def load_tags(self):
-        """Load tag data from JSON file"""
-        try:
-            json_path = os.path.join(os.path.dirname(__file__), "factory_tags.json")
-            with open(json_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading tags JSON: {e}")
-            return {}
-    
+        """Return tag data from the shared catalog (reloaded when the JSON changes)"""
+        return get_catalog().tags
+
     def create_dropdown_options(self, tag_list):
         """Create dropdown options with random + tags (SFW only, no 'none' option)"""
-        options = ["random"] + tag_list
-        return options
-    
+        return create_dropdown_options(tag_list)
+
     @classmethod
     def INPUT_TYPES(cls):
-        # Create instance to access tags
-        instance = cls()
-        tags = instance.tags
-        
-        return {
-            "required": {
-                "quality_level": (["high", "medium", "varied"], {"default": "high"}),
-                "source_style": (["anime", "cartoon", "realistic", "photorealistic", "furry", "mixed"], {"default": "anime"}),
-                "character_count": (["1girl", "1boy", "2girls", "2boys", "1girl_1boy", "3girls", "3boys", "2girls_1boy", "1girl_2boys", "4girls", "4boys", "5girls", "5boys", "6+girls", "6+boys", "multiple_girls", "multiple_boys", "crowd"], {"default": "1girl"}),
-                "character_preference": (["single", "couple", "group", "crowd"], {"default": "single"}),
-                "clothing_style": (["school", "casual", "formal", "traditional", "fantasy", "mixed"], {"default": "casual"}),
-                "location_type": (["indoor", "outdoor", "mixed"], {"default": "indoor"}),
-                "include_artist": ("BOOLEAN", {"default": True}),
-                "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff}),
-            },
-            "optional": {
-                # Character Features
-                "hair_color": (instance.create_dropdown_options(tags.get("character_features", {}).get("hair_colors", [])), {"default": "random"}),
-                "hair_length": (instance.create_dropdown_options(tags.get("character_features", {}).get("hair_lengths", [])), {"default": "random"}),
-                "hair_style": (instance.create_dropdown_options(tags.get("character_features", {}).get("hair_styles", [])), {"default": "random"}),
-                "eye_color": (instance.create_dropdown_options(tags.get("character_features", {}).get("eye_colors", [])), {"default": "random"}),
-                "skin_color": (instance.create_dropdown_options(tags.get("character_features", {}).get("skin_colors", [])), {"default": "random"}),
-                "expression": (instance.create_dropdown_options(
-                    tags.get("character_features", {}).get("expressions", [])
-                ), {"default": "random"}),
-                
-                # Separated Body Features
-                "body_type": (instance.create_dropdown_options(tags.get("body_features", {}).get("body_types", [])), {"default": "random"}),
-                "chest_type": (instance.create_dropdown_options(
-                    tags.get("body_features", {}).get("chest_types", [])
-                ), {"default": "random"}),
-                "hip_type": (instance.create_dropdown_options(
-                    tags.get("body_features", {}).get("hip_types", [])
-                ), {"default": "random"}),
-                "leg_type": (instance.create_dropdown_options(
-                    tags.get("body_features", {}).get("leg_types", [])
-                ), {"default": "random"}),
-                
-                # SFW Poses only
-                "pose": (instance.create_dropdown_options(
-                    tags.get("poses", [])
-                ), {"default": "random"}),
-                
-                # Multi-Character Position System (SFW only)
-                "multi_char_position": (instance.create_dropdown_options(
-                    tags.get("multi_character_positions", {}).get("two_character", {}).get("casual", []) +
-                    tags.get("multi_character_positions", {}).get("two_character", {}).get("friendly", []) +
-                    tags.get("multi_character_positions", {}).get("two_character", {}).get("romantic", []) +
-                    tags.get("multi_character_positions", {}).get("three_character", {}).get("casual", []) +
-                    tags.get("multi_character_positions", {}).get("three_character", {}).get("friendly", []) +
-                    tags.get("multi_character_positions", {}).get("group_character", {}).get("social", []) +
-                    tags.get("multi_character_positions", {}).get("group_character", {}).get("collaborative", [])
-                ), {"default": "random"}),
-                
-                # Individual Character Actions (SFW only)
-                "character_1_action": (instance.create_dropdown_options(
-                    tags.get("individual_actions", {}).get("character_1", [])
-                ), {"default": "random"}),
-                "character_2_action": (instance.create_dropdown_options(
-                    tags.get("individual_actions", {}).get("character_2", [])
-                ), {"default": "random"}),
-                "character_3_action": (instance.create_dropdown_options(
-                    tags.get("individual_actions", {}).get("character_3", [])
-                ), {"default": "random"}),
-                
-                # Camera and Composition
-                "camera_shot": (instance.create_dropdown_options(tags.get("technical", {}).get("camera_shots", [])), {"default": "random"}),
-                
-                # Locations
-                "indoor_location": (instance.create_dropdown_options(tags.get("environments", {}).get("indoor", [])), {"default": "random"}),
-                "outdoor_location": (instance.create_dropdown_options(tags.get("environments", {}).get("outdoor", [])), {"default": "random"}),
-                "fantasy_location": (instance.create_dropdown_options(tags.get("environments", {}).get("fantasy", [])), {"default": "random"}),
-                
-                # Artistic Elements
-                "lighting": (instance.create_dropdown_options(tags.get("lighting", [])), {"default": "random"}),
-                "emotion": (instance.create_dropdown_options(tags.get("emotions", [])), {"default": "random"}),
-                
-                # Clothing Categories (SFW only)
-                "school_uniform_top": (instance.create_dropdown_options(
-                    tags.get("clothing", {}).get("school_uniform", {}).get("tops", [])
-                ), {"default": "random"}),
-                "school_uniform_bottom": (instance.create_dropdown_options(
-                    tags.get("clothing", {}).get("school_uniform", {}).get("bottoms", [])
-                ), {"default": "random"}),
-                "school_uniform_footwear": (instance.create_dropdown_options(
-                    tags.get("clothing", {}).get("school_uniform", {}).get("footwear", [])
-                ), {"default": "random"}),
-                
-                "casual_top": (instance.create_dropdown_options(
-                    tags.get("clothing", {}).get("casual", {}).get("tops", [])
-                ), {"default": "random"}),
-                "casual_bottom": (instance.create_dropdown_options(
-                    tags.get("clothing", {}).get("casual", {}).get("bottoms", [])
-                ), {"default": "random"}),
-                "casual_dress": (instance.create_dropdown_options(
-                    tags.get("clothing", {}).get("casual", {}).get("dresses", [])
-                ), {"default": "random"}),
-                
-                "formal_top": (instance.create_dropdown_options(
-                    tags.get("clothing", {}).get("formal", {}).get("tops", [])
-                ), {"default": "random"}),
-                "formal_bottom": (instance.create_dropdown_options(
-                    tags.get("clothing", {}).get("formal", {}).get("bottoms", [])
-                ), {"default": "random"}),
-                "formal_dress": (instance.create_dropdown_options(
-                    tags.get("clothing", {}).get("formal", {}).get("dresses", [])
-                ), {"default": "random"}),
-                
-                "accessories": (instance.create_dropdown_options(
-                    tags.get("clothing", {}).get("accessories", [])
-                ), {"default": "random"}),
-                
-                "underwear_top": (instance.create_dropdown_options(
-                    tags.get("clothing", {}).get("underwear", {}).get("tops", {}).get("items", [])
-                ), {"default": "random"}),
-                "underwear_top_color": (instance.create_dropdown_options(tags.get("clothing", {}).get("underwear", {}).get("tops", {}).get("colors", [])), {"default": "random"}),
-                "underwear_bottom": (instance.create_dropdown_options(
-                    tags.get("clothing", {}).get("underwear", {}).get("bottoms", {}).get("items", [])
-                ), {"default": "random"}),
-                "underwear_bottom_color": (instance.create_dropdown_options(tags.get("clothing", {}).get("underwear", {}).get("bottoms", {}).get("colors", [])), {"default": "random"}),
-                
-                # Technical Settings
-                "quality": (instance.create_dropdown_options(tags.get("technical", {}).get("quality", [])), {"default": "random"}),
-                "composition": (instance.create_dropdown_options(tags.get("technical", {}).get("composition", [])), {"default": "random"}),
-                "color_scheme": (instance.create_dropdown_options(tags.get("technical", {}).get("color_schemes", [])), {"default": "random"}),
-                "time_period": (instance.create_dropdown_options(tags.get("technical", {}).get("time_periods", [])), {"default": "random"}),
-                "weather": (instance.create_dropdown_options(tags.get("technical", {}).get("weather", [])), {"default": "random"}),
-                "special_effects": (instance.create_dropdown_options(tags.get("technical", {}).get("special_effects", [])), {"default": "random"}),
-                "image_style": (instance.create_dropdown_options(tags.get("technical", {}).get("image_styles", [])), {"default": "random"}),
-                
-                # Emphasis Controls - Add weight to specific categories
-                "character_emphasis": (["low", "medium", "high", "very_high"], {"default": "medium"}),
-                "pose_emphasis": (["low", "medium", "high", "very_high"], {"default": "medium"}),
-                "clothing_emphasis": (["low", "medium", "high", "very_high"], {"default": "medium"}),
-                "location_emphasis": (["low", "medium", "high", "very_high"], {"default": "medium"}),
-                "art_style_emphasis": (["low", "medium", "high", "very_high"], {"default": "medium"}),
-                
-                "custom_elements": ("STRING", {"multiline": True, "default": ""}),
-            }
-        }
+        # Precomputed once per catalog version; treat the result as read-only
+        return get_catalog().derived("positive_input_types", build_input_types)
     
-    RETURN_TYPES = ("STRING", "STRING")
-    RETURN_NAMES = ("positive_prompt", "selection_summary")
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # Every seed is reproducible, so the output only changes with the inputs or the catalog
+        inputs = {name: value for name, value in kwargs.items() if name not in HIDDEN_INPUTS}
+        return input_hash(cls.__name__, catalog_version(), inputs)
+    
+    RETURN_TYPES = ("STRING", "STRING", PROMPT_SPEC_TYPE)
+    RETURN_NAMES = ("positive_prompt", "selection_summary", "prompt_spec")
     FUNCTION = "generate_prompts"
     CATEGORY = "Prompt Factory"
     
     def apply_emphasis(self, tag, emphasis_level):
         """Apply emphasis brackets to a tag based on emphasis level"""
-        if not tag:
-            return tag
-        elif emphasis_level == "low":
-            return f"({tag})"
-        elif emphasis_level == "high":
-            return f"(({tag}))"
-        elif emphasis_level == "very_high":
-            return f"((({tag})))"
-        else:  # medium or any other value
-            return tag
+        return apply_emphasis(tag, emphasis_level)
     
-    def add_tag(self, tag, category_name, random_choices=None, prompt_parts=None, selected_tags=None, emphasis_level="medium"):
-        """Helper function to add tags with proper handling (SFW only)"""
+    def add_tag(self, tag, category_name, random_choices=None, prompt_parts=None, selected_tags=None, emphasis_level="medium", rng=None):
+        """
+        Helper function to add tags with proper handling (SFW only).
+        Random tags are drawn from rng, a PromptRandom; without one they come from the seed 0 stream,
+        so results never depend on the global random module.
+        """
+        if rng is None:
+            rng = PromptRandom(0)
         if prompt_parts is None:
             prompt_parts = []
         if selected_tags is None:
@@ -214,7 +437,8 @@ class FactoryPromptsPositiveNode:
                 all_choices = random_choices
                 
             if all_choices:
-                chosen_tag = random.choice(all_choices)
+                # Weighted categories (WeightedTags) draw through their alias table
+                chosen_tag = rng.choice(all_choices)
                 emphasized_tag = self.apply_emphasis(chosen_tag, emphasis_level)
                 prompt_parts.append(emphasized_tag)
                 selected_tags.append(f"{category_name}: {chosen_tag} (random)" + (f" [emphasized: {emphasis_level}]" if emphasis_level != "medium" else ""))
@@ -223,208 +447,335 @@ class FactoryPromptsPositiveNode:
             prompt_parts.append(emphasized_tag)
             selected_tags.append(f"{category_name}: {tag}" + (f" [emphasized: {emphasis_level}]" if emphasis_level != "medium" else ""))
     
-    def generate_prompts(self, quality_level, source_style, character_count, character_preference, 
-                        clothing_style, location_type, include_artist, seed, **kwargs):
+    def build_prompt_plan(self, quality_level, source_style, character_count, character_preference,
+                          include_artist, kwargs, resolvers=None, disabled=0):
+        """
+        Resolve the inputs into an ordered plan of prompt steps.
+        Fixed steps are (None, prompt parts, summary line, input name); random steps are
+        (tag choices, emphasis level or None, summary template with {} for the tag,
+        input name, which also names the random substream the step draws from).
+        disabled is a compatibility rule mask: inputs whose bit is set are skipped
+        while they are left on "random".
+        """
+        # Compiled dispatch table for the current catalog snapshot
+        if resolvers is None:
+            resolvers = get_catalog().derived("positive_tag_resolvers", TagResolverTable)
+        syntax = kwargs.get("weight_syntax", DEFAULT_SYNTAX)
+        plan = []
         
-        # Set random seed for reproducible results
-        if seed != 0:
-            random.seed(seed)
-        
-        prompt_parts = []
-        selected_tags = []  # To track what was selected for user feedback
-        
-        # Extract emphasis levels from kwargs
-        character_emphasis = kwargs.get("character_emphasis", "medium")
-        pose_emphasis = kwargs.get("pose_emphasis", "medium")
-        clothing_emphasis = kwargs.get("clothing_emphasis", "medium")
-        location_emphasis = kwargs.get("location_emphasis", "medium")
-        art_style_emphasis = kwargs.get("art_style_emphasis", "medium")
+        # Extract emphasis levels from kwargs, with their summary suffix and rendered tag variants
+        emphasis = {}
+        for emphasis_input in EMPHASIS_INPUTS:
+            level = kwargs.get(emphasis_input, "medium")
+            emphasis[emphasis_input] = (level, f" [emphasized: {level}]" if level != "medium" else "",
+                                        emphasis_variants(level, syntax))
         
         # Add quality tags based on level (always included)
         if quality_level == "high":
-            prompt_parts.extend(["masterpiece", "best_quality", "high_quality"])
-            selected_tags.append("Quality Level: high (masterpiece, best_quality, high_quality)")
+            plan.append((None, ("masterpiece", "best_quality", "high_quality"),
+                         "Quality Level: high (masterpiece, best_quality, high_quality)", "quality_level"))
         elif quality_level == "medium":
-            prompt_parts.extend(["best_quality", "high_quality"])
-            selected_tags.append("Quality Level: medium (best_quality, high_quality)")
+            plan.append((None, ("best_quality", "high_quality"), "Quality Level: medium (best_quality, high_quality)",
+                         "quality_level"))
         elif quality_level == "varied":
-            quality_choice = random.choice(["masterpiece", "best_quality", "high_quality", "normal_quality"])
-            prompt_parts.append(quality_choice)
-            selected_tags.append(f"Quality Level: varied ({quality_choice})")
+            plan.append((QUALITY_CHOICES, None, "Quality Level: varied ({})", "quality_level"))
         
         # Required parameters - always add since "none" option removed
-        source_map = {
-            "anime": "source_anime",
-            "cartoon": "source_cartoon", 
-            "realistic": "source_realistic",
-            "photorealistic": "source_pony",
-            "furry": "source_furry",
-            "mixed": "source_anime"
-        }
-        if source_style in source_map:
-            prompt_parts.append(source_map[source_style])
-            selected_tags.append(f"Source Style: {source_style}")
+        if source_style in SOURCE_MAP:
+            plan.append((None, (SOURCE_MAP[source_style],), f"Source Style: {source_style}", "source_style"))
         
-        prompt_parts.append(character_count)
-        selected_tags.append(f"Character Count: {character_count}")
+        plan.append((None, (character_count,), f"Character Count: {character_count}", "character_count"))
         
-        # Process all optional parameters
+        # Process all optional parameters through the compiled table
+        slot_bits = resolvers.rules.bits
         for param_name, param_value in kwargs.items():
-                
-            # Handle clothing color pairs for tops and bottoms
-            if param_name.endswith("_color"):
-                clothing_item = param_name.replace("_color", "")
-                if clothing_item in kwargs:
-                    # Handle accessories color separately
-                    if clothing_item == "accessories":
-                        self.add_tag(param_value, "Accessories Color", 
-                                   self.tags.get("clothing", {}).get("accessories", {}).get("colors", []),
-                                   prompt_parts, selected_tags, clothing_emphasis)
-                        continue
-                    
-                    # Extract category and type (top/bottom)
-                    if "_top" in clothing_item:
-                        category = clothing_item.replace("_top", "")
-                        item_type = "tops"
-                    elif "_bottom" in clothing_item:
-                        category = clothing_item.replace("_bottom", "")
-                        item_type = "bottoms"
-                    else:
-                        continue
-                    
-                    # Only add color if the clothing item was also selected
-                    self.add_tag(param_value, f"{clothing_item.replace('_', ' ').title()} Color", 
-                               self.tags.get("clothing", {}).get(category, {}).get(item_type, {}).get("colors", []),
-                               prompt_parts, selected_tags, clothing_emphasis)
+            resolver = resolvers[param_name]
+            if resolver is None:
                 continue
+            kind, choices, label, emphasis_input, required_input = resolver
+            if disabled and param_value == "random":
+                # Skipped by a compatibility rule (directly or through the item a color belongs to)
+                if disabled & slot_bits.get(param_name, 0) or (
+                        required_input is not None and disabled & slot_bits.get(required_input, 0)):
+                    continue
             
-            # Handle regular parameters
-            if param_name in ["hair_color", "hair_length", "hair_style", "eye_color", "skin_color"]:
-                self.add_tag(param_value, param_name.replace("_", " ").title(),
-                           self.tags.get("character_features", {}).get(param_name.replace("_", "_") + "s", []),
-                           prompt_parts, selected_tags, character_emphasis)
-            
-            elif param_name == "expression":
-                self.add_tag(param_value, "Expression",
-                           self.tags.get("character_features", {}).get("expressions", {}),
-                           prompt_parts, selected_tags, character_emphasis)
-            
-            elif param_name in ["body_type", "chest_type", "hip_type", "leg_type"]:
-                self.add_tag(param_value, param_name.replace("_", " ").title(),
-                           self.tags.get("body_features", {}).get(param_name + "s", {}),
-                           prompt_parts, selected_tags, character_emphasis)
-            
-            elif param_name == "pose":
-                # Handle SFW poses only
-                self.add_tag(param_value, "Pose",
-                           self.tags.get("poses", []),
-                           prompt_parts, selected_tags, pose_emphasis)
-            
-            elif param_name == "multi_char_position":
-                # Handle multi-character positions
-                # Check which category this position belongs to and add appropriate logic
-                multi_char_tags = self.tags.get("multi_character_positions", {})
-                
-                # Check all categories to find where this position belongs
-                found_position = False
-                for char_count in ["two_character", "three_character", "group_character"]:
-                    for mood_type in ["casual", "friendly", "romantic", "social", "collaborative"]:
-                        positions = multi_char_tags.get(char_count, {}).get(mood_type, [])
-                        if param_value in positions or param_value == "random":
-                                if param_value == "random":
-                                    # For random, use only SFW positions
-                                    all_positions = []
-                                    for ct in ["two_character", "three_character", "group_character"]:
-                                        for mt in ["casual", "friendly", "romantic", "social", "collaborative"]:
-                                            all_positions.extend(multi_char_tags.get(ct, {}).get(mt, []))
-                                    
-                                    if all_positions:
-                                        chosen_position = random.choice(all_positions)
-                                        prompt_parts.append(chosen_position)
-                                        selected_tags.append(f"Multi-Character Position: {chosen_position} (random)")
-                                else:
-                                    prompt_parts.append(param_value)
-                                    selected_tags.append(f"Multi-Character Position: {param_value}")
-                                found_position = True
-                                break
-                        if found_position:
-                            break
-            
-            elif param_name in ["character_1_action", "character_2_action", "character_3_action"]:
-                # Handle individual character actions
-                char_num = param_name.split("_")[1]
-                self.add_tag(param_value, f"Character {char_num} Action",
-                           self.tags.get("individual_actions", {}).get(f"character_{char_num}", {}),
-                           prompt_parts, selected_tags, pose_emphasis)
-            
-            elif param_name in ["indoor_location", "outdoor_location"]:
-                location_key = param_name.split("_")[0]
-                self.add_tag(param_value, param_name.replace("_", " ").title(),
-                           self.tags.get("locations", {}).get(location_key, []),
-                           prompt_parts, selected_tags, location_emphasis)
-            
-            elif param_name in ["camera_shot", "art_style", "lighting"]:
-                tech_key = param_name + "s" if not param_name.endswith("s") else param_name
-                self.add_tag(param_value, param_name.replace("_", " ").title(),
-                           self.tags.get("technical", {}).get(tech_key, []),
-                           prompt_parts, selected_tags, art_style_emphasis)
-            
-            elif param_name == "artist_style" and include_artist:
-                self.add_tag(param_value, "Artist Style",
-                           self.tags.get("artists", []),
-                           prompt_parts, selected_tags, art_style_emphasis)
+            if kind == RESOLVE_MULTI_CHAR:
+                # One position, drawn from the flat (optionally character-filtered) index
+                multi_char = resolvers.multi_char
+                if param_value == "random":
+                    if kwargs.get("match_position_to_characters", False):
+                        positions = multi_char.for_characters(character_count, character_preference)
+                    else:
+                        positions = multi_char.positions
+                    if positions:
+                        plan.append((positions, None, f"{label}: {{}} (random)", param_name))
+                elif param_value in multi_char.lookup:
+                    plan.append((None, (param_value,), f"{label}: {param_value}", param_name))
+                continue
             
-            # Handle clothing items with new top/bottom structure
-            elif ("_top" in param_name or "_bottom" in param_name) and not param_name.endswith("_color"):
-                # Extract category and type (top/bottom)
-                if "_top" in param_name:
-                    category = param_name.replace("_top", "")
-                    item_type = "tops"
-                elif "_bottom" in param_name:
-                    category = param_name.replace("_bottom", "")
-                    item_type = "bottoms"
-                
-                if category in ["school_uniform", "casual_wear", "formal_wear", "traditional_wear", 
-                              "fantasy_wear", "swimwear", "sports_wear", "underwear"]:
-                    self.add_tag(param_value, param_name.replace("_", " ").title(),
-                               self.tags.get("clothing", {}).get(category, {}).get(item_type, {}),
-                               prompt_parts, selected_tags, clothing_emphasis)
+            if required_input is not None and required_input not in kwargs:
+                continue
+            if kind == RESOLVE_ARTIST and not include_artist:
+                continue
             
-            # Handle accessories (still uses old structure)
-            elif param_name == "accessories":
-                self.add_tag(param_value, "Accessories",
-                           self.tags.get("clothing", {}).get("accessories", {}),
-                           prompt_parts, selected_tags, clothing_emphasis)
+            if kind == RESOLVE_PACK and param_value == "random":
+                # Pack tags are parsed the first time the input is drawn
+                kind, choices, label, emphasis_input, required_input = resolvers.load_pack_input(param_name)
             
-            elif param_name in ["quality", "composition", "color_scheme", "time_period", 
-                              "weather", "special_effects", "image_style"]:
-                tech_key = param_name + "s" if param_name in ["quality", "composition"] else param_name.replace("_", "_") + "s"
-                self.add_tag(param_value, param_name.replace("_", " ").title(),
-                           self.tags.get("technical", {}).get(tech_key, []),
-                           prompt_parts, selected_tags, art_style_emphasis)
+            level, suffix, variants = emphasis[emphasis_input]
+            if param_value == "random":
+                # Inputs without catalog tags have nothing to draw from
+                if choices:
+                    plan.append((choices, level, f"{label}: {{}} (random){suffix}", param_name))
+            else:
+                plan.append((None, (variants[param_value],), f"{label}: {param_value}{suffix}", param_name))
         
         # Add custom elements if provided
         custom_elements = kwargs.get("custom_elements", "")
         if custom_elements and custom_elements.strip():
-            custom_list = [elem.strip() for elem in custom_elements.split(',') if elem.strip()]
-            prompt_parts.extend(custom_list)
-            selected_tags.append(f"Custom Elements: {', '.join(custom_list)}")
+            # Weighted groups such as (red hair, blue eyes:1.2) stay whole; repeats are dropped
+            custom_list = [source for source, _key, _weight in parse_terms(custom_elements)]
+            plan.append((None, tuple(custom_list), f"Custom Elements: {', '.join(custom_list)}", "custom_elements"))
+        
+        return plan
+    
+    @cached_result(version=catalog_version, outputs=True)
+    def generate_prompts(self, quality_level, source_style, character_count, character_preference, 
+                        clothing_style, location_type, include_artist, seed, outputs=None, **kwargs):
+        """
+        (positive_prompt, selection_summary, prompt_spec). outputs is the set of output
+        indices the workflow reads (from the hidden PROMPT/UNIQUE_ID inputs, None = all);
+        string outputs outside it come back empty and are never built.
+        """
+        node_name = type(self).__name__
+        started = METRICS.start(node_name)
+        
+        # Private random stream for this seed; each random step draws from its own substream
+        rng = PromptRandom(seed)
+        resolvers = get_catalog().derived("positive_tag_resolvers", TagResolverTable)
+        if started:
+            started = METRICS.lap(node_name, "catalog", started)
         
-        # Join everything
-        positive_prompt = ", ".join(prompt_parts)
+        # Compatibility rules decide which random inputs take part before anything is drawn
+        rules = resolvers.rules
+        disabled = 0
+        if rules.slot_masks or rules.groups:
+            disabled = rules.disabled_slots(rule_inputs(quality_level, source_style, character_count,
+                                                        character_preference, clothing_style, location_type,
+                                                        kwargs), rng)
         
-        # Create summary of selections for user feedback
-        selections_summary = "\n".join(selected_tags)
+        plan = self.build_prompt_plan(quality_level, source_style, character_count, character_preference,
+                                      include_artist, kwargs, resolvers, disabled)
+        if started:
+            started = METRICS.lap(node_name, "dispatch", started)
+        
+        # Random steps whose input, emphasis and substream are unchanged since an earlier call are reused
+        segments = resolvers.segments
+        rng_key = rng.key
+        syntax = kwargs.get("weight_syntax", DEFAULT_SYNTAX)
+        token_budget = kwargs.get("token_budget", 0)
+        if outputs is None and not token_budget and not started:
+            # Every output is read: sample and render in a single pass
+            picks = []
+            prompt_parts = []
+            selected_tags = []  # To track what was selected for user feedback
+            for choices, value, text, stream in plan:
+                if choices is None:
+                    picks.append(None)
+                    prompt_parts.extend(value)
+                    selected_tags.append(text)
+                else:
+                    key = (rng_key, stream, value, syntax, id(choices))
+                    segment = segments.get(key)
+                    if segment is None or segment[0] is not choices:
+                        segment = segments.segment(key, rng, choices, value, text, stream, syntax)
+                    picks.append(segment[1])
+                    prompt_parts.append(segment[2])
+                    selected_tags.append(segment[3])
+            spec = PromptSpec(plan, picks, syntax=syntax, catalog=resolvers.catalog)
+            return (", ".join(prompt_parts), "\n".join(selected_tags), spec)
+        
+        # The spec is just the plan plus one tag index per random step; strings are rendered from it
+        picks = []
+        for choices, value, text, stream in plan:
+            if choices is None:
+                picks.append(None)
+                continue
+            key = (rng_key, stream, value, syntax, id(choices))
+            segment = segments.get(key)
+            if segment is None or segment[0] is not choices:
+                segment = segments.segment(key, rng, choices, value, text, stream, syntax)
+            picks.append(segment[1])
+        spec = PromptSpec(plan, picks, token_budget, kwargs.get("chunk_breaks", False), syntax, resolvers.catalog)
+        if started:
+            started = METRICS.lap(node_name, "sampling", started)
+            return self.render_spec_timed(spec, outputs, node_name, started)
+        
+        positive_prompt = spec.render() if outputs is None or 0 in outputs else ""
+        selections_summary = spec.summary() if outputs is None or 1 in outputs else ""
+        return (positive_prompt, selections_summary, spec)
+    
+    def render_spec_timed(self, spec, outputs, node_name, started):
+        """String outputs of spec, with emphasis, join and summary timed separately (metrics enabled)"""
+        positive_prompt = ""
+        if outputs is None or 0 in outputs:
+            parts = spec.parts()
+            started = METRICS.lap(node_name, "emphasis", started)
+            positive_prompt = spec.render(parts)
+            started = METRICS.lap(node_name, "join", started)
+        
+        selections_summary = ""
+        if outputs is None or 1 in outputs:
+            selections_summary = spec.summary()
+            METRICS.lap(node_name, "summary", started)
+        return (positive_prompt, selections_summary, spec)
+    
+    def generate_batch(self, quality_level, source_style, character_count, character_preference,
+                       clothing_style, location_type, include_artist, seed, batch_size=16, prompt=None,
+                       unique_id=None, **kwargs):
+        """
+        Generate batch_size prompts, selection summaries and prompt specs in one call.
+        Every random step is drawn for the whole batch at once as an index column,
+        and each distinct pick is rendered only once.
+        Prompt i is identical to generate_prompts() with seed + i.
+        """
+        seeds = [prompt_seed(seed, i) for i in range(max(1, int(batch_size)))]
+        return self.generate_for_seeds(seeds, quality_level, source_style, character_count, character_preference,
+                                       clothing_style, location_type, include_artist,
+                                       connected_outputs(prompt, unique_id), **kwargs)
+    
+    def generate_for_seeds(self, seeds, quality_level, source_style, character_count, character_preference,
+                           clothing_style, location_type, include_artist, outputs=None, **kwargs):
+        """
+        (prompts, summaries, specs) for an arbitrary list of seeds, all sharing one set of inputs.
+        Prompt i is identical to generate_prompts() with seeds[i].
+        """
+        token_budget = kwargs.get("token_budget", 0)
+        chunk_breaks = kwargs.get("chunk_breaks", False)
+        syntax = kwargs.get("weight_syntax", DEFAULT_SYNTAX)
+        count = len(seeds)
+        streams = [PromptRandom(seed) for seed in seeds]
+        resolvers = get_catalog().derived("positive_tag_resolvers", TagResolverTable)
         
-        # Return positive prompt and selection summary
-        return (positive_prompt, selections_summary)
+        rules = resolvers.rules
+        disabled, open_groups = 0, ()
+        if rules.slot_masks or rules.groups:
+            disabled, open_groups = rules.resolve(rule_inputs(quality_level, source_style, character_count,
+                                                              character_preference, clothing_style,
+                                                              location_type, kwargs))
+        if not open_groups:
+            plan = self.build_prompt_plan(quality_level, source_style, character_count, character_preference,
+                                          include_artist, kwargs, resolvers, disabled)
+            return self.render_batch(plan, streams, token_budget, chunk_breaks, outputs, syntax, resolvers.catalog)
+        
+        # Rule choices split the batch into groups that share a plan
+        pick_columns = [PromptRandom.first_indices(streams, stream, len(candidates))
+                        for candidates, stream in open_groups]
+        groups = {}
+        for i in range(count):
+            mask = disabled | rules.unchosen(open_groups, [column[i] for column in pick_columns])
+            groups.setdefault(mask, []).append(i)
+        
+        prompts = [None] * count
+        summaries = [None] * count
+        specs = [None] * count
+        for mask, positions in groups.items():
+            plan = self.build_prompt_plan(quality_level, source_style, character_count, character_preference,
+                                          include_artist, kwargs, resolvers, mask)
+            group_outputs = self.render_batch(plan, [streams[i] for i in positions], token_budget, chunk_breaks,
+                                              outputs, syntax, resolvers.catalog)
+            for i, prompt_text, summary, spec in zip(positions, *group_outputs):
+                prompts[i] = prompt_text
+                summaries[i] = summary
+                specs[i] = spec
+        return (prompts, summaries, specs)
+    
+    def render_batch(self, plan, streams, token_budget=0, chunk_breaks=False, outputs=None, syntax=DEFAULT_SYNTAX,
+                     catalog=None):
+        """
+        Render one plan for every stream; random steps are drawn as whole index columns.
+        String outputs missing from outputs (None = all) are returned as empty strings.
+        catalog is the snapshot the plan was built from.
+        """
+        count = len(streams)
+        plan = tuple(plan)
+        columns = [None if choices is None else
+                   PromptRandom.first_indices(streams, stream, len(choices), getattr(choices, "alias", None))
+                   for choices, value, text, stream in plan]
+        specs = [PromptSpec(plan, picks, token_budget, chunk_breaks, syntax, catalog)
+                 for picks in zip(*(column or [None] * count for column in columns))]
+        
+        prompts = [""] * count
+        summaries = [""] * count
+        if token_budget:
+            if outputs is None or 0 in outputs:
+                prompts = [spec.render() for spec in specs]
+            if outputs is None or 1 in outputs:
+                summaries = [spec.summary() for spec in specs]
+            return (prompts, summaries, specs)
+        
+        def join_columns(render_pick, separator, fixed_items):
+            # Each distinct pick of a column is rendered once
+            rendered_columns = []
+            for (choices, value, text, stream), column in zip(plan, columns):
+                if column is None:
+                    rendered_columns.append(None)
+                    continue
+                rendered = {index: render_pick(choices[index], value, text) for index in set(column)}
+                rendered_columns.append([rendered[index] for index in column])
+            results = []
+            for i in range(count):
+                items = []
+                for step, column in zip(plan, rendered_columns):
+                    if column is None:
+                        items.extend(fixed_items(step))
+                    else:
+                        items.append(column[i])
+                results.append(separator.join(items))
+            return results
+        
+        if outputs is None or 0 in outputs:
+            prompts = join_columns(lambda tag, value, text: emphasis_variants(value, syntax)[tag]
+                                   if value is not None else tag, ", ", lambda step: step[1])
+        if outputs is None or 1 in outputs:
+            summaries = join_columns(lambda tag, value, text: text.format(tag), "\n", lambda step: (step[2],))
+        return (prompts, summaries, specs)
+
+
+def build_batch_input_types(catalog):
+    """Positive INPUT_TYPES plus the batch size"""
+    input_types = catalog.derived("positive_input_types", build_input_types)
+    required = dict(input_types["required"])
+    required["batch_size"] = ("INT", FrozenDict({"default": 16, "min": 1, "max": 100000}))
+    return FrozenDict({"required": FrozenDict(required), "optional": input_types["optional"],
+                       "hidden": input_types["hidden"]})
+
+
+class FactoryPromptsPositiveBatchNode(FactoryPromptsPositiveNode):
+    """
+    Batch variant of the positive generator.
+    Produces batch_size prompts and summaries as list outputs in a single execution,
+    so downstream nodes run once per prompt without re-queuing this node.
+    """
+    
+    @classmethod
+    def INPUT_TYPES(cls):
+        return get_catalog().derived("positive_batch_input_types", build_batch_input_types)
+    
+    RETURN_TYPES = ("STRING", "STRING", PROMPT_SPEC_TYPE)
+    RETURN_NAMES = ("positive_prompts", "selection_summaries", "prompt_specs")
+    OUTPUT_IS_LIST = (True, True, True)
+    FUNCTION = "generate_batch"
+    CATEGORY = "Prompt Factory"
 
 
 # Node registration
 NODE_CLASS_MAPPINGS = {
-    "FactoryPromptsPositive": FactoryPromptsPositiveNode
+    "FactoryPromptsPositive": FactoryPromptsPositiveNode,
+    "FactoryPromptsPositiveBatch": FactoryPromptsPositiveBatchNode
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
-    "FactoryPromptsPositive": "Factory Prompts Generator (Positive)"
+    "FactoryPromptsPositive": "Factory Prompts Generator (Positive)",
+    "FactoryPromptsPositiveBatch": "Factory Prompts Generator (Positive Batch)"
 }
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+"""
+Factory Prompt Space - Random access to every prompt a set of node inputs can produce
+The random steps of a prompt plan form a mixed-radix number: step k is a digit with
+radix len(choices_k), so each distinct prompt has exactly one integer index in
+[0, size). When compatibility rules leave alternatives open (e.g. dress or top and
+bottom), each alternative has its own plan and the space is their concatenation.
+decode() turns an index back into a prompt in O(steps), and a keyed
+permutation of the index space draws unique prompts without replacement and without
+remembering what was already produced.
+
+Usage:
+    space = PromptSpace(**positive_node_inputs)
+    space.size                                   # number of distinct prompts
+    prompt, summary = space.decode(12345)
+    for index, prompt, summary in space.sample_unique(1000000, key=7):
+        ...
+"""
+
+import bisect
+import hashlib
+import itertools
+
+try:
+    from .Factory_prompt_generator import FactoryPromptsPositiveNode, TagResolverTable, rule_inputs
+    from .Factory_prompt_ast import DEFAULT_SYNTAX
+    from .Factory_prompt_spec import PromptSpec
+    from .Factory_tag_catalog import get_catalog
+    from .Factory_random import GOLDEN, MASK64, SEED_SALT, mix
+except ImportError:
+    from Factory_prompt_generator import FactoryPromptsPositiveNode, TagResolverTable, rule_inputs
+    from Factory_prompt_ast import DEFAULT_SYNTAX
+    from Factory_prompt_spec import PromptSpec
+    from Factory_tag_catalog import get_catalog
+    from Factory_random import GOLDEN, MASK64, SEED_SALT, mix
+
+FEISTEL_ROUNDS = 6
+
+# Largest Feistel half the blake2b round function can fill (64-byte digest)
+MAX_HALF_BITS = 512
+
+
+class KeyedPermutation:
+    """
+    Bijection of [0, size) selected by an integer key.
+    A balanced Feistel network permutes the smallest even-bit power of two covering
+    size; values that land outside the range are re-encrypted (cycle walking), which
+    takes fewer than four rounds of the network on average.
+    """
+
+    def __init__(self, size, key=0):
+        if size < 1:
+            raise ValueError("permutation size must be positive")
+        self.size = size
+        self.half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+        if self.half_bits > MAX_HALF_BITS:
+            raise ValueError(f"prompt space of {size} is too large to permute")
+        self.half_mask = (1 << self.half_bits) - 1
+        self.round_keys = tuple(mix(((key & MASK64) ^ SEED_SALT) + (i + 1) * GOLDEN & MASK64)
+                                for i in range(FEISTEL_ROUNDS))
+        self._digest_size = (self.half_bits + 7) // 8
+
+    def _round(self, value, round_key):
+        if self.half_bits <= 64:
+            return mix((value ^ round_key) & MASK64) & self.half_mask
+        data = value.to_bytes(self._digest_size, 'little')
+        digest = hashlib.blake2b(data, digest_size=self._digest_size, key=round_key.to_bytes(8, 'little')).digest()
+        return int.from_bytes(digest, 'little') & self.half_mask
+
+    def _encrypt(self, value):
+        half_bits, half_mask = self.half_bits, self.half_mask
+        left, right = value >> half_bits, value & half_mask
+        for round_key in self.round_keys:
+            left, right = right, left ^ self._round(right, round_key)
+        return (left << half_bits) | right
+
+    def __getitem__(self, position):
+        if not 0 <= position < self.size:
+            raise IndexError("permutation position out of range")
+        value = self._encrypt(position)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+    def __len__(self):
+        return self.size
+
+
+class PlanSpace:
+    """Mixed-radix index space of one prompt plan"""
+
+    def __init__(self, plan):
+        self.plan = [step if step[0] is None else (tuple(dict.fromkeys(step[0])),) + tuple(step[1:])
+                     for step in plan]
+        self.radices = tuple(len(choices) for choices, _value, _text, _stream in self.plan if choices is not None)
+        size = 1
+        for radix in self.radices:
+            size *= radix
+        self.size = size
+
+    def digits(self, index):
+        digits = []
+        for radix in self.radices:
+            index, digit = divmod(index, radix)
+            digits.append(digit)
+        return digits
+
+
+class PromptSpace:
+    """
+    The prompt space of one set of positive node inputs (the seed is ignored).
+    Each random step is a digit; the first random step is the least significant.
+    Duplicate tags within a step are collapsed, so distinct indices give distinct prompts.
+    """
+
+    def __init__(self, quality_level, source_style, character_count, character_preference,
+                 clothing_style, location_type, include_artist, seed=None, **kwargs):
+        self.node = FactoryPromptsPositiveNode()
+        self.syntax = kwargs.get("weight_syntax", DEFAULT_SYNTAX)
+        self.token_budget = kwargs.get("token_budget", 0)
+        self.chunk_breaks = kwargs.get("chunk_breaks", False)
+        resolvers = get_catalog().derived("positive_tag_resolvers", TagResolverTable)
+        self.catalog = resolvers.catalog
+        rules = resolvers.rules
+        disabled, open_groups = rules.resolve(rule_inputs(quality_level, source_style, character_count,
+                                                          character_preference, clothing_style, location_type,
+                                                          kwargs))
+
+        # One plan per combination of open rule alternatives
+        masks = dict.fromkeys(
+            disabled | rules.unchosen(open_groups, picks)
+            for picks in itertools.product(*(range(len(candidates)) for candidates, _stream in open_groups)))
+        self.spaces = [PlanSpace(self.node.build_prompt_plan(quality_level, source_style, character_count,
+                                                             character_preference, include_artist, kwargs,
+                                                             resolvers, mask))
+                       for mask in masks]
+        self.starts = []
+        size = 0
+        for space in self.spaces:
+            self.starts.append(size)
+            size += space.size
+        self.size = size
+
+    @property
+    def plan(self):
+        """Plan of the first rule alternative (the only one when no alternatives are open)"""
+        return self.spaces[0].plan
+
+    @property
+    def radices(self):
+        return self.spaces[0].radices
+
+    def __len__(self):
+        return self.size
+
+    def locate(self, index):
+        """(plan space, index within it) for a prompt index"""
+        if not 0 <= index < self.size:
+            raise IndexError(f"prompt index {index} outside a space of {self.size}")
+        segment = bisect.bisect_right(self.starts, index) - 1
+        return self.spaces[segment], index - self.starts[segment]
+
+    def digits(self, index):
+        """Mixed-radix digits of index within its plan, one per random step"""
+        space, index = self.locate(index)
+        return space.digits(index)
+
+    def index_of(self, digits, segment=0):
+        """Inverse of digits() for the plan of rule alternative segment"""
+        index = 0
+        for radix, digit in zip(reversed(self.spaces[segment].radices), reversed(digits)):
+            index = index * radix + digit
+        return self.starts[segment] + index
+
+    def spec(self, index):
+        """PromptSpec of the prompt with this index"""
+        space, index = self.locate(index)
+        digits = iter(space.digits(index))
+        return PromptSpec(space.plan, [None if choices is None else next(digits)
+                                       for choices, _value, _text, _category in space.plan],
+                          self.token_budget, self.chunk_breaks, self.syntax, self.catalog)
+
+    def decode(self, index):
+        """(positive prompt, selection summary) of the prompt with this index"""
+        spec = self.spec(index)
+        return spec.render(), spec.summary()
+
+    def permutation(self, key=0):
+        return KeyedPermutation(self.size, key)
+
+    def sample_unique(self, count=None, key=0, start=0):
+        """
+        Yield (index, prompt, summary) for distinct prompts in a key-dependent random order.
+        Positions start, start + 1, ... of the permutation are used, so a run can resume
+        from any position; the sequence ends once the space is exhausted.
+        """
+        for index, spec in self.sample_unique_specs(count, key, start):
+            yield index, spec.render(), spec.summary()
+
+    def sample_unique_specs(self, count=None, key=0, start=0):
+        """sample_unique() yielding (index, PromptSpec) instead of strings"""
+        permutation = self.permutation(key)
+        end = self.size if count is None else min(self.size, start + count)
+        for position in range(start, end):
+            index = permutation[position]
+            yield index, self.spec(index)
+
+
+def count_prompt_space(**inputs):
+    """Number of distinct prompts the given positive node inputs can produce"""
+    return PromptSpace(**inputs).size
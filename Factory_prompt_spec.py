@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+"""
+Factory Prompt Spec - Structured PROMPT_SPEC output of the positive nodes
+A PromptSpec holds the prompt plan (shared by every prompt generated from the same
+inputs) and one tag index per random step, so producing it allocates almost nothing;
+the prompt string, selection summary and per-category selections are rendered from it
+only when asked for. Downstream nodes read selections without parsing strings.
+"""
+
+try:
+    from .Factory_prompt_ast import (DEFAULT_SYNTAX, EMPHASIS_DEPTHS, EMPHASIS_WEIGHTS, Group, Term,
+                                     emphasis_level, emphasis_variants)
+    from .Factory_tag_catalog import get_catalog
+    from .Factory_tokens import TokenCounts, budget_summary, fit_parts, strip_emphasis
+except ImportError:
+    from Factory_prompt_ast import (DEFAULT_SYNTAX, EMPHASIS_DEPTHS, EMPHASIS_WEIGHTS, Group, Term,
+                                    emphasis_level, emphasis_variants)
+    from Factory_tag_catalog import get_catalog
+    from Factory_tokens import TokenCounts, budget_summary, fit_parts, strip_emphasis
+
+PROMPT_SPEC_TYPE = "PROMPT_SPEC"
+
+# Random tags are dropped for the token budget lowest emphasis first
+EMPHASIS_PRIORITY = EMPHASIS_DEPTHS
+
+
+def apply_emphasis(tag, emphasis_level, syntax=DEFAULT_SYNTAX):
+    """tag written with the weight of emphasis_level (medium and unknown levels add none)"""
+    if not tag:
+        return tag
+    return emphasis_variants(emphasis_level, syntax)[tag]
+
+
+def split_emphasis(part):
+    """(tag, emphasis level) of a part rendered by apply_emphasis in any weight syntax"""
+    tag, weight = strip_emphasis(part)
+    return tag, emphasis_level(weight)
+
+
+class PromptSpec:
+    """
+    One generated prompt: the plan it came from and the tag index picked for each random
+    step (None for fixed steps). Plan steps are (choices, emphasis level, summary
+    template, category) for random steps and (None, parts, summary line, category)
+    for fixed ones. Random tags are written in the weight syntax of the spec. catalog is
+    the snapshot the plan was built from (None = the current one); token counts come
+    from it, so a reload between building and rendering cannot mix two catalogs.
+    Treat it as immutable: results are shared through the node cache.
+    """
+
+    __slots__ = ("plan", "picks", "token_budget", "chunk_breaks", "syntax", "catalog", "_fitted")
+
+    def __init__(self, plan, picks, token_budget=0, chunk_breaks=False, syntax=DEFAULT_SYNTAX, catalog=None):
+        self.plan = plan
+        self.picks = picks
+        self.token_budget = token_budget
+        self.chunk_breaks = chunk_breaks
+        self.syntax = syntax
+        self.catalog = catalog
+        self._fitted = None
+
+    def __len__(self):
+        return len(self.plan)
+
+    def __repr__(self):
+        return f"PromptSpec({self.render()!r})"
+
+    def __str__(self):
+        return self.render()
+
+    def __reduce__(self):
+        return (PromptSpec, (self.plan, self.picks, self.token_budget, self.chunk_breaks, self.syntax, self.catalog))
+
+    def parts(self):
+        """Prompt parts in order, with emphasis applied"""
+        parts = []
+        syntax = self.syntax
+        for (choices, value, text, category), pick in zip(self.plan, self.picks):
+            if choices is None:
+                parts.extend(value)
+            else:
+                tag = choices[pick]
+                parts.append(emphasis_variants(value, syntax)[tag] if value is not None else tag)
+        return parts
+
+    def ast(self):
+        """The prompt as Term nodes, with a Group for each multi-tag fixed step"""
+        nodes = []
+        for (choices, value, text, category), pick in zip(self.plan, self.picks):
+            if choices is not None:
+                nodes.append(Term(choices[pick], EMPHASIS_WEIGHTS.get(value, 1.0)))
+            elif len(value) == 1:
+                nodes.append(Term(*strip_emphasis(value[0])))
+            else:
+                nodes.append(Group(Term(*strip_emphasis(part)) for part in value))
+        return nodes
+
+    def _fit(self, parts):
+        if self._fitted is None:
+            priorities = []
+            for choices, value, text, category in self.plan:
+                if choices is None:
+                    priorities.extend([None] * len(value))
+                else:
+                    priorities.append(EMPHASIS_PRIORITY.get(value, 0))
+            catalog = self.catalog if self.catalog is not None else get_catalog()
+            counts = catalog.derived("token_counts", TokenCounts)
+            prompt, dropped, tokens, chunks = fit_parts(parts, priorities, self.token_budget, self.chunk_breaks,
+                                                        counts)
+            self._fitted = (prompt, budget_summary(tokens, chunks, [parts[i] for i in dropped]))
+        return self._fitted
+
+    def render(self, parts=None):
+        """The positive prompt string (fitted to the token budget, if one was set)"""
+        if parts is None:
+            parts = self.parts()
+        if self.token_budget:
+            return self._fit(parts)[0]
+        return ", ".join(parts)
+
+    def summary(self):
+        """The human-readable selection summary"""
+        lines = [text if choices is None else text.format(choices[pick])
+                 for (choices, value, text, category), pick in zip(self.plan, self.picks)]
+        if self.token_budget:
+            lines.append(self._fit(self.parts())[1])
+        return "\n".join(lines)
+
+    def iter_tags(self):
+        """Bare tags of every step in prompt order, without building any strings"""
+        for (choices, value, text, category), pick in zip(self.plan, self.picks):
+            if choices is None:
+                for part in value:
+                    yield strip_emphasis(part)[0]
+            else:
+                yield choices[pick]
+
+    def selections(self):
+        """
+        Tuple of (category, tag, tag index, emphasis level, random) per plan step.
+        Fixed steps have no tag index; multi-tag fixed steps (quality, custom elements)
+        report their tags joined with ", ".
+        """
+        selections = []
+        for (choices, value, text, category), pick in zip(self.plan, self.picks):
+            if choices is None:
+                if len(value) == 1:
+                    tag, level = split_emphasis(value[0])
+                else:
+                    tag, level = ", ".join(value), "medium"
+                selections.append((category, tag, None, level, False))
+            else:
+                selections.append((category, choices[pick], pick, value or "medium", True))
+        return tuple(selections)
+
+    def tags(self):
+        """{category: tag} of every step"""
+        return {category: tag for category, tag, _index, _level, _random in self.selections()}
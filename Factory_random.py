@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+"""
+Factory Random - Isolated, splittable random streams for the Factory Prompts nodes
+
+Nodes never touch the global random module. Every call derives its own streams from
+the seed, so results do not depend on other nodes, threads or processes.
+
+Stream-splitting scheme (all arithmetic is mod 2**64, mix() is the SplitMix64 finalizer):
+    prompt stream for seed s          key = mix(s ^ SEED_SALT)
+    prompt i of a batch at seed s     the prompt stream for seed (s + i)
+    substream "name" of a stream k    key = rotl(k, 1) ^ stream_id(name)
+    j-th draw of a stream k           x_j = mix(k + j * GOLDEN), j = 1, 2, ...
+    randbelow(n)                      (x_j * n) >> 64
+    weighted index (alias table)      i = (x_j * n) >> 64, kept if the low 64 bits of
+                                      x_j * n are below threshold[i], else alias[i]
+stream_id() is a blake2b hash of the name, so ids are stable across processes.
+Each category draws from its own named substream, which means a batch, a thread pool
+or a process pool produces exactly what single calls with the same seeds would.
+"""
+
+import hashlib
+
+MASK64 = (1 << 64) - 1
+GOLDEN = 0x9E3779B97F4A7C15
+SEED_SALT = 0x6A09E667F3BCC908
+
+_stream_ids = {}
+
+
+def mix(z):
+    """SplitMix64 finalizer: a bijective 64-bit mixing function"""
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def stream_id(name):
+    """Stable 64-bit id for a substream name (ints are used as-is)"""
+    if isinstance(name, int):
+        return name & MASK64
+    try:
+        return _stream_ids[name]
+    except KeyError:
+        value = int.from_bytes(hashlib.blake2b(name.encode('utf-8'), digest_size=8).digest(), 'little')
+        _stream_ids[name] = value
+        return value
+
+
+def prompt_seed(seed, index):
+    """Seed used for prompt index of a batch, shard or export that starts at seed"""
+    return (seed + index) & MASK64
+
+
+class AliasTable:
+    """
+    Vose alias table over n weights: one 64-bit random value gives a weighted index in O(1).
+    Thresholds are integers scaled by 2**64, so draws are identical on every platform.
+    """
+
+    __slots__ = ("thresholds", "aliases")
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("alias table needs at least one positive weight")
+        scaled = [weight * n / total for weight in weights]
+        aliases = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            aliases[less] = more
+            scaled[more] += scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Leftovers are 1.0 up to rounding error
+        for i in small + large:
+            scaled[i] = 1.0
+        self.thresholds = tuple(min(1 << 64, max(0, round(p * (1 << 64)))) for p in scaled)
+        self.aliases = tuple(aliases)
+
+    def __len__(self):
+        return len(self.aliases)
+
+    def pick(self, x):
+        """Weighted index for the 64-bit random value x"""
+        scaled = x * len(self.aliases)
+        i = scaled >> 64
+        return i if (scaled & MASK64) < self.thresholds[i] else self.aliases[i]
+
+
+class PromptRandom:
+    """A small counter-based random stream; cheap to create and to split"""
+
+    __slots__ = ("key", "counter")
+
+    def __init__(self, seed=0, key=None):
+        self.key = mix((seed & MASK64) ^ SEED_SALT) if key is None else key
+        self.counter = 0
+
+    def split(self, name):
+        """Independent child stream identified by name"""
+        key = self.key
+        return PromptRandom(key=(((key << 1) | (key >> 63)) & MASK64) ^ stream_id(name))
+
+    def next64(self):
+        self.counter += 1
+        return mix((self.key + self.counter * GOLDEN) & MASK64)
+
+    def randbelow(self, n):
+        """Uniform integer in [0, n)"""
+        return (self.next64() * n) >> 64
+
+    def random(self):
+        """Uniform float in [0.0, 1.0)"""
+        return (self.next64() >> 11) * (1.0 / (1 << 53))
+
+    def choice(self, seq):
+        """Uniform element of seq, or weighted if seq carries an alias table (WeightedTags)"""
+        alias = getattr(seq, "alias", None)
+        if alias is not None:
+            return seq[alias.pick(self.next64())]
+        return seq[(self.next64() * len(seq)) >> 64]
+
+    def first_index(self, name, n, alias=None):
+        """split(name).randbelow(n), or a weighted index with alias, without creating the child stream"""
+        key = self.key
+        z = (((((key << 1) | (key >> 63)) & MASK64) ^ stream_id(name)) + GOLDEN) & MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        if alias is not None:
+            return alias.pick(z ^ (z >> 31))
+        return ((z ^ (z >> 31)) * n) >> 64
+
+    @staticmethod
+    def first_indices(streams, name, n, alias=None):
+        """
+        For each stream, split(name).randbelow(n) (weighted if alias is given); the index
+        column of one random category across a batch, computed without creating the child streams.
+        """
+        sid = stream_id(name)
+        indices = []
+        append = indices.append
+        pick = alias.pick if alias is not None else None
+        for stream in streams:
+            key = stream.key
+            z = (((((key << 1) | (key >> 63)) & MASK64) ^ sid) + GOLDEN) & MASK64
+            z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+            z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+            if pick is None:
+                append(((z ^ (z >> 31)) * n) >> 64)
+            else:
+                append(pick(z ^ (z >> 31)))
+        return indices
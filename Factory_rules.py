@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+"""
+Factory Rules - Compatibility rules between the positive node's inputs
+Rules are declared in the catalog's "_rules" section and compiled once per catalog
+snapshot into bitsets over the input slots, so the sampler only ever draws coherent
+combinations instead of filtering or rejecting finished prompts:
+
+    "one_of": [[["casual_dress"], ["casual_top", "casual_bottom"]], ...]
+        At most one alternative of each group is used. An alternative holding an
+        explicit (non-random) value wins; otherwise one alternative is drawn at random.
+    "slots_for": {"clothing_style": {"school": ["school_uniform_top", ...], "*": [...]}}
+        For each governing input, the slots each of its values enables. Governed slots
+        (listed under any value) that the current value does not list are skipped.
+        "*" covers values without a list of their own; other values enable everything.
+
+Rules only skip slots left on "random"; explicit choices are always honored.
+"""
+
+import sys
+
+RULES_KEY = "_rules"
+DEFAULT_VALUE_KEY = "*"
+
+
+class CompatibilityRules:
+    """Compiled rules: one bit per input slot, precomputed masks per governing input value"""
+
+    def __init__(self, rules, slot_names=()):
+        self.bits = {}
+        for name in slot_names:
+            self.slot_bit(name)
+        rules = rules if isinstance(rules, dict) else {}
+
+        # governing input -> ({value: disabled mask}, disabled mask for other values)
+        self.slot_masks = {}
+        for governing_input, by_value in (rules.get("slots_for") or {}).items():
+            if not isinstance(by_value, dict):
+                print(f"Ignoring rule slots_for.{governing_input}: expected an object of value -> slots", file=sys.stderr)
+                continue
+            enabled = {value: self.mask(slots, f"slots_for.{governing_input}.{value}")
+                       for value, slots in by_value.items()}
+            governed = 0
+            for mask in enabled.values():
+                governed |= mask
+            default = governed & ~enabled[DEFAULT_VALUE_KEY] if DEFAULT_VALUE_KEY in enabled else 0
+            self.slot_masks[governing_input] = (
+                {value: governed & ~mask for value, mask in enabled.items() if value != DEFAULT_VALUE_KEY}, default)
+
+        # one_of groups: tuple of alternative masks each, plus the random stream deciding it
+        self.groups = []
+        group_slots = 0
+        for index, alternatives in enumerate(rules.get("one_of") or ()):
+            masks = tuple(self.mask(alternative, f"one_of[{index}]") for alternative in alternatives or ())
+            masks = tuple(mask for mask in masks if mask)
+            if len(masks) > 1:
+                self.groups.append((masks, f"rule_one_of_{index}"))
+                for mask in masks:
+                    group_slots |= mask
+        self.groups = tuple(self.groups)
+        self.group_slots = tuple((name, bit) for name, bit in self.bits.items() if bit & group_slots)
+
+    def slot_bit(self, name):
+        """Single-bit mask of an input slot, allocating a bit for new names"""
+        bit = self.bits.get(name)
+        if bit is None:
+            bit = self.bits[name] = 1 << len(self.bits)
+        return bit
+
+    def mask(self, names, context=""):
+        """OR of the bits of the named slots"""
+        if isinstance(names, str):
+            names = (names,)
+        mask = 0
+        for name in names or ():
+            if not isinstance(name, str):
+                print(f"Ignoring non-string slot {name!r} in rule {context}", file=sys.stderr)
+                continue
+            mask |= self.slot_bit(name)
+        return mask
+
+    def resolve(self, inputs):
+        """
+        Slots to skip for these inputs, before any random choice.
+        Returns (disabled mask, open groups), where each open group is
+        (alternative masks still possible, stream name) and needs a random pick.
+        """
+        disabled = 0
+        for governing_input, (by_value, default) in self.slot_masks.items():
+            disabled |= by_value.get(inputs.get(governing_input), default)
+        if not self.groups:
+            return disabled, ()
+
+        explicit = 0
+        for name, bit in self.group_slots:
+            value = inputs.get(name)
+            if value is not None and value != "random":
+                explicit |= bit
+
+        open_groups = []
+        for alternatives, stream in self.groups:
+            kept = 0
+            for mask in alternatives:
+                if explicit & mask:
+                    kept |= mask
+            if kept:
+                for mask in alternatives:
+                    disabled |= mask & ~kept
+                continue
+            candidates = tuple(mask for mask in alternatives if mask & ~disabled)
+            if len(candidates) > 1:
+                open_groups.append((candidates, stream))
+        return disabled, tuple(open_groups)
+
+    @staticmethod
+    def unchosen(open_groups, picks):
+        """Mask of the alternatives not picked; picks[i] is the chosen index of open group i"""
+        disabled = 0
+        for (candidates, _stream), pick in zip(open_groups, picks):
+            for mask in candidates:
+                disabled |= mask & ~candidates[pick]
+        return disabled
+
+    def disabled_slots(self, inputs, rng):
+        """Complete skip mask for one prompt, drawing open groups from rng"""
+        disabled, open_groups = self.resolve(inputs)
+        if open_groups:
+            picks = [rng.first_index(stream, len(candidates)) for candidates, stream in open_groups]
+            disabled |= self.unchosen(open_groups, picks)
+        return disabled
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+
+"""
+Factory Prompt Service - Local HTTP endpoint for generating prompts outside a workflow
+POST /factory_prompts/generate with a JSON body and read the prompts back as JSON lines,
+one per prompt, streamed as they are generated. Concurrent requests for the same inputs
+are coalesced into a single batched generate_for_seeds() call, which runs on a worker
+thread so the event loop keeps serving.
+
+Inside ComfyUI the routes are added to its server when FACTORY_PROMPTS_SERVICE=1;
+otherwise run it standalone (standard library only):
+    python Factory_service.py --port 8190
+
+Request body (every field optional):
+    {"params": {"source_style": "anime", ...},   positive node inputs over the widget defaults
+     "seed": 0, "count": 1,                        row i uses seed + i
+     "negative": {"preset": "standard", "selection_aware": true}}   or null for no negative
+Each response line is {"seed", "positive", "negative", "selections"}, like a JSONL export row.
+GET /factory_prompts/stats reports request, batch and prompt counters.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .Factory_export import default_inputs, negative_builder, write_rows
+    from .Factory_prompt_generator import DROPDOWN_PATHS, FactoryPromptsPositiveNode
+    from .Factory_random import prompt_seed
+    from .Factory_tag_catalog import get_catalog
+except ImportError:
+    from Factory_export import default_inputs, negative_builder, write_rows
+    from Factory_prompt_generator import DROPDOWN_PATHS, FactoryPromptsPositiveNode
+    from Factory_random import prompt_seed
+    from Factory_tag_catalog import get_catalog
+
+GENERATE_ROUTE = "/factory_prompts/generate"
+STATS_ROUTE = "/factory_prompts/stats"
+
+DEFAULT_PORT = 8190
+MAX_BATCH = 256
+MAX_COUNT = 100000
+MAX_BODY_BYTES = 1 << 20
+
+# Chunks of one request kept in flight ahead of the one being written
+STREAM_AHEAD = 2
+
+# Inputs of the node function that are not prompt inputs
+RESERVED_PARAMS = ("seed", "batch_size", "prompt", "unique_id", "outputs")
+
+
+class PromptBatcher:
+    """
+    Coalesces concurrent generation jobs. One batch runs at a time on a worker thread;
+    jobs submitted meanwhile are grouped by their inputs and run as one batch per group
+    (up to MAX_BATCH prompts) when it finishes.
+    """
+
+    def __init__(self, max_batch=MAX_BATCH):
+        self.max_batch = max_batch
+        self.node = FactoryPromptsPositiveNode()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="factory-prompts")
+        self._pending = []
+        self._draining = False
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.jobs = 0
+        self.batches = 0
+        self.prompts = 0
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def submit(self, key, params, seeds, negative_for):
+        """Future resolving to the JSONL text of the rows for seeds"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((key, params, seeds, negative_for, future))
+        if not self._draining:
+            self._draining = True
+            loop.create_task(self._drain())
+        return future
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self._pending:
+                jobs, self._pending = self._pending, []
+                groups = {}
+                for job in jobs:
+                    if not job[4].cancelled():
+                        groups.setdefault(job[0], []).append(job)
+                for group in groups.values():
+                    batch = []
+                    size = 0
+                    for job in group:
+                        if batch and size + len(job[2]) > self.max_batch:
+                            await self._run(loop, batch)
+                            batch, size = [], 0
+                        batch.append(job)
+                        size += len(job[2])
+                    await self._run(loop, batch)
+        finally:
+            self._draining = False
+
+    async def _run(self, loop, batch):
+        try:
+            results = await loop.run_in_executor(self.executor, self.run_batch, batch)
+        except Exception as e:
+            for job in batch:
+                if not job[4].done():
+                    job[4].set_exception(e)
+            return
+        for job, text in zip(batch, results):
+            if not job[4].done():
+                job[4].set_result(text)
+
+    def run_batch(self, batch):
+        """Worker thread: generate every job of one input group in a single call"""
+        params = batch[0][1]
+        seeds = [seed for job in batch for seed in job[2]]
+        prompts, summaries, specs = self.node.generate_for_seeds(seeds, **params)
+        with self._lock:
+            self.jobs += len(batch)
+            self.batches += 1
+            self.prompts += len(seeds)
+
+        results = []
+        start = 0
+        for _key, _params, job_seeds, negative_for, _future in batch:
+            rows = ((seed, prompts[i], negative_for(specs[i]), {"selections": summaries[i].split("\n")})
+                    for seed, i in zip(job_seeds, range(start, start + len(job_seeds))))
+            buffer = io.StringIO()
+            write_rows(rows, buffer, "jsonl")
+            results.append(buffer.getvalue())
+            start += len(job_seeds)
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "jobs": self.jobs, "batches": self.batches,
+                    "prompts": self.prompts,
+                    "prompts_per_batch": self.prompts / self.batches if self.batches else 0.0}
+
+
+def check_param(name, value, input_types):
+    """Raise ValueError unless value is valid for the positive node input name"""
+    spec = input_types["required"].get(name) or input_types["optional"].get(name)
+    if spec is None:
+        raise ValueError(f"unknown param '{name}'")
+    kind = spec[0]
+    options = spec[1] if len(spec) > 1 else {}
+    if isinstance(kind, (list, tuple)):
+        if not isinstance(value, str):
+            raise ValueError(f"param '{name}' must be a string")
+        # Dropdowns list core tags only; tags added by a pack are checked when drawn
+        paths = DROPDOWN_PATHS.get(name, ())
+        if value not in kind and not any(get_catalog().owned_by_pack(path) for path in paths):
+            raise ValueError(f"param '{name}' must be one of: {', '.join(map(str, kind))}")
+    elif kind == "BOOLEAN":
+        if not isinstance(value, bool):
+            raise ValueError(f"param '{name}' must be a boolean")
+    elif kind == "INT":
+        low, high = options.get("min", 0), options.get("max", (1 << 64) - 1)
+        if not isinstance(value, int) or isinstance(value, bool) or not low <= value <= high:
+            raise ValueError(f"param '{name}' must be an integer from {low} to {high}")
+    elif kind == "STRING":
+        if not isinstance(value, str):
+            raise ValueError(f"param '{name}' must be a string")
+
+
+class GenerateRequest:
+    """A validated generation request"""
+
+    def __init__(self, body):
+        if not isinstance(body, dict):
+            raise ValueError("request body must be a JSON object")
+        params = body.get("params") or {}
+        if not isinstance(params, dict):
+            raise ValueError("params must be an object")
+        input_types = FactoryPromptsPositiveNode.INPUT_TYPES()
+        for name, value in params.items():
+            if name in RESERVED_PARAMS:
+                raise ValueError(f"'{name}' cannot be set in params")
+            check_param(name, value, input_types)
+        self.seed = body.get("seed", 0)
+        self.count = body.get("count", 1)
+        for name, value, low, high in (("seed", self.seed, 0, (1 << 64) - 1), ("count", self.count, 1, MAX_COUNT)):
+            if not isinstance(value, int) or isinstance(value, bool) or not low <= value <= high:
+                raise ValueError(f"{name} must be an integer from {low} to {high}")
+
+        inputs = default_inputs(input_types)
+        inputs.pop("seed", None)
+        inputs.update(params)
+        self.params = inputs
+        self.key = frozenset(inputs.items())
+
+        negative = body.get("negative")
+        if negative is not None and not isinstance(negative, dict):
+            raise ValueError("negative must be an object or null")
+        try:
+            self.negative_for = negative_builder(negative)
+            if negative and negative.get("selection_aware"):
+                # Selection-aware negatives are built per prompt; check the settings up front
+                negative_builder(dict(negative, selection_aware=False))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"invalid negative settings: {e}") from None
+
+
+class PromptService:
+    """Request handling shared by the ComfyUI routes and the standalone server"""
+
+    def __init__(self, max_batch=MAX_BATCH):
+        self.batcher = PromptBatcher(max_batch)
+
+    def prepare(self, body):
+        """Validate a request body; raises ValueError for a bad request"""
+        return GenerateRequest(body)
+
+    async def stream(self, request):
+        """Yield the JSONL text of a request, one chunk of at most max_batch rows at a time"""
+        batcher = self.batcher
+        batcher.count_request()
+        chunk_size = batcher.max_batch
+        chunks = ([prompt_seed(request.seed, i) for i in range(offset, min(offset + chunk_size, request.count))]
+                  for offset in range(0, request.count, chunk_size))
+        in_flight = []
+        try:
+            for seeds in chunks:
+                in_flight.append(batcher.submit(request.key, request.params, seeds, request.negative_for))
+                if len(in_flight) > STREAM_AHEAD:
+                    yield await in_flight.pop(0)
+            while in_flight:
+                yield await in_flight.pop(0)
+        finally:
+            # Client went away: drop the chunks nobody will read
+            for future in in_flight:
+                future.cancel()
+
+
+def register_routes(service=None):
+    """Add the service routes to ComfyUI's server; returns False outside ComfyUI"""
+    try:
+        from aiohttp import web
+        from server import PromptServer
+    except ImportError:
+        return False
+    service = service or PromptService()
+    routes = PromptServer.instance.routes
+
+    @routes.post(GENERATE_ROUTE)
+    async def generate(http_request):
+        try:
+            request = service.prepare(await http_request.json())
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(http_request)
+        async for text in service.stream(request):
+            await response.write(text.encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    @routes.get(STATS_ROUTE)
+    async def stats(http_request):
+        return web.json_response(service.batcher.stats())
+
+    print(f"Factory Prompts service: POST {GENERATE_ROUTE}")
+    return True
+
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+async def _send_json(writer, status, payload):
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+
+
+async def _handle_connection(service, reader, writer):
+    """Minimal HTTP/1.1: one request per connection, streamed with chunked encoding"""
+    try:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1")
+            if line in ("\r\n", "\n", ""):
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if len(request_line) < 2:
+            return
+        method, path = request_line[0], request_line[1].split("?", 1)[0]
+
+        if path == STATS_ROUTE and method == "GET":
+            await _send_json(writer, 200, service.batcher.stats())
+            return
+        if path != GENERATE_ROUTE:
+            await _send_json(writer, 404, {"error": f"no route {path}"})
+            return
+        if method != "POST":
+            await _send_json(writer, 405, {"error": "use POST"})
+            return
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY_BYTES:
+            await _send_json(writer, 413, {"error": f"body larger than {MAX_BODY_BYTES} bytes"})
+            return
+        try:
+            body = json.loads(await reader.readexactly(length)) if length else {}
+            request = service.prepare(body)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            await _send_json(writer, 400, {"error": str(e)})
+            return
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+        try:
+            async for text in service.stream(request):
+                data = text.encode("utf-8")
+                writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                await writer.drain()
+        except Exception as e:
+            # Headers are already out: end the stream early and log the cause
+            print(f"Factory Prompts service: error generating prompts: {e}", file=sys.stderr)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+    except (ConnectionError, ValueError) as e:
+        print(f"Factory Prompts service: dropped connection: {e}", file=sys.stderr)
+    finally:
+        writer.close()
+
+
+async def serve(host="127.0.0.1", port=DEFAULT_PORT, max_batch=MAX_BATCH):
+    """Run the standalone server until cancelled"""
+    service = PromptService(max_batch)
+    server = await asyncio.start_server(lambda reader, writer: _handle_connection(service, reader, writer),
+                                        host, port)
+    print(f"Factory Prompts service listening on http://{host}:{port}{GENERATE_ROUTE}")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Factory Prompts over local HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="prompts per coalesced batch")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, max(1, args.max_batch)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
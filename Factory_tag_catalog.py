@@ -0,0 +1,746 @@
+#!/usr/bin/env python3
+
+"""
+Factory Tag Catalog - Shared, immutable tag data for the Factory Prompts nodes
+Loads factory_tags.json once per process and shares it between every node instance
+Reloads only when the file's mtime and content hash change
+
+Tags can be weighted through an optional top-level "_weights" section that mirrors the
+category paths and maps tags to weights (unlisted tags weigh 1), e.g.
+    "_weights": {"character_features": {"hair_colors": {"black_hair": 5, "blonde_hair": 2}}}
+Weighted categories are returned as WeightedTags, which carry a precomputed alias table.
+Other top-level keys starting with "_" (e.g. "_rules", "_conflicts") are settings sections,
+read with section().
+
+A compiled catalog (factory_tags.bin, built by running this module) is preferred when the
+source hash in its header matches the JSON. It is memory-mapped read-only, so startup does
+no parsing and every process on the host shares the same pages. Layout, all integers little-endian:
+    header      magic "FPTC", u16 format, u16 reserved, 16-byte source hash,
+                u32 string count, u32 category count, u32 reference count, u32 weight count
+    strings     u32 offsets[string count + 1], then the UTF-8 string blob
+    categories  (u32 path string, u32 first reference, u32 length, u32 weighted) per tag
+                list, where the path is the JSON key path joined with CATEGORY_PATH_SEP;
+                a settings section is one JSON-encoded string at CATEGORY_PATH_SEP + its name
+    references  u32 string index per tag
+    weights     f64 weight per reference (only when the header's weight count is non-zero)
+
+Tag packs extend the catalog without growing the core file. tag_packs/manifest.json beside
+it lists pack files (same layout as the tag JSON, "_weights" included) and the category
+prefixes each one owns:
+    {"packs": [{"file": "clothing.json", "owns": ["clothing"], "version": "1.0"},
+               {"file": "community_hair.json", "owns": ["character_features.hair_colors"]}]}
+At load the manifest is read and each pack file hashed (the pack version is its declared
+version plus that hash); a pack is parsed the first time a category it owns is looked up,
+and its tags are appended to the category's core tags (repeats dropped). Dropdowns list
+core tags only (core_category), so building INPUT_TYPES never parses a pack.
+"""
+
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+
+try:
+    from .Factory_random import AliasTable
+except ImportError:
+    from Factory_random import AliasTable
+
+TAGS_FILENAME = "factory_tags.json"
+DEFAULT_TAGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), TAGS_FILENAME)
+
+COMPILED_MAGIC = b"FPTC"
+COMPILED_FORMAT = 2
+COMPILED_HEADER = struct.Struct("<4sHH16sIIII")
+CATEGORY_PATH_SEP = "\x1f"
+WEIGHTS_KEY = "_weights"
+
+PACKS_DIRNAME = "tag_packs"
+PACK_MANIFEST = "manifest.json"
+
+
+class FrozenDict(dict):
+    """Read-only dict; still a real dict so ComfyUI can serialize it as JSON"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("catalog data is read-only")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+    __ior__ = _readonly
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+
+class FrozenList(list):
+    """Read-only list; ComfyUI only accepts real lists for dropdown options"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("catalog data is read-only")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = pop = remove = clear = sort = reverse = _readonly
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),))
+
+
+def freeze(value):
+    """Recursively turn parsed JSON into FrozenDicts and tuples of interned strings"""
+    if isinstance(value, dict):
+        return FrozenDict((sys.intern(key), freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+class WeightedTags(tuple):
+    """Tag tuple with per-tag weights and an alias table for O(1) weighted draws"""
+
+    def __new__(cls, tags, weights):
+        self = super().__new__(cls, tags)
+        self.weights = tuple(weights)
+        self.alias = AliasTable(self.weights)
+        return self
+
+    def __reduce__(self):
+        return (self.__class__, (tuple(self), self.weights))
+
+
+def tag_weights(tags, weight_map, label=""):
+    """Weights for tags from a {tag: weight} map, or None if the category stays uniform"""
+    if not isinstance(weight_map, dict) or not tags:
+        return None
+    unknown = set(weight_map) - set(tags)
+    if unknown:
+        print(f"Ignoring weights for tags not in {label}: {', '.join(sorted(unknown))}", file=sys.stderr)
+    weights = []
+    for tag in tags:
+        weight = weight_map.get(tag, 1)
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)) or not math.isfinite(weight) or weight < 0:
+            print(f"Ignoring invalid weight {weight!r} for tag '{tag}' in {label}", file=sys.stderr)
+            weight = 1
+        weights.append(float(weight))
+    if not any(weights):
+        print(f"Ignoring weights for {label}: every tag has weight 0", file=sys.stderr)
+        return None
+    return weights
+
+
+def apply_weights(node, weight_tree, parents=()):
+    """Return node with every category named in weight_tree turned into WeightedTags"""
+    if not isinstance(node, dict) or not isinstance(weight_tree, dict):
+        return node
+    items = dict(node)
+    for key, weights in weight_tree.items():
+        value = items.get(key)
+        if isinstance(value, tuple):
+            label = ".".join(parents + (key,))
+            values = tag_weights(value, weights, label)
+            if values is not None:
+                items[key] = WeightedTags(value, values)
+        elif isinstance(value, dict):
+            items[key] = apply_weights(value, weights, parents + (key,))
+    return FrozenDict(items)
+
+
+class TagCatalog:
+    """
+    Immutable snapshot of the tag JSON.
+    Structures derived from the tags (dropdowns, lookup tables) are built once per
+    snapshot through derived() and shared by every caller.
+    """
+
+    packs = ()
+
+    def __init__(self, tags, path=None, version="", mtime=None):
+        tags = freeze(tags if isinstance(tags, dict) else {})
+        if WEIGHTS_KEY in tags:
+            tags = apply_weights(tags, tags[WEIGHTS_KEY])
+        self.tags = tags
+        self.path = path
+        self.version = version
+        self.mtime = mtime
+        self._derived = {}
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        # Derived structures and the lock are rebuilt lazily on the receiving side
+        return {"tags": self.tags, "path": self.path, "version": self.version, "mtime": self.mtime}
+
+    def __setstate__(self, state):
+        self.__init__(state["tags"], state["path"], state["version"], state["mtime"])
+
+    def category(self, path):
+        """Return the tag tuple stored at a key path, or an empty tuple if it is missing"""
+        node = self.tags
+        for key in path:
+            if not isinstance(node, dict):
+                return ()
+            node = node.get(key)
+            if node is None:
+                return ()
+        return node if isinstance(node, tuple) else ()
+
+    def section(self, name):
+        """A top-level settings section such as "_rules", or None if the catalog has none"""
+        value = self.tags.get(name)
+        return value if isinstance(value, dict) else None
+
+    def core_category(self, path):
+        """Tags of a category without parsing any tag pack (the whole category when there are none)"""
+        return self.category(path)
+
+    def owned_by_pack(self, path):
+        """Whether a tag pack adds tags to the category at path"""
+        return False
+
+    def derived(self, name, builder):
+        """Return builder(self), computing it only once for this catalog snapshot"""
+        try:
+            return self._derived[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = builder(self)
+            return self._derived[name]
+
+
+class MappedTagCatalog(TagCatalog):
+    """
+    Catalog backed by a memory-mapped compiled file.
+    Tag lists are decoded on first use; the nested tags dict is only built if asked for.
+    """
+
+    def __init__(self, compiled_path, path=None, mtime=None):
+        with open(compiled_path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        magic, fmt, _reserved, version, n_strings, n_categories, n_refs, n_weights = COMPILED_HEADER.unpack_from(view)
+        if magic != COMPILED_MAGIC or fmt != COMPILED_FORMAT:
+            raise ValueError(f"{compiled_path} is not a compiled tag catalog (format {COMPILED_FORMAT})")
+
+        offset = COMPILED_HEADER.size
+        self._offsets = view[offset:offset + 4 * (n_strings + 1)].cast('I')
+        offset += 4 * (n_strings + 1)
+        self._blob = view[offset:offset + self._offsets[n_strings]]
+        offset += self._offsets[n_strings]
+        table = view[offset:offset + 16 * n_categories].cast('I')
+        offset += 16 * n_categories
+        self._refs = view[offset:offset + 4 * n_refs].cast('I')
+        offset += 4 * n_refs
+        self._weights = view[offset:offset + 8 * n_weights].cast('d') if n_weights else None
+
+        self._index = {}
+        for i in range(0, 4 * n_categories, 4):
+            self._index[self.string(table[i])] = (table[i + 1], table[i + 2], table[i + 3])
+
+        self.compiled_path = compiled_path
+        self.path = path
+        self.version = version.decode('ascii')
+        self.mtime = mtime
+        self._tags = None
+        self._categories = {}
+        self._sections = {}
+        self._derived = {}
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        # Receivers map the same file instead of copying the tags
+        return {"compiled_path": self.compiled_path, "path": self.path, "mtime": self.mtime}
+
+    def __setstate__(self, state):
+        self.__init__(state["compiled_path"], state["path"], state["mtime"])
+
+    def string(self, index):
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return sys.intern(str(self._blob[start:end], 'utf-8'))
+
+    def category(self, path):
+        key = CATEGORY_PATH_SEP.join(path)
+        try:
+            return self._categories[key]
+        except KeyError:
+            pass
+        span = self._index.get(key)
+        if span is None:
+            return ()
+        first, length, weighted = span
+        refs = self._refs
+        tags = tuple(self.string(refs[i]) for i in range(first, first + length))
+        if weighted and self._weights is not None:
+            tags = WeightedTags(tags, self._weights[first:first + length])
+        self._categories[key] = tags
+        return tags
+
+    def section(self, name):
+        try:
+            return self._sections[name]
+        except KeyError:
+            pass
+        span = self._index.get(CATEGORY_PATH_SEP + name)
+        value = None
+        if span is not None:
+            value = freeze(json.loads(self.string(self._refs[span[0]])))
+            value = value if isinstance(value, dict) else None
+        self._sections[name] = value
+        return value
+
+    @property
+    def tags(self):
+        if self._tags is None:
+            with self._lock:
+                if self._tags is None:
+                    root = {}
+                    for key in self._index:
+                        if key.startswith(CATEGORY_PATH_SEP):
+                            root[key[len(CATEGORY_PATH_SEP):]] = self.section(key[len(CATEGORY_PATH_SEP):])
+                            continue
+                        *parents, leaf = key.split(CATEGORY_PATH_SEP)
+                        node = root
+                        for parent in parents:
+                            node = node.setdefault(parent, {})
+                        node[leaf] = self.category(key.split(CATEGORY_PATH_SEP))
+                    self._tags = freeze(root)
+        return self._tags
+
+
+def iter_categories(node, parents=()):
+    """(key path, tag tuple) of every tag list in a frozen tag tree, skipping settings sections"""
+    for key, value in node.items():
+        if not parents and key.startswith("_"):
+            continue
+        if isinstance(value, dict):
+            yield from iter_categories(value, parents + (key,))
+        elif isinstance(value, tuple):
+            yield parents + (key,), value
+
+
+def merge_tags(first, second):
+    """Tags of first followed by the new tags of second; weights are kept if either side has them"""
+    merged = dict.fromkeys(first)
+    merged.update((tag, None) for tag in second if tag not in merged)
+    if len(merged) == len(first):
+        return first
+    if not isinstance(first, WeightedTags) and not isinstance(second, WeightedTags):
+        return tuple(merged)
+    weights = {}
+    for tags in (second, first):
+        weights.update(zip(tags, getattr(tags, "weights", None) or (1.0,) * len(tags)))
+    return WeightedTags(tuple(merged), [weights[tag] for tag in merged])
+
+
+class TagPack:
+    """
+    One pack file from the manifest. Only its entry (file, owned category prefixes,
+    version) is read at startup; the JSON is parsed the first time a category it owns
+    is looked up, and the parsed pack is reused by later catalog snapshots until the
+    file or its entry changes.
+    """
+
+    def __init__(self, name, path, owns, version="", mtime=None, digest=""):
+        self.name = name
+        self.path = path
+        self.owns = owns
+        self.version = version
+        self.mtime = mtime
+        self.digest = digest
+        self._tags = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Receivers parse the pack themselves, and only if they need it
+        return {"name": self.name, "path": self.path, "owns": self.owns, "version": self.version,
+                "mtime": self.mtime, "digest": self.digest}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __repr__(self):
+        return f"TagPack({self.name!r}, version={self.version!r}, parsed={self._tags is not None})"
+
+    def same_entry(self, other):
+        # Content, not file time: touching a pack without changing it keeps it (and the caches)
+        return (self.path, self.owns, self.version, self.digest) == (other.path, other.owns, other.version,
+                                                                     other.digest)
+
+    def owns_path(self, path):
+        return any(path[:len(prefix)] == prefix for prefix in self.owns)
+
+    @property
+    def parsed(self):
+        return self._tags is not None
+
+    @property
+    def tags(self):
+        if self._tags is None:
+            with self._lock:
+                if self._tags is None:
+                    self._tags = self.load()
+        return self._tags
+
+    def load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                tags = freeze(json.loads(f.read().decode('utf-8')))
+        except Exception as e:
+            print(f"Error loading tag pack {self.name}: {e}", file=sys.stderr)
+            return FrozenDict()
+        if not isinstance(tags, dict):
+            print(f"Error loading tag pack {self.name}: expected a JSON object", file=sys.stderr)
+            return FrozenDict()
+        if WEIGHTS_KEY in tags:
+            tags = apply_weights(tags, tags[WEIGHTS_KEY])
+        stray = [".".join(path) for path, _tags in iter_categories(tags) if not self.owns_path(path)]
+        if stray:
+            print(f"Tag pack {self.name} has categories outside its manifest entry, which are ignored: "
+                  f"{', '.join(stray)}", file=sys.stderr)
+        return tags
+
+    def category(self, path):
+        node = self.tags
+        for key in path:
+            if not isinstance(node, dict):
+                return ()
+            node = node.get(key)
+            if node is None:
+                return ()
+        return node if isinstance(node, tuple) else ()
+
+
+class PackedTagCatalog(TagCatalog):
+    """
+    A base catalog (factory_tags.json or its compiled form) extended by tag packs.
+    A category is the base tags followed by the new tags of every pack that owns it, in
+    manifest order; packs that own nothing looked up so far are never parsed. Settings
+    sections come from the base catalog. The version covers the base and the version and
+    content hash of every pack.
+    """
+
+    def __init__(self, base, packs, mtime=None):
+        self.base = base
+        self.packs = tuple(packs)
+        self.path = base.path
+        self.mtime = mtime
+        stamps = "".join(f"|{pack.name}:{pack.version}:{pack.digest}" for pack in self.packs)
+        self.version = hashlib.sha256((base.version + stamps).encode('utf-8')).hexdigest()[:16]
+        self._tags = None
+        self._categories = {}
+        self._derived = {}
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        return {"base": self.base, "packs": self.packs, "mtime": self.mtime}
+
+    def __setstate__(self, state):
+        self.__init__(state["base"], state["packs"], state["mtime"])
+
+    def category(self, path):
+        path = tuple(path)
+        try:
+            return self._categories[path]
+        except KeyError:
+            pass
+        tags = self.base.category(path)
+        for pack in self.packs:
+            if pack.owns_path(path):
+                tags = merge_tags(tags, pack.category(path))
+        self._categories[path] = tags
+        return tags
+
+    def section(self, name):
+        return self.base.section(name)
+
+    def core_category(self, path):
+        return self.base.category(path)
+
+    def owned_by_pack(self, path):
+        path = tuple(path)
+        return any(pack.owns_path(path) for pack in self.packs)
+
+    @property
+    def tags(self):
+        """The merged tag tree; parses every pack"""
+        if self._tags is None:
+            with self._lock:
+                if self._tags is None:
+                    root = {name: value for name, value in self.base.tags.items() if name.startswith("_")}
+                    paths = dict.fromkeys(path for path, _tags in iter_categories(self.base.tags))
+                    for pack in self.packs:
+                        paths.update((path, None) for path, _tags in iter_categories(pack.tags)
+                                     if pack.owns_path(path))
+                    for path in paths:
+                        *parents, leaf = path
+                        node = root
+                        for parent in parents:
+                            node = node.setdefault(parent, {})
+                            if not isinstance(node, dict):
+                                break
+                        else:
+                            node.setdefault(leaf, self.category(path))
+                    self._tags = freeze(root)
+        return self._tags
+
+
+def compiled_path_for(path):
+    """Where the compiled form of a tag JSON file lives (factory_tags.json -> factory_tags.bin)"""
+    return os.path.splitext(path)[0] + ".bin"
+
+
+def compile_catalog(path=DEFAULT_TAGS_PATH, output=None):
+    """Compile a tag JSON file into the memory-mappable binary format; returns the output path"""
+    output = output or compiled_path_for(path)
+    with open(path, 'rb') as f:
+        raw = f.read()
+    version = hashlib.sha256(raw).hexdigest()[:16]
+
+    data = json.loads(raw.decode('utf-8'))
+    strings = {}
+    categories = []
+    refs = []
+    weights = []
+
+    def string_index(value):
+        return strings.setdefault(value, len(strings))
+
+    def walk(node, weight_tree, parents):
+        for key, value in node.items():
+            if not parents and key == WEIGHTS_KEY:
+                continue
+            if not parents and key.startswith("_"):
+                # Settings section: stored whole, as JSON
+                categories.append((string_index(CATEGORY_PATH_SEP + key), len(refs), 1, 0))
+                refs.append(string_index(json.dumps(value, ensure_ascii=False, separators=(",", ":"))))
+                weights.append(1.0)
+                continue
+            branch = weight_tree.get(key) if isinstance(weight_tree, dict) else None
+            if isinstance(value, dict):
+                walk(value, branch, parents + (key,))
+            elif isinstance(value, list):
+                tags = [str(tag) for tag in value]
+                values = tag_weights(tags, branch, ".".join(parents + (key,)))
+                categories.append((string_index(CATEGORY_PATH_SEP.join(parents + (key,))), len(refs), len(tags),
+                                   int(values is not None)))
+                refs.extend(string_index(tag) for tag in tags)
+                weights.extend(values if values is not None else [1.0] * len(tags))
+
+    walk(data, data.get(WEIGHTS_KEY), ())
+    if not any(weighted for _path, _first, _length, weighted in categories):
+        weights = []
+
+    blobs = [value.encode('utf-8') for value in strings]
+    offsets = [0]
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+
+    tmp_path = output + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(COMPILED_HEADER.pack(COMPILED_MAGIC, COMPILED_FORMAT, 0, version.encode('ascii'),
+                                     len(strings), len(categories), len(refs), len(weights)))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(b"".join(blobs))
+        f.write(struct.pack(f"<{4 * len(categories)}I", *(n for entry in categories for n in entry)))
+        f.write(struct.pack(f"<{len(refs)}I", *refs))
+        f.write(struct.pack(f"<{len(weights)}d", *weights))
+    os.replace(tmp_path, output)
+    return output
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+# Tags path -> pack files listed by its manifest when it was last read
+_pack_files = {}
+
+# Seconds between checks of the tag files for changes, and tags path -> time of the last check
+RELOAD_CHECK_INTERVAL = 1.0
+_checked = {}
+
+
+def _file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _source_stamp(path):
+    # Both files are watched, so recompiling or editing the JSON triggers a reload; so are the
+    # pack manifest and the pack files it listed when last read
+    return (_file_mtime(path), _file_mtime(compiled_path_for(path)), _file_mtime(pack_manifest_path(path)),
+            tuple(_file_mtime(pack_path) for pack_path in _pack_files.get(path, ())))
+
+
+def pack_manifest_path(path):
+    """Where the tag pack manifest for a tag JSON file lives (tag_packs/manifest.json beside it)"""
+    return os.path.join(os.path.dirname(path), PACKS_DIRNAME, PACK_MANIFEST)
+
+
+def load_packs(path, previous=()):
+    """
+    Index the packs listed in the manifest for path without parsing them: each file is
+    only hashed. Entries whose owned prefixes, version and content are unchanged reuse
+    the previous TagPack and its parsed tags.
+    """
+    manifest_path = pack_manifest_path(path)
+    if not os.path.exists(manifest_path):
+        _pack_files[path] = ()
+        return ()
+    try:
+        with open(manifest_path, 'rb') as f:
+            manifest = json.loads(f.read().decode('utf-8'))
+        entries = manifest["packs"]
+        if not isinstance(entries, list):
+            raise ValueError('"packs" must be a list')
+    except Exception as e:
+        print(f"Error loading tag pack manifest, keeping the previous packs: {e}", file=sys.stderr)
+        return tuple(previous)
+
+    directory = os.path.dirname(manifest_path)
+    reusable = {pack.name: pack for pack in previous}
+    packs = []
+    pack_files = []
+    for entry in entries:
+        file_name = entry.get("file") if isinstance(entry, dict) else None
+        owns = entry.get("owns") if isinstance(entry, dict) else None
+        if not isinstance(file_name, str) or not isinstance(owns, list) or not owns or \
+                not all(isinstance(prefix, str) and prefix for prefix in owns):
+            print(f'Ignoring tag pack entry {entry!r}: it needs a "file" and a list of owned categories in "owns"',
+                  file=sys.stderr)
+            continue
+        pack_path = os.path.join(directory, file_name)
+        pack_files.append(pack_path)
+        mtime = _file_mtime(pack_path)
+        try:
+            with open(pack_path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:16]
+        except OSError as e:
+            print(f"Ignoring tag pack {file_name}: {e}", file=sys.stderr)
+            continue
+        pack = TagPack(str(entry.get("name") or os.path.splitext(file_name)[0]), pack_path,
+                       tuple(tuple(prefix.split(".")) for prefix in owns), str(entry.get("version", "")), mtime,
+                       digest)
+        previous_pack = reusable.get(pack.name)
+        packs.append(previous_pack if previous_pack is not None and previous_pack.same_entry(pack) else pack)
+    _pack_files[path] = tuple(pack_files)
+    return tuple(packs)
+
+
+def load_catalog(path=DEFAULT_TAGS_PATH, previous=None):
+    """
+    Read and parse a tag file and index its packs; reuses the previous snapshot if the
+    content hash and pack entries are unchanged, and unchanged packs in any case.
+    """
+    previous_base = previous.base if isinstance(previous, PackedTagCatalog) else previous
+    packs = load_packs(path, previous.packs if previous is not None else ())
+    mtime = _source_stamp(path)
+    base = load_base_catalog(path, previous_base, mtime)
+    if not packs:
+        return base
+    if isinstance(previous, PackedTagCatalog) and previous.base is base and len(previous.packs) == len(packs) and \
+            all(old is new for old, new in zip(previous.packs, packs)):
+        previous.mtime = mtime
+        return previous
+    return PackedTagCatalog(base, packs, mtime)
+
+
+def load_base_catalog(path, previous, mtime):
+    """
+    Read and parse a tag file; reuses the previous snapshot if the content hash is unchanged.
+    The compiled file is used only when the source hash in its header matches the JSON, so
+    a stale one (e.g. older tags restored with newer timestamps) is never served.
+    """
+    compiled_mtime = mtime[1]
+    raw = version = read_error = None
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+        version = hashlib.sha256(raw).hexdigest()[:16]
+    except OSError as e:
+        read_error = e
+    if previous is not None and version is not None and previous.version == version:
+        previous.mtime = mtime
+        return previous
+    if compiled_mtime is not None and sys.byteorder == "little":
+        try:
+            catalog = MappedTagCatalog(compiled_path_for(path), path, mtime)
+            if version is None or catalog.version == version:
+                if previous is not None and previous.version == catalog.version:
+                    previous.mtime = mtime
+                    return previous
+                return catalog
+            print(f"Compiled tags {compiled_path_for(path)} were built from a different {os.path.basename(path)}, "
+                  f"using the JSON (recompile with: python Factory_tag_catalog.py)", file=sys.stderr)
+        except Exception as e:
+            print(f"Error loading compiled tags, falling back to JSON: {e}", file=sys.stderr)
+    try:
+        if raw is None:
+            raise read_error
+        return TagCatalog(json.loads(raw.decode('utf-8')), path, version, mtime)
+    except Exception as e:
+        print(f"Error loading tags JSON: {e}", file=sys.stderr)
+        if previous is not None:
+            previous.mtime = mtime
+            return previous
+        return TagCatalog({}, path, "", mtime)
+
+
+def get_catalog(path=DEFAULT_TAGS_PATH):
+    """
+    Return the process-wide catalog for path, reloading it if the files changed on disk.
+    The files are checked at most once per RELOAD_CHECK_INTERVAL, so the many calls of
+    one node run cost a dict lookup and a clock read instead of several stats each.
+    """
+    catalog = _catalogs.get(path)
+    now = time.monotonic()
+    if catalog is not None and now - _checked.get(path, -RELOAD_CHECK_INTERVAL) < RELOAD_CHECK_INTERVAL:
+        return catalog
+    mtime = _source_stamp(path)
+    _checked[path] = now
+    if catalog is not None and catalog.mtime == mtime:
+        return catalog
+    with _catalogs_lock:
+        catalog = _catalogs.get(path)
+        if catalog is None or catalog.mtime != mtime:
+            catalog = load_catalog(path, catalog)
+            _catalogs[path] = catalog
+        return catalog
+
+
+def install_catalog(catalog, path=DEFAULT_TAGS_PATH):
+    """
+    Make an already loaded catalog the shared one for path (e.g. in a worker process
+    or a benchmark). It stays in use until the files at path change on disk.
+    """
+    with _catalogs_lock:
+        catalog.mtime = _source_stamp(path)
+        _catalogs[path] = catalog
+        _checked[path] = time.monotonic()
+
+
+def catalog_version(path=DEFAULT_TAGS_PATH):
+    """Content hash of the current catalog; changes whenever the tag file does"""
+    return get_catalog(path).version
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile a tag JSON file into a memory-mappable catalog")
+    parser.add_argument("path", nargs="?", default=DEFAULT_TAGS_PATH, help="tag JSON file")
+    parser.add_argument("-o", "--output", help="compiled file (defaults to the JSON path with .bin)")
+    args = parser.parse_args(argv)
+    output = compile_catalog(args.path, args.output)
+    print(f"Compiled {args.path} -> {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
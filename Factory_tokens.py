@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+
+"""
+Factory Tokens - CLIP token counts and token-budget aware prompt assembly
+CLIP text encoders read prompts in chunks of 77 tokens (75 usable between the start and
+end tokens); every chunk started costs another encoder pass. Tag token counts are
+computed once per catalog snapshot, and fit_parts() keeps a prompt inside a budget by
+dropping the least emphasized optional tags first, optionally inserting BREAK between
+chunks so no tag straddles a chunk boundary.
+
+Counts use the CLIP BPE merges when a copy is available offline: the file named by
+FACTORY_PROMPTS_CLIP_MERGES, clip_merges.txt next to this module, or the one bundled
+with ComfyUI (comfy/sd1_tokenizer/merges.txt). Otherwise a conservative estimate is used.
+"""
+
+import importlib.util
+import os
+import re
+import sys
+
+CHUNK_TOKENS = 75
+BREAK_TEXT = "BREAK"
+
+# Same pre-tokenization as CLIP (letters, single digits, other symbol runs)
+WORD_PATTERN = re.compile(r"<\|startoftext\|>|<\|endoftext\|>|'s|'t|'re|'ve|'m|'ll|'d|[^\W\d_]+|\d|(?:[^\s\w]|_)+",
+                          re.IGNORECASE)
+WEIGHT_PATTERN = re.compile(r"^(.*):\s*[-+]?\d*\.?\d+$", re.DOTALL)
+
+# Merges used by the CLIP vocabulary (the rest of merges.txt is unused)
+CLIP_MERGES = 49152 - 256 - 2
+
+TOKEN_CACHE_SIZE = 65536
+
+# Dropped parts named in a budget summary line before the rest are only counted
+SUMMARY_DROPPED_NAMES = 12
+
+
+def bytes_to_unicode():
+    """CLIP's reversible byte -> printable character table"""
+    printable = list(range(ord("!"), ord("~") + 1)) + list(range(ord("¡"), ord("¬") + 1)) + \
+        list(range(ord("®"), ord("ÿ") + 1))
+    chars = printable[:]
+    extra = 0
+    for byte in range(256):
+        if byte not in printable:
+            printable.append(byte)
+            chars.append(256 + extra)
+            extra += 1
+    return dict(zip(printable, map(chr, chars)))
+
+
+class ClipBPE:
+    """Minimal CLIP byte-pair encoder that only counts tokens"""
+
+    def __init__(self, merges_path):
+        with open(merges_path, 'r', encoding='utf-8') as f:
+            lines = f.read().split("\n")[1:CLIP_MERGES + 1]
+        self.ranks = {tuple(line.split()): rank for rank, line in enumerate(lines) if line}
+        self.byte_encoder = bytes_to_unicode()
+        self._words = {}
+
+    def word_tokens(self, word):
+        count = self._words.get(word)
+        if count is not None:
+            return count
+        symbols = tuple(word[:-1]) + (word[-1] + "</w>",)
+        ranks = self.ranks
+        while len(symbols) > 1:
+            pair = min(zip(symbols, symbols[1:]), key=lambda p: ranks.get(p, float("inf")))
+            if pair not in ranks:
+                break
+            merged = []
+            i = 0
+            while i < len(symbols):
+                if i < len(symbols) - 1 and (symbols[i], symbols[i + 1]) == pair:
+                    merged.append(symbols[i] + symbols[i + 1])
+                    i += 2
+                else:
+                    merged.append(symbols[i])
+                    i += 1
+            symbols = tuple(merged)
+        count = len(symbols)
+        if len(self._words) < TOKEN_CACHE_SIZE:
+            self._words[word] = count
+        return count
+
+    def count(self, text):
+        encoder = self.byte_encoder
+        total = 0
+        for word in WORD_PATTERN.findall(" ".join(text.split()).lower()):
+            total += self.word_tokens("".join(encoder[b] for b in word.encode("utf-8")))
+        return total
+
+
+def estimate_tokens(text):
+    """
+    Token count without the BPE merges: short words are usually one token, longer ones
+    about one per five letters, digits and symbols one each. Tends to overestimate.
+    """
+    total = 0
+    for word in WORD_PATTERN.findall(text.lower()):
+        if word[0].isalpha():
+            total += 1 if len(word) <= 7 else (len(word) + 4) // 5
+        else:
+            total += len(word)
+    return total
+
+
+def find_merges():
+    """Path of an offline copy of the CLIP merges, or None"""
+    candidates = [os.environ.get("FACTORY_PROMPTS_CLIP_MERGES"),
+                  os.path.join(os.path.dirname(os.path.abspath(__file__)), "clip_merges.txt")]
+    try:
+        spec = importlib.util.find_spec("comfy")
+    except (ImportError, ValueError):
+        spec = None
+    for location in (spec.submodule_search_locations or ()) if spec else ():
+        candidates.append(os.path.join(location, "sd1_tokenizer", "merges.txt"))
+    for path in candidates:
+        if path and os.path.isfile(path):
+            return path
+    return None
+
+
+_counter = None
+
+
+def token_counter():
+    """Shared text -> token count function, loaded on first use"""
+    global _counter
+    if _counter is None:
+        path = find_merges()
+        counter = estimate_tokens
+        if path:
+            try:
+                counter = ClipBPE(path).count
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"Error loading CLIP merges from {path}, estimating token counts: {e}", file=sys.stderr)
+        _counter = counter
+    return _counter
+
+
+def wrapped_in(part, opener, closer):
+    """Whether the bracket opening part is the one closing it, e.g. (a, b) but not (a) (b)"""
+    if len(part) <= 2 or part[0] != opener or part[-1] != closer:
+        return False
+    depth = 0
+    i = 0
+    while i < len(part):
+        char = part[i]
+        if char == "\\":
+            i += 1
+        elif char == opener:
+            depth += 1
+        elif char == closer:
+            depth -= 1
+            if depth == 0:
+                return i == len(part) - 1
+        i += 1
+    return False
+
+
+def strip_emphasis(part):
+    """(text, weight) of a prompt part written as tag, (tag), ((tag)), [tag] or (tag:1.2)"""
+    depth = 0
+    while True:
+        if wrapped_in(part, "(", ")"):
+            depth += 1
+        elif wrapped_in(part, "[", "]"):
+            depth -= 1
+        else:
+            break
+        part = part[1:-1]
+    if depth > 0:
+        weighted = WEIGHT_PATTERN.match(part)
+        if weighted:
+            return weighted.group(1), float(part[part.rindex(":") + 1:]) * 1.1 ** (depth - 1)
+    return part, 1.1 ** depth
+
+
+class TokenCounts(dict):
+    """
+    Prompt part -> CLIP tokens it occupies, computed on first use.
+    Emphasis brackets and weights are parsed out by the encoder and cost nothing.
+    Build one per catalog snapshot (catalog.derived) or per term table.
+    """
+
+    def __init__(self, catalog=None):
+        super().__init__()
+        self.count = token_counter()
+
+    def __missing__(self, part):
+        count = self.count(strip_emphasis(part)[0])
+        if len(self) >= TOKEN_CACHE_SIZE:
+            self.clear()
+        self[part] = count
+        return count
+
+
+def layout(costs, keep, chunk_breaks):
+    """(tokens, chunks, indices that start a new chunk) of the kept parts joined with ", " """
+    tokens = 0
+    chunks = 1
+    starts = []
+    used = 0
+    for i, cost in enumerate(costs):
+        if not keep[i]:
+            continue
+        if not chunk_breaks:
+            tokens += cost + (1 if tokens else 0)
+            continue
+        # A part that does not fit with its comma starts the next chunk (after BREAK, no comma)
+        if used and used + 1 + cost > CHUNK_TOKENS:
+            chunks += 1
+            starts.append(i)
+            used = 0
+        cost += 1 if used else 0
+        used += cost
+        tokens += cost
+        while used > CHUNK_TOKENS:
+            chunks += 1
+            used -= CHUNK_TOKENS
+    if not chunk_breaks:
+        chunks = max(1, -(-tokens // CHUNK_TOKENS))
+    return tokens, chunks, starts
+
+
+def fit_parts(parts, priorities, budget, chunk_breaks=False, counts=None):
+    """
+    Join prompt parts within budget tokens.
+    priorities[i] is None for parts that are always kept (required or explicitly chosen);
+    the others are dropped lowest priority first, later parts first on ties, until the
+    prompt fits. With chunk_breaks the budget is a whole number of chunks and BREAK
+    starts each new chunk.
+    Returns (prompt, dropped part indices, tokens used, chunks).
+    """
+    if counts is None:
+        counts = TokenCounts()
+    costs = [counts[part] for part in parts]
+    keep = [True] * len(parts)
+    max_chunks = max(1, budget // CHUNK_TOKENS)
+    drop_order = sorted((i for i, priority in enumerate(priorities) if priority is not None),
+                        key=lambda i: (priorities[i], -i))
+
+    def fits(drop_count):
+        for k, i in enumerate(drop_order):
+            keep[i] = k >= drop_count
+        result = layout(costs, keep, chunk_breaks)
+        return ((result[1] <= max_chunks) if chunk_breaks else (result[0] <= budget)), result
+
+    # Dropping more never makes a prompt longer: binary search the fewest drops that fit.
+    # This holds for chunk counts too: layout() fills chunks greedily in order, so removing a
+    # part never moves a later BREAK earlier (tests/test_tokens.py checks both properties)
+    fitted, result = fits(0)
+    if not fitted:
+        low, high = 1, len(drop_order)
+        while low < high:
+            middle = (low + high) // 2
+            if fits(middle)[0]:
+                high = middle
+            else:
+                low = middle + 1
+        fitted, result = fits(low)
+    tokens, chunks, starts = result
+    dropped = [i for i in drop_order if not keep[i]]
+
+    if not starts:
+        prompt = ", ".join(part for part, kept in zip(parts, keep) if kept)
+    else:
+        pieces = []
+        current = []
+        starts = set(starts)
+        for i, part in enumerate(parts):
+            if not keep[i]:
+                continue
+            if i in starts:
+                pieces.append(", ".join(current))
+                current = []
+            current.append(part)
+        pieces.append(", ".join(current))
+        prompt = f" {BREAK_TEXT} ".join(pieces)
+    return prompt, sorted(dropped), tokens, chunks
+
+
+def budget_summary(tokens, chunks, dropped_parts):
+    """Selection summary line describing a fitted prompt"""
+    line = f"Token Budget: {tokens} tokens in {chunks} chunk{'s' if chunks != 1 else ''}"
+    if dropped_parts:
+        line += f", dropped {len(dropped_parts)}: {', '.join(dropped_parts[:SUMMARY_DROPPED_NAMES])}"
+        if len(dropped_parts) > SUMMARY_DROPPED_NAMES:
+            line += f" (+{len(dropped_parts) - SUMMARY_DROPPED_NAMES} more)"
+    return line
@@ -8,6 +8,12 @@ print("\033[93m🏭 The assembly line is live.\033[0m")
 from .Factory_prompt_generator import NODE_CLASS_MAPPINGS as PROMPT_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS as PROMPT_DISPLAY_MAPPINGS
 from .Factory_negative_generator import NODE_CLASS_MAPPINGS as NEGATIVE_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS as NEGATIVE_DISPLAY_MAPPINGS
 
+# Optional local HTTP prompt service on ComfyUI's server (imported only when enabled)
+import os
+if os.environ.get("FACTORY_PROMPTS_SERVICE", "").strip().lower() not in ("", "0", "false", "no", "off"):
+    from .Factory_service import register_routes
+    register_routes()
+
 # Combine all node mappings
 NODE_CLASS_MAPPINGS = {**PROMPT_MAPPINGS, **NEGATIVE_MAPPINGS}
 NODE_DISPLAY_NAME_MAPPINGS = {**PROMPT_DISPLAY_MAPPINGS, **NEGATIVE_DISPLAY_MAPPINGS}
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+"""
+Import-time benchmark for the Factory Prompts package
+Imports the package in fresh interpreters the way ComfyUI does (by file path) and fails
+if the median import time exceeds the budget, or if the import loaded the tag catalog
+or compiled the negative term table instead of deferring them to first use
+
+Usage:
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --runs 21 --budget-ms 10
+"""
+
+import argparse
+import compileall
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Import-time budget for the package itself, in milliseconds
+IMPORT_BUDGET_MS = 15.0
+
+# Standard modules ComfyUI has already imported before it loads custom nodes
+PRELOADED_MODULES = ("json", "hashlib", "typing", "re", "threading", "functools", "collections", "struct", "mmap")
+
+CHILD_SCRIPT = """
+import importlib.util, json, sys, time
+for name in {preloaded!r}:
+    __import__(name)
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location(
+    "factory_prompts", {init_path!r}, submodule_search_locations=[{package_dir!r}])
+module = importlib.util.module_from_spec(spec)
+sys.modules["factory_prompts"] = module
+spec.loader.exec_module(module)
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "ms": elapsed * 1000,
+    "nodes": len(module.NODE_CLASS_MAPPINGS),
+    "catalog_loaded": bool(sys.modules["factory_prompts.Factory_tag_catalog"]._catalogs),
+    "negative_table_built": sys.modules["factory_prompts.Factory_negative_generator"]._term_table is not None,
+}}))
+"""
+
+
+def measure_import(package_dir=PACKAGE_DIR, preloaded=PRELOADED_MODULES):
+    """Import the package once in a fresh interpreter; returns the child's report dict"""
+    script = CHILD_SCRIPT.format(preloaded=tuple(preloaded), package_dir=package_dir,
+                                 init_path=os.path.join(package_dir, "__init__.py"))
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+    # The package prints a startup banner; the report is the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the Factory Prompts package import time")
+    parser.add_argument("--runs", type=int, default=11)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--cold", action="store_true", help="do not preload ComfyUI's standard modules")
+    args = parser.parse_args(argv)
+
+    # Installed packages import from bytecode; compile it even if PYTHONDONTWRITEBYTECODE is set
+    compileall.compile_dir(PACKAGE_DIR, maxlevels=0, quiet=1)
+    measure_import(preloaded=())
+    reports = [measure_import(preloaded=() if args.cold else PRELOADED_MODULES) for _ in range(args.runs)]
+    median_ms = statistics.median(report["ms"] for report in reports)
+    print(f"import: median {median_ms:.2f} ms over {args.runs} runs "
+          f"(min {min(r['ms'] for r in reports):.2f}, max {max(r['ms'] for r in reports):.2f}), "
+          f"{reports[0]['nodes']} nodes, budget {args.budget_ms:.1f} ms")
+
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(f"median import time {median_ms:.2f} ms exceeds the {args.budget_ms:.1f} ms budget")
+    if any(report["catalog_loaded"] for report in reports):
+        failures.append("the tag catalog was loaded at import time")
+    if any(report["negative_table_built"] for report in reports):
+        failures.append("the negative term table was compiled at import time")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
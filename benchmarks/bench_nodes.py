@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+"""
+Node benchmark suite for the Factory Prompts package
+Times every node hot path against the real tag catalog and synthetic catalogs scaled
+10x-1000x, and compares the results with the stored baseline (baseline.json).
+Every case is compared relative to a fixed reference workload timed in the same run, so
+the check holds across machines and under background load; each timing is the best of
+several repeats.
+Node result caching is bypassed except in the "cached" cases, so each case measures
+real work; seeds advance every iteration.
+
+Usage:
+    python benchmarks/bench_nodes.py                  # compare with baseline.json
+    python benchmarks/bench_nodes.py --save           # record a new baseline
+    python benchmarks/bench_nodes.py --scales 1,10 --filter positive
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_DIR)
+
+from Factory_export import default_inputs, iter_prompts  # noqa: E402
+from Factory_negative_generator import (  # noqa: E402
+    PRESET_CATEGORIES, PonyNegativeCategorizedNode, PonyNegativeNode, PonyNegativeToggleNode)
+from Factory_prompt_generator import (  # noqa: E402
+    TAG_DROPDOWNS, FactoryPromptsPositiveBatchNode, FactoryPromptsPositiveNode, build_input_types)
+from Factory_tag_catalog import TagCatalog, get_catalog, install_catalog  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+DEFAULT_SCALES = (1, 10, 100, 1000)
+
+# A case fails when it is slower than baseline * threshold
+DEFAULT_THRESHOLD = 1.5
+
+BATCH_SIZE = 256
+# Output set of a workflow that only reads the prompt_spec output
+SPEC_ONLY = frozenset({2})
+BULK_ROWS = 1024
+
+
+def scale_tags(tags, factor, root=True):
+    """Copy of a tag dict with every tag list grown factor times (tag, tag_1, tag_2, ...)"""
+    if isinstance(tags, dict):
+        # Root "_" keys are settings sections (weights, rules), not tag lists
+        return {key: value if root and key.startswith("_") else scale_tags(value, factor, False)
+                for key, value in tags.items()}
+    if isinstance(tags, (list, tuple)):
+        return [tag if k == 0 else f"{tag}_{k}" for tag in tags for k in range(factor)]
+    return tags
+
+
+def synthetic_catalog(base, factor):
+    """base scaled by factor, with its own version so cached results never mix"""
+    if factor == 1:
+        return base
+    return TagCatalog(scale_tags(base.tags, factor), base.path, f"{base.version}-x{factor}")
+
+
+def time_per_op(fn, ops_per_call=1, min_time=0.2, repeats=5):
+    """Best-of-repeats microseconds per operation; fn(i) is called with a fresh index every time"""
+    calls = 1
+    counter = [0]
+
+    def run(n):
+        start = time.perf_counter()
+        for _ in range(n):
+            fn(counter[0])
+            counter[0] += 1
+        return time.perf_counter() - start
+
+    run(1)  # warm up derived structures
+    while run(calls) < min_time / repeats:
+        calls *= 2
+    samples = [run(calls) / (calls * ops_per_call) * 1e6 for _ in range(repeats)]
+    return min(samples)
+
+
+def reference_workload(i):
+    """Fixed interpreter-bound work (dict updates, formatting, a join) that timings are normalized by"""
+    parts = {}
+    for k in range(64):
+        parts[(k + i) % 37] = f"tag_{k}"
+    return ", ".join(parts.values())
+
+
+def time_reference(min_time=0.2):
+    return round(time_per_op(reference_workload, 1, min_time), 3)
+
+
+def positive_cases(catalog, scale):
+    node = FactoryPromptsPositiveNode()
+    batch_node = FactoryPromptsPositiveBatchNode()
+    generate = FactoryPromptsPositiveNode.generate_prompts.__wrapped__
+    input_types = build_input_types(catalog)
+
+    random_inputs = default_inputs(input_types)
+    explicit_inputs = dict(random_inputs)
+    for name, _paths in TAG_DROPDOWNS:
+        options = input_types["optional"][name][0]
+        if len(options) > 1:
+            explicit_inputs[name] = options[1]
+    custom_inputs = dict(random_inputs, custom_elements="soft focus, (film grain:1.1), bokeh, dramatic clouds")
+    budget_inputs = dict(random_inputs, token_budget=75, chunk_breaks=True)
+    # Re-queuing with one widget changed: same seed, a different lighting each time
+    lighting_options = input_types["optional"]["lighting"][0][1:]
+
+    def with_seed(inputs, i):
+        return dict(inputs, seed=i)
+
+    batch_inputs = {name: value for name, value in random_inputs.items() if name != "seed"}
+
+    yield f"input_types@x{scale}", lambda i: build_input_types(catalog), 1
+    yield f"positive/random@x{scale}", lambda i: generate(node, **with_seed(random_inputs, i)), 1
+    yield f"positive/explicit@x{scale}", lambda i: generate(node, **with_seed(explicit_inputs, i)), 1
+    yield (f"positive/one_widget_changed@x{scale}",
+           lambda i: generate(node, **dict(random_inputs, seed=0, lighting=lighting_options[i % len(lighting_options)])),
+           1)
+    yield f"positive/custom_elements@x{scale}", lambda i: generate(node, **with_seed(custom_inputs, i)), 1
+    yield (f"positive/spec_only@x{scale}",
+           lambda i: generate(node, outputs=SPEC_ONLY, **with_seed(random_inputs, i)), 1)
+    yield f"positive/token_budget@x{scale}", lambda i: generate(node, **with_seed(budget_inputs, i)), 1
+    yield (f"positive/batch{BATCH_SIZE}@x{scale}",
+           lambda i: batch_node.generate_batch(seed=i * BATCH_SIZE, batch_size=BATCH_SIZE, **batch_inputs),
+           BATCH_SIZE)
+    yield (f"export/iter_prompts@x{scale}",
+           lambda i: sum(1 for _row in iter_prompts(i * BULK_ROWS, BULK_ROWS, negative={"preset": "standard"})),
+           BULK_ROWS)
+
+
+def negative_cases():
+    generate = PonyNegativeNode.generate_negative.__wrapped__
+    node = PonyNegativeNode()
+    defaults = default_inputs(PonyNegativeNode.INPUT_TYPES())
+    for preset in PRESET_CATEGORIES:
+        inputs = dict(defaults, preset=preset)
+        yield f"negative/preset/{preset}", lambda i, inputs=inputs: generate(node, **inputs), 1
+
+    all_on = dict(defaults, preset="comprehensive", include_nsfw_filters=True, include_violence_filters=True,
+                  strength_boost=True, custom_negatives="watermark, extra limbs, lowres")
+    yield "negative/preset/everything+custom", lambda i: generate(node, **all_on), 1
+
+    budgeted = dict(defaults, preset="professional", token_budget=150, chunk_breaks=True)
+    yield "negative/token_budget", lambda i: generate(node, **budgeted), 1
+
+    categorized = PonyNegativeCategorizedNode()
+    categorized_generate = PonyNegativeCategorizedNode.generate_categorized_negative.__wrapped__
+    categorized_inputs = default_inputs(PonyNegativeCategorizedNode.INPUT_TYPES())
+    yield "negative/categorized", lambda i: categorized_generate(categorized, **categorized_inputs), 1
+
+    toggle = PonyNegativeToggleNode()
+    toggle_generate = PonyNegativeToggleNode.generate_negative_toggles.__wrapped__
+    toggle_inputs = default_inputs(PonyNegativeToggleNode.INPUT_TYPES())
+    yield "negative/toggle", lambda i: toggle_generate(toggle, **dict(toggle_inputs, seed=i)), 1
+
+    yield "negative/cached", lambda i: node.generate_negative(**defaults), 1
+
+
+def run_suite(scales=DEFAULT_SCALES, name_filter=None, min_time=0.2):
+    """
+    Run every case; returns ({case name: microseconds per operation}, reference microseconds).
+    The reference is timed before and after the cases and the faster run is kept.
+    """
+    results = {}
+    reference = time_reference(min_time)
+
+    def record(name, fn, ops):
+        if name_filter and name_filter not in name:
+            return
+        results[name] = round(time_per_op(fn, ops, min_time), 3)
+        print(f"  {name:<40} {results[name]:>12.3f} us/op")
+
+    for name, fn, ops in negative_cases():
+        record(name, fn, ops)
+
+    original = get_catalog()
+    try:
+        for scale in scales:
+            catalog = synthetic_catalog(original, scale)
+            install_catalog(catalog)
+            for name, fn, ops in positive_cases(catalog, scale):
+                record(name, fn, ops)
+            node = FactoryPromptsPositiveNode()
+            inputs = default_inputs(FactoryPromptsPositiveNode.INPUT_TYPES())
+            record(f"positive/cached@x{scale}", lambda i: node.generate_prompts(**inputs), 1)
+    finally:
+        install_catalog(original)
+    reference = min(reference, time_reference(min_time))
+    print(f"  {'reference':<40} {reference:>12.3f} us/op")
+    return results, reference
+
+
+def compare(results, baseline, reference=None):
+    """
+    Cases slower than their baseline threshold, as (name, current, baseline, ratio).
+    With a reference timing on both sides, the ratio compares times relative to the reference.
+    """
+    thresholds = baseline.get("thresholds", {})
+    default = thresholds.get("default", DEFAULT_THRESHOLD)
+    scale = 1.0
+    if reference and baseline.get("reference"):
+        scale = baseline["reference"] / reference
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        ratio = current * scale / previous
+        if ratio > thresholds.get(name, default):
+            regressions.append((name, current, previous, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Factory Prompts node hot paths")
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                        help="comma-separated catalog scale factors")
+    parser.add_argument("--filter", help="only run cases whose name contains this text")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds spent timing each case")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    scales = tuple(int(scale) for scale in args.scales.split(","))
+    results, reference = run_suite(scales, args.filter, args.min_time)
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline.setdefault("thresholds", {"default": DEFAULT_THRESHOLD})
+        baseline["environment"] = {"python": platform.python_version(), "machine": platform.machine(),
+                                   "system": platform.system()}
+        if not args.filter and args.scales == parser.get_default("scales"):
+            baseline["reference"] = reference
+        elif baseline.get("reference"):
+            # Partial runs are stored at the existing baseline's reference speed
+            results = {name: round(value * baseline["reference"] / reference, 3) for name, value in results.items()}
+        else:
+            baseline["reference"] = reference
+        baseline["results"] = dict(sorted({**baseline.get("results", {}), **results}.items()))
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"Saved {len(results)} results to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save to create one")
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, reference)
+    for name, current, previous, ratio in regressions:
+        print(f"REGRESSION: {name} {current:.3f} us/op vs baseline {previous:.3f} ({ratio:.2f}x relative to the reference)")
+    if not regressions:
+        print(f"No regressions against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
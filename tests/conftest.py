@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The node modules are flat top-level files; import them the way the export CLI does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
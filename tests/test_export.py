@@ -0,0 +1,67 @@
+import io
+import multiprocessing
+import os
+import subprocess
+import sys
+
+import pytest
+
+from Factory_export import bulk_export, count_existing_rows, iter_prompts, main, write_rows
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NEGATIVE = {"preset": "standard"}
+
+
+def single_process(start_seed, count, fmt, negative=NEGATIVE):
+    buffer = io.StringIO()
+    write_rows(iter_prompts(start_seed, count, None, negative, chunk_size=4), buffer, fmt)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "csv"])
+def test_bulk_export_matches_single_process(fmt):
+    buffer = io.StringIO()
+    written = bulk_export(buffer, 1234, 25, negative=NEGATIVE, fmt=fmt, workers=2, shard_size=7, chunk_size=4)
+    assert written == 25
+    assert buffer.getvalue() == single_process(1234, 25, fmt)
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "csv"])
+def test_resume_matches_one_run(tmp_path, fmt):
+    path = str(tmp_path / f"prompts.{fmt}")
+    main(["--count", "10", "--start-seed", "5", "-o", path])
+    main(["--count", "25", "--start-seed", "5", "-o", path, "--resume"])
+    with open(path, encoding="utf-8", newline="") as f:
+        assert f.read() == single_process(5, 25, fmt)
+
+
+@pytest.mark.parametrize("fmt, cut", [("jsonl", "row"), ("csv", "row"), ("csv", "line")])
+def test_resume_after_an_interrupted_write(tmp_path, fmt, cut):
+    path = str(tmp_path / f"prompts.{fmt}")
+    main(["--count", "10", "--start-seed", "5", "-o", path])
+    with open(path, "rb") as f:
+        data = f.read()
+    # Cut the last row short: mid-row, or (CSV) just after a newline inside its quoted selections
+    last_row = data.rstrip(b"\n").rfind(b"\n" if fmt == "jsonl" else b"\r\n") + 1
+    end = data.index(b"\n", last_row + 1) + 1 if fmt == "csv" and cut == "line" else len(data) - 7
+    with open(path, "wb") as f:
+        f.write(data[:end])
+    assert count_existing_rows(path, fmt) == 9
+
+    main(["--count", "25", "--start-seed", "5", "-o", path, "--resume"])
+    with open(path, encoding="utf-8", newline="") as f:
+        assert f.read() == single_process(5, 25, fmt)
+
+
+@pytest.mark.parametrize("method", ["spawn", "fork"])
+def test_stdout_export_holds_only_rows(method):
+    if method not in multiprocessing.get_all_start_methods():
+        pytest.skip(f"{method} is not available here")
+    # Workers started with spawn load the catalog themselves; their diagnostics must not reach stdout
+    script = ("import multiprocessing, sys\n"
+              "import Factory_export\n"
+              "if __name__ == '__main__':\n"
+              f"    multiprocessing.set_start_method({method!r}, force=True)\n"
+              "    Factory_export.main(['--count', '20', '--workers', '2', '--shard-size', '7', '-o', '-'])\n")
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout == single_process(0, 20, "jsonl")
@@ -0,0 +1,128 @@
+import itertools
+import random
+
+import pytest
+
+import Factory_negative_generator as negatives
+from Factory_negative_generator import (FactoryPromptsNegativeGenerator, PonyNegativeCategorizedNode,
+                                        PonyNegativeToggleNode)
+
+# The category lists each preset concatenated before the bitset table, in their old order
+OLD_PRESETS = {
+    "minimal": [],
+    "standard": ["enhanced_quality", "anatomy", "composition", "text_elements"],
+    "comprehensive": ["enhanced_quality", "anatomy", "composition", "background",
+                      "text_elements", "clothing", "hair", "technical"],
+    "professional": ["enhanced_quality", "anatomy", "composition", "background",
+                     "text_elements", "clothing", "expressions", "hair",
+                     "unwanted_mediums", "technical"],
+    "anime_focused": ["enhanced_quality", "anatomy", "non_realistic_style_control", "composition",
+                      "text_elements", "unwanted_mediums"],
+}
+CANONICAL = list(dict.fromkeys(term for terms in negatives.CATEGORY_TERMS.values() for term in terms))
+
+
+def old_concatenation(categories, custom_negatives=""):
+    """The list the old nodes built: category lists concatenated, custom terms appended, repeats dropped"""
+    terms = [term for category in categories for term in negatives.CATEGORY_TERMS[category]]
+    terms += [term.strip() for term in custom_negatives.split(",") if term.strip()]
+    return list(dict.fromkeys(terms))
+
+
+def old_boost(terms):
+    return [f"({term}:1.2)" if term in negatives.CRITICAL_TERMS else term for term in terms]
+
+
+def split(prompt):
+    return prompt.split(", ") if prompt else []
+
+
+@pytest.mark.parametrize("preset", list(OLD_PRESETS))
+@pytest.mark.parametrize("style, nsfw, violence", list(itertools.product([False, True], repeat=3)))
+def test_presets_keep_the_old_terms(preset, style, nsfw, violence):
+    categories = ["base_quality"] + OLD_PRESETS[preset]
+    categories += ["non_realistic_style_control", "realistic_style_control"] if style else []
+    categories += ["nsfw_filters"] if nsfw else []
+    categories += ["violence_filters"] if violence else []
+    expected = old_concatenation(categories)
+    prompt = FactoryPromptsNegativeGenerator().build_negative_prompt(
+        preset, include_style_control=style, include_nsfw_filters=nsfw, include_violence_filters=violence)
+    terms = split(prompt)
+    assert sorted(terms) == sorted(expected)
+    # Canonical order: each term at its first category in CATEGORY_TERMS
+    assert terms == [term for term in CANONICAL if term in set(expected)]
+
+
+def test_canonical_order_is_pinned():
+    assert FactoryPromptsNegativeGenerator().build_negative_prompt("minimal", include_style_control=False) == (
+        "lowres, bad_anatomy, bad_hands, text, error, missing_fingers, extra_digit, fewer_digits, cropped, "
+        "worst_quality, low_quality, normal_quality, jpeg_artifacts, signature, watermark, username, blurry")
+    assert CANONICAL[:20] == [
+        "lowres", "bad_anatomy", "bad_hands", "text", "error", "missing_fingers", "extra_digit", "fewer_digits",
+        "cropped", "worst_quality", "low_quality", "normal_quality", "jpeg_artifacts", "signature", "watermark",
+        "username", "blurry", "bad_proportions", "bad_perspective", "bad_shading"]
+    assert list(negatives.CATEGORY_TERMS)[:4] == ["base_quality", "enhanced_quality", "anatomy", "composition"]
+
+
+@pytest.mark.parametrize("preset", list(OLD_PRESETS))
+def test_strength_boost_weights_the_critical_terms(preset):
+    generator = FactoryPromptsNegativeGenerator()
+    plain = split(generator.build_negative_prompt(preset, include_style_control=False))
+    boosted = split(generator.build_negative_prompt(preset, include_style_control=False, strength_boost=True))
+    assert boosted == old_boost(plain)
+    assert {"(bad_anatomy:1.2)", "(worst_quality:1.2)", "(low_quality:1.2)"} <= set(boosted)
+
+
+def test_strength_boost_in_other_weight_syntaxes():
+    generator = FactoryPromptsNegativeGenerator()
+    brackets = split(generator.build_negative_prompt("minimal", strength_boost=True, weight_syntax="brackets"))
+    plain = split(generator.build_negative_prompt("minimal", strength_boost=True, weight_syntax="plain"))
+    assert brackets[:3] == ["lowres", "((bad_anatomy))", "((bad_hands))"]
+    assert plain == split(generator.build_negative_prompt("minimal"))
+
+
+CATEGORIZED_TOGGLES = [
+    ("base_quality", "base_quality"), ("enhanced_quality", "enhanced_quality"), ("anatomy_control", "anatomy"),
+    ("unwanted_mediums", "unwanted_mediums"), ("color_control", "color_control"), ("composition", "composition"),
+    ("background_control", "background"), ("text_removal", "text_elements"), ("clothing_control", "clothing"),
+    ("expression_control", "expressions"), ("hair_control", "hair"), ("technical_artifacts", "technical"),
+    ("non_realistic_style_control", "non_realistic_style_control"),
+    ("realistic_style_control", "realistic_style_control"), ("nsfw_filters", "nsfw_filters"),
+    ("violence_filters", "violence_filters"),
+]
+TOGGLE_COMBINATIONS = [dict(zip((name for name, _category in CATEGORIZED_TOGGLES), flags))
+                       for flags in ([True] * 16, [False] * 16,
+                                     *([rng.random() < 0.5 for _ in range(16)]
+                                       for rng in [random.Random(seed) for seed in range(40)]))]
+
+
+@pytest.mark.parametrize("toggles", TOGGLE_COMBINATIONS)
+@pytest.mark.parametrize("boost", [False, True])
+def test_categorized_and_toggle_nodes_keep_the_old_terms(toggles, boost):
+    custom = "glowing_eyes, lowres, extra wings"
+    expected = old_concatenation([category for name, category in CATEGORIZED_TOGGLES if toggles[name]], custom)
+    if boost:
+        expected = old_boost(expected)
+    categorized = PonyNegativeCategorizedNode().generate_categorized_negative(
+        strength_boost=boost, custom_negatives=custom, **toggles)[0]
+    toggle, summary = PonyNegativeToggleNode().generate_negative_toggles(
+        seed=0, strength_boost=boost, custom_negatives=custom, **toggles)
+    assert sorted(split(categorized)) == sorted(expected)
+    assert split(toggle) == split(categorized)
+    # Custom terms the categories do not cover come last, in their own order
+    covered = set(old_concatenation([category for name, category in CATEGORIZED_TOGGLES if toggles[name]]))
+    tail = [term for term in ("glowing_eyes", "lowres", "extra wings") if term not in covered]
+    assert split(categorized)[-len(tail):] == tail
+
+
+@pytest.mark.parametrize("custom, tail", [
+    ("lowres, (lowres), Lowres", ["Lowres"]),
+    ("extra wings, (extra wings:1.1), Extra Wings", ["extra wings", "Extra Wings"]),
+    ("(lowres:1.3)", ["(lowres:1.3)"]),
+])
+def test_custom_negatives_dedup_keeps_case(custom, tail):
+    prompt = FactoryPromptsNegativeGenerator().build_negative_prompt("minimal", custom_negatives=custom)
+    terms = split(prompt)
+    assert terms[-len(tail):] == tail
+    # Only a weighted custom term replaces the table's own
+    assert terms.count("lowres") == (0 if "(lowres:1.3)" in tail else 1)
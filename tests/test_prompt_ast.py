@@ -0,0 +1,56 @@
+import pytest
+
+from Factory_prompt_ast import EMPHASIS_STEP, Group, Term, parse_prompt, parse_terms, serialize
+
+PARSE_CASES = [
+    # text, expected [(source, node)]
+    ("a, b", [("a", Term("a")), ("b", Term("b"))]),
+    (r"\(text\), b", [(r"\(text\)", Term("(text)")), ("b", Term("b"))]),
+    ("(a, b:1.2), c", [("(a, b:1.2)", Group([Term("a"), Term("b")], 1.2)), ("c", Term("c"))]),
+    ("(x:1.5)", [("(x:1.5)", Term("x", 1.5))]),
+    ("(open, b", [("(open, b", Group([Term("open"), Term("b")], EMPHASIS_STEP))]),
+    ("a), b", [("a)", Term("a")), ("b", Term("b"))]),
+    ("a,,  b ,", [("a", Term("a")), ("b", Term("b"))]),
+    ("x:y", [("x:y", Term("x:y"))]),
+    ("", []),
+]
+
+
+@pytest.mark.parametrize("text, expected", PARSE_CASES)
+def test_parse_prompt(text, expected):
+    assert list(parse_prompt(text)) == expected
+
+
+WEIGHT_CASES = [
+    ("[tag]", 1 / EMPHASIS_STEP),
+    ("((x))", EMPHASIS_STEP ** 2),
+    ("[(a)]", 1.0),
+    ("(a:0.5)", 0.5),
+    ("((a:1.2))", 1.2 * EMPHASIS_STEP),
+]
+
+
+@pytest.mark.parametrize("text, weight", WEIGHT_CASES)
+def test_bracket_weights(text, weight):
+    (_source, node), = parse_prompt(text)
+    assert node.weight == pytest.approx(weight)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("a, (a), (a:1.1), b", [("a", "a", 1.0), ("b", "b", 1.0)]),
+    ("A, a, (a:1.1), b", [("A", "A", 1.0), ("a", "a", 1.0), ("b", "b", 1.0)]),
+    ("red  hair, (red hair), blue", [("red  hair", "red hair", 1.0), ("blue", "blue", 1.0)]),
+    ("(a, b:1.2), a, b", [("(a, b:1.2)", "a, b", 1.2), ("a", "a", 1.0), ("b", "b", 1.0)]),
+])
+def test_parse_terms_drops_repeats(text, expected):
+    assert [(source, key, pytest.approx(weight)) for source, key, weight in parse_terms(text)] == expected
+
+
+@pytest.mark.parametrize("syntax, expected", [
+    ("brackets", "((a)), [b], c"),
+    ("a1111", "(a:1.21), (b:0.91), c"),
+    ("plain", "a, b, c"),
+])
+def test_serialize_round_trip(syntax, expected):
+    nodes = [node for _source, node in parse_prompt("((a)), [b], c")]
+    assert serialize(nodes, syntax) == expected
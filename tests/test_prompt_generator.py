@@ -0,0 +1,130 @@
+import json
+import os
+import random
+
+import pytest
+
+from Factory_cache import RESULT_CACHE
+from Factory_export import default_inputs
+from Factory_prompt_generator import (TAG_DROPDOWNS, FactoryPromptsPositiveBatchNode, FactoryPromptsPositiveNode,
+                                      TagResolverTable)
+from Factory_tag_catalog import DEFAULT_TAGS_PATH, TagCatalog, get_catalog, install_catalog
+
+INPUTS = default_inputs(FactoryPromptsPositiveNode.INPUT_TYPES())
+INPUTS.pop("seed")
+
+INPUT_SETS = [
+    {},
+    {"source_style": "realistic", "character_count": "2girls", "clothing_style": "casual"},
+    {"clothing_style": "mixed", "character_emphasis": "high", "weight_syntax": "a1111"},
+    {"token_budget": 40, "custom_elements": "glowing runes, (starry sky:1.2)"},
+    {"token_budget": 150, "chunk_breaks": True, "character_count": "3girls"},
+]
+
+
+def single(seed, **inputs):
+    prompt, summary, spec = FactoryPromptsPositiveNode().generate_prompts(seed=seed, **dict(INPUTS, **inputs))
+    return prompt, summary, spec.render()
+
+
+@pytest.mark.parametrize("inputs", INPUT_SETS)
+@pytest.mark.parametrize("seed", [0, 1000, (1 << 64) - 3])
+def test_batch_prompt_i_equals_generate_prompts_with_seed_plus_i(inputs, seed):
+    prompts, summaries, specs = FactoryPromptsPositiveBatchNode().generate_batch(
+        seed=seed, batch_size=6, **dict(INPUTS, **inputs))
+    assert len(prompts) == len(summaries) == len(specs) == 6
+    for i in range(6):
+        assert (prompts[i], summaries[i], specs[i].render()) == single((seed + i) % (1 << 64), **inputs)
+
+
+@pytest.mark.parametrize("inputs", INPUT_SETS)
+def test_seed_zero_is_reproducible(inputs):
+    first = single(0, **inputs)
+    RESULT_CACHE.clear()
+    # Neither the result cache nor the global random module may influence a prompt
+    random.seed(12345)
+    assert single(0, **inputs) == first
+    random.seed(54321)
+    RESULT_CACHE.clear()
+    assert FactoryPromptsPositiveBatchNode().generate_batch(seed=0, batch_size=1, **dict(INPUTS, **inputs))[0] == [
+        first[0]]
+
+
+def test_seeds_give_different_prompts():
+    assert len({single(seed)[0] for seed in range(20)}) == 20
+
+
+def shipped_tags():
+    with open(DEFAULT_TAGS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def set_path(tags, path, value):
+    *parents, leaf = path
+    for key in parents:
+        tags = tags.setdefault(key, {})
+    tags[leaf] = value
+
+
+def complete_tags():
+    """The shipped tags with a tag at every path the node reads"""
+    tags = shipped_tags()
+    for name, paths in TAG_DROPDOWNS:
+        for path in paths:
+            if not TagCatalog(tags).category(path):
+                set_path(tags, path, [f"test_{name}"])
+    return tags
+
+
+def test_complete_catalog_reports_nothing(capsys):
+    assert TagResolverTable(TagCatalog(complete_tags())).missing == ()
+    assert capsys.readouterr().err == ""
+
+
+def test_missing_paths_are_reported_once(capsys):
+    tags = complete_tags()
+    del tags["character_features"]["expressions"]
+    tags["technical"]["weather"] = []
+    resolvers = TagCatalog(tags, "trimmed.json").derived("positive_tag_resolvers", TagResolverTable)
+    assert resolvers.missing == ("expression (character_features/expressions)", "weather (technical/weather)")
+    err = capsys.readouterr().err
+    assert err.startswith("Factory Prompts: 2 inputs have no tags in trimmed.json and are skipped when left on random")
+    assert err.count("expression (character_features/expressions)") == 1
+    assert err.count("weather (technical/weather)") == 1
+    assert capsys.readouterr().out == ""
+    resolvers["expression"], resolvers["weather"]
+    assert capsys.readouterr().err == ""
+
+
+def test_paths_a_pack_adds_to_are_not_reported(tmp_path, capsys):
+    tags = complete_tags()
+    del tags["character_features"]["expressions"]
+    del tags["technical"]["weather"]
+    path = str(tmp_path / "factory_tags.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(tags, f)
+    os.mkdir(tmp_path / "tag_packs")
+    with open(tmp_path / "tag_packs" / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump({"packs": [{"file": "weather.json", "owns": ["technical.weather"]}]}, f)
+    with open(tmp_path / "tag_packs" / "weather.json", "w", encoding="utf-8") as f:
+        json.dump({"technical": {"weather": ["rain"]}}, f)
+    capsys.readouterr()
+    assert TagResolverTable(get_catalog(path)).missing == ("expression (character_features/expressions)",)
+    assert "weather" not in capsys.readouterr().err
+
+
+def test_missing_inputs_left_on_random_are_skipped():
+    original = get_catalog()
+    tags = complete_tags()
+    del tags["character_features"]["expressions"]
+    install_catalog(TagCatalog(tags, DEFAULT_TAGS_PATH, "test-missing"))
+    try:
+        RESULT_CACHE.clear()
+        prompt, summary, spec = FactoryPromptsPositiveNode().generate_prompts(seed=7, **INPUTS)
+        selected = {name for name, *_selection in spec.selections()}
+        assert "expression" not in selected and "hair_color" in selected
+        assert "Expression:" not in summary
+        assert "random" not in prompt
+    finally:
+        install_catalog(original)
+        RESULT_CACHE.clear()
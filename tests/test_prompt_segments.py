@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from Factory_cache import RESULT_CACHE
+from Factory_export import default_inputs
+from Factory_prompt_generator import FactoryPromptsPositiveNode, PromptSegments, TagResolverTable
+from Factory_tag_catalog import DEFAULT_TAGS_PATH, TagCatalog, get_catalog, install_catalog
+
+INPUTS = default_inputs(FactoryPromptsPositiveNode.INPUT_TYPES())
+
+
+@pytest.fixture
+def segment_calls(monkeypatch):
+    """Input names whose segment was rendered instead of reused, in call order"""
+    calls = []
+    render = PromptSegments.segment
+
+    def counting(self, key, rng, choices, value, text, stream, syntax):
+        calls.append(stream)
+        return render(self, key, rng, choices, value, text, stream, syntax)
+
+    monkeypatch.setattr(PromptSegments, "segment", counting)
+    RESULT_CACHE.clear()
+    get_catalog().derived("positive_tag_resolvers", TagResolverTable).segments.clear()
+    return calls
+
+
+def generate(**inputs):
+    return FactoryPromptsPositiveNode().generate_prompts(**dict(INPUTS, **inputs))
+
+
+def cold(**inputs):
+    """The result with no segment to reuse"""
+    RESULT_CACHE.clear()
+    get_catalog().derived("positive_tag_resolvers", TagResolverTable).segments.clear()
+    result = generate(**inputs)
+    RESULT_CACHE.clear()
+    return result[:2]
+
+
+def test_requeue_with_one_widget_changed_renders_only_its_segments(segment_calls):
+    generate(seed=5)
+    random_steps = len(segment_calls)
+    assert random_steps > 10
+    segment_calls.clear()
+
+    result = generate(seed=5, pose_emphasis="high")
+    assert set(segment_calls) == {"pose", "character_1_action"}
+    assert result[:2] == cold(seed=5, pose_emphasis="high")
+
+
+@pytest.mark.parametrize("change", [{"seed": 6}, {"weight_syntax": "a1111", "character_emphasis": "high"}])
+def test_seed_or_syntax_changes_render_every_segment_again(segment_calls, change):
+    generate(seed=5, character_emphasis="high")
+    segment_calls.clear()
+    result = generate(**dict({"seed": 5, "character_emphasis": "high"}, **change))
+    if "seed" in change:
+        assert len(segment_calls) == sum(choices is not None for choices, *_step in result[2].plan)
+    else:
+        assert {"hair_color", "eye_color"} <= set(segment_calls)
+    assert result[:2] == cold(**dict({"seed": 5, "character_emphasis": "high"}, **change))
+
+
+def test_segment_for_a_different_tag_list_is_not_reused(segment_calls):
+    generate(seed=5)
+    segments = get_catalog().derived("positive_tag_resolvers", TagResolverTable).segments
+    key, (choices, index, part, line) = next((key, value) for key, value in segments.items() if key[1] == "pose")
+    # Same id, but the stored choices are another tuple: the segment is rendered again
+    segments[key] = (tuple(list(choices)), index, "stale_part", line)
+    RESULT_CACHE.clear()
+    segment_calls.clear()
+    assert "stale_part" not in generate(seed=5)[0]
+    assert segment_calls == ["pose"]
+
+
+def test_catalog_reload_starts_with_fresh_segments(segment_calls):
+    original = get_catalog()
+    generate(seed=5)
+    with open(DEFAULT_TAGS_PATH, encoding="utf-8") as f:
+        tags = json.load(f)
+    tags["character_features"]["hair_colors"] = ["zzz_hair"]
+    install_catalog(TagCatalog(tags, DEFAULT_TAGS_PATH, "test-reload"))
+    try:
+        RESULT_CACHE.clear()
+        segment_calls.clear()
+        prompt, summary, _spec = generate(seed=5)
+        assert "zzz_hair" in prompt
+        resolvers = get_catalog().derived("positive_tag_resolvers", TagResolverTable)
+        assert resolvers is not original.derived("positive_tag_resolvers", TagResolverTable)
+        assert len(segment_calls) == len(resolvers.segments)
+    finally:
+        install_catalog(original)
+        RESULT_CACHE.clear()
@@ -0,0 +1,82 @@
+import pytest
+
+from Factory_export import default_inputs, iter_unique_prompts
+from Factory_prompt_generator import TAG_DROPDOWNS, FactoryPromptsPositiveNode
+from Factory_prompt_space import KeyedPermutation, PromptSpace
+from Factory_tokens import TokenCounts
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1000, 4097])
+@pytest.mark.parametrize("key", [0, 1, 0xDEADBEEF])
+def test_permutation_is_a_bijection(size, key):
+    permutation = KeyedPermutation(size, key)
+    assert sorted(permutation[position] for position in range(size)) == list(range(size))
+
+
+def test_permutation_depends_on_key():
+    assert [KeyedPermutation(1000, 1)[i] for i in range(20)] != [KeyedPermutation(1000, 2)[i] for i in range(20)]
+
+
+def test_permutation_rejects_positions_outside_the_range():
+    with pytest.raises(IndexError):
+        KeyedPermutation(7)[7]
+
+
+def small_space_inputs(random_inputs=("hair_length", "chest_type")):
+    """Every dropdown set to its first tag except random_inputs, for a space small enough to enumerate"""
+    input_types = FactoryPromptsPositiveNode.INPUT_TYPES()
+    inputs = default_inputs(input_types)
+    for name, _paths in TAG_DROPDOWNS:
+        options = input_types["optional"][name][0]
+        if name not in random_inputs and len(options) > 1:
+            inputs[name] = options[1]
+    return inputs
+
+
+def test_sample_unique_exhausts_the_space_without_repeats():
+    space = PromptSpace(**small_space_inputs())
+    assert 1 < space.size < 5000
+    samples = list(space.sample_unique(key=3))
+    assert len(samples) == space.size
+    assert len({index for index, _prompt, _summary in samples}) == space.size
+    assert len({prompt for _index, prompt, _summary in samples}) == space.size
+
+
+def test_sample_unique_resumes_from_a_position():
+    space = PromptSpace(**small_space_inputs())
+    samples = list(space.sample_unique(count=40, key=9))
+    assert list(space.sample_unique(count=25, key=9, start=15)) == samples[15:]
+
+
+def test_decode_matches_digits():
+    space = PromptSpace(**small_space_inputs())
+    for index in (0, 1, space.size - 1):
+        assert space.index_of(space.digits(index)) == index
+
+
+
+@pytest.mark.parametrize("budget", [20, 40])
+def test_decoded_prompts_keep_the_token_budget(budget):
+    inputs = dict(default_inputs(FactoryPromptsPositiveNode.INPUT_TYPES()), token_budget=budget)
+    space = PromptSpace(**inputs)
+    unbudgeted = PromptSpace(**dict(inputs, token_budget=0))
+    counts = TokenCounts()
+    for index in range(0, space.size, space.size // 25):
+        prompt, summary = space.decode(index)
+        assert len(prompt.split(", ")) < len(unbudgeted.decode(index)[0].split(", "))
+        assert sum(counts[part] for part in prompt.split(", ")) + prompt.count(", ") <= budget
+        assert summary.split("\n")[-1].startswith("Token Budget: ")
+
+
+def test_specs_carry_the_budget_settings():
+    inputs = dict(default_inputs(FactoryPromptsPositiveNode.INPUT_TYPES()), token_budget=150, chunk_breaks=True)
+    spec = PromptSpace(**inputs).spec(42)
+    assert (spec.token_budget, spec.chunk_breaks) == (150, True)
+
+
+def test_unique_export_applies_the_token_budget():
+    rows = list(iter_unique_prompts(key=5, count=10, params={"token_budget": 40}))
+    counts = TokenCounts()
+    for _index, prompt, _negative, record in rows:
+        assert sum(counts[part] for part in prompt.split(", ")) + prompt.count(", ") <= 40
+        assert record["selections"][-1].startswith("Token Budget: ")
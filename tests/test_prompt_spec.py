@@ -0,0 +1,43 @@
+import pickle
+
+import pytest
+
+import Factory_prompt_spec
+from Factory_export import default_inputs
+from Factory_prompt_generator import FactoryPromptsPositiveNode
+from Factory_tag_catalog import get_catalog
+
+INPUTS = default_inputs(FactoryPromptsPositiveNode.INPUT_TYPES())
+
+
+def budget_spec(seed=3):
+    inputs = dict(INPUTS, seed=seed, token_budget=20)
+    return FactoryPromptsPositiveNode().generate_prompts(**inputs)[2]
+
+
+def test_spec_keeps_the_catalog_that_built_its_plan():
+    spec = budget_spec()
+    assert spec.catalog is get_catalog()
+    inputs = dict(INPUTS, token_budget=20)
+    inputs.pop("seed")
+    _prompts, _summaries, specs = FactoryPromptsPositiveNode().generate_for_seeds([1, 2], **inputs)
+    assert all(batch_spec.catalog is get_catalog() for batch_spec in specs)
+
+
+def test_budgeted_render_does_not_look_up_the_current_catalog(monkeypatch):
+    spec = budget_spec(seed=11)
+    expected = (spec.render(), spec.summary())
+    fresh = pickle.loads(pickle.dumps(spec))
+
+    def reloaded():
+        raise AssertionError("rendering must use the spec's own catalog snapshot")
+
+    monkeypatch.setattr(Factory_prompt_spec, "get_catalog", reloaded)
+    assert (fresh.render(), fresh.summary()) == expected
+
+
+@pytest.mark.parametrize("seed", [0, 5])
+def test_spec_without_catalog_uses_the_current_one(seed):
+    spec = budget_spec(seed)
+    detached = Factory_prompt_spec.PromptSpec(spec.plan, spec.picks, spec.token_budget, spec.chunk_breaks, spec.syntax)
+    assert detached.render() == spec.render()
@@ -0,0 +1,63 @@
+import pytest
+
+from Factory_random import AliasTable, PromptRandom
+from Factory_tag_catalog import TagCatalog
+
+WEIGHTS = [
+    [1],
+    [1, 1, 1, 1],
+    [5, 2, 1, 1, 1],
+    [0, 3, 0, 1],
+    [0.1, 10, 250, 3.3, 0.01, 7],
+]
+
+
+def exact_probabilities(table):
+    """Probability of each index over all 2**64 random values"""
+    n = len(table)
+    probabilities = [0.0] * n
+    for i, (threshold, alias) in enumerate(zip(table.thresholds, table.aliases)):
+        kept = threshold / (1 << 64)
+        probabilities[i] += kept / n
+        probabilities[alias] += (1 - kept) / n
+    return probabilities
+
+
+@pytest.mark.parametrize("weights", WEIGHTS)
+def test_alias_table_matches_the_weights_exactly(weights):
+    total = sum(weights)
+    assert exact_probabilities(AliasTable(weights)) == pytest.approx([w / total for w in weights], abs=1e-12)
+
+
+@pytest.mark.parametrize("weights", WEIGHTS[2:])
+def test_alias_draws_follow_the_weights(weights):
+    draws = 60000
+    table = AliasTable(weights)
+    rng = PromptRandom(7)
+    counts = [0] * len(weights)
+    for _ in range(draws):
+        counts[table.pick(rng.next64())] += 1
+    total = sum(weights)
+    for count, weight in zip(counts, weights):
+        expected = draws * weight / total
+        # Within five standard deviations of the binomial count
+        assert abs(count - expected) <= 5 * (expected * (1 - weight / total)) ** 0.5 + 1
+    assert all(count == 0 for count, weight in zip(counts, weights) if weight == 0)
+
+
+def test_alias_table_rejects_all_zero_weights():
+    with pytest.raises(ValueError):
+        AliasTable([0, 0])
+
+
+def test_weighted_category_draws():
+    catalog = TagCatalog({"poses": ["standing", "sitting", "kneeling"],
+                          "_weights": {"poses": {"standing": 8, "kneeling": 0}}})
+    poses = catalog.category(("poses",))
+    assert poses.weights == (8.0, 1.0, 0.0)
+    streams = [PromptRandom(seed) for seed in range(9000)]
+    indices = PromptRandom.first_indices(streams, "pose", len(poses), poses.alias)
+    # The batch column matches drawing each stream on its own
+    assert indices == [stream.first_index("pose", len(poses), poses.alias) for stream in streams]
+    assert indices.count(2) == 0
+    assert 7600 <= indices.count(0) <= 8400
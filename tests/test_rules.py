@@ -0,0 +1,93 @@
+import pytest
+
+from Factory_export import default_inputs
+from Factory_prompt_generator import FactoryPromptsPositiveNode
+from Factory_random import PromptRandom
+from Factory_rules import CompatibilityRules
+
+RULES = {
+    "slots_for": {
+        "count": {"one": [], "two": ["second"], "*": ["second", "third"]},
+        "style": {"school": ["uniform"], "casual": ["top", "bottom", "dress"]},
+    },
+    "one_of": [[["dress"], ["top", "bottom"]]],
+}
+SLOTS = ("second", "third", "uniform", "top", "bottom", "dress")
+
+
+def skipped(rules, inputs, seed=0):
+    disabled = rules.disabled_slots(inputs, PromptRandom(seed))
+    return {name for name in SLOTS if disabled & rules.slot_bit(name)}
+
+
+@pytest.mark.parametrize("count, expected", [
+    ("one", {"second", "third"}),
+    ("two", {"third"}),
+    ("five", set()),       # "*" lists every governed slot
+])
+def test_slots_for(count, expected):
+    rules = CompatibilityRules({"slots_for": {"count": RULES["slots_for"]["count"]}}, SLOTS)
+    assert skipped(rules, {"count": count}) == expected
+
+
+def test_slots_for_without_default_enables_everything_for_other_values():
+    rules = CompatibilityRules({"slots_for": {"style": RULES["slots_for"]["style"]}}, SLOTS)
+    assert skipped(rules, {"style": "school"}) == {"top", "bottom", "dress"}
+    assert skipped(rules, {"style": "fantasy"}) == set()
+
+
+def test_one_of_draws_exactly_one_alternative():
+    rules = CompatibilityRules(RULES, SLOTS)
+    outcomes = {frozenset(skipped(rules, {"count": "one", "style": "casual"}, seed)) for seed in range(50)}
+    assert outcomes == {frozenset({"second", "third", "uniform", "dress"}),
+                        frozenset({"second", "third", "uniform", "top", "bottom"})}
+
+
+@pytest.mark.parametrize("explicit, expected", [
+    ({"dress": "sundress"}, {"uniform", "top", "bottom"}),
+    ({"top": "t_shirt"}, {"uniform", "dress"}),
+    # Both alternatives hold an explicit value: both are kept
+    ({"bottom": "jeans", "dress": "sundress"}, {"uniform"}),
+])
+def test_one_of_keeps_the_alternative_with_an_explicit_value(explicit, expected):
+    rules = CompatibilityRules(RULES, SLOTS)
+    for seed in range(20):
+        assert skipped(rules, dict(explicit, count="five", style="casual"), seed) == expected
+    assert not rules.resolve(dict(explicit, count="five", style="casual"))[1]
+
+
+def test_invalid_rules_are_ignored(capsys):
+    rules = CompatibilityRules({"slots_for": {"count": ["second"]}, "one_of": [[["top"], [3]]]}, SLOTS)
+    assert not rules.slot_masks and not rules.groups
+    assert "Ignoring" in capsys.readouterr().err
+
+
+INPUTS = default_inputs(FactoryPromptsPositiveNode.INPUT_TYPES())
+CLOTHING = ("school_uniform_top", "school_uniform_bottom", "school_uniform_footwear", "casual_top", "casual_bottom",
+            "casual_dress", "formal_top", "formal_bottom", "formal_dress")
+
+
+def drawn(seed, **inputs):
+    spec = FactoryPromptsPositiveNode().generate_prompts(**dict(INPUTS, seed=seed, **inputs))[2]
+    return spec.tags()
+
+
+def test_node_draws_only_slots_the_rules_allow():
+    alternatives = set()
+    for seed in range(40):
+        tags = drawn(seed, clothing_style="casual", character_count="1girl")
+        clothing = frozenset(name for name in CLOTHING if name in tags)
+        assert clothing in ({"casual_top", "casual_bottom"}, {"casual_dress"})
+        assert "multi_char_position" not in tags and "character_2_action" not in tags
+        alternatives.add(clothing)
+    assert len(alternatives) == 2
+
+
+def test_explicit_value_overrides_a_rule():
+    for seed in range(10):
+        # slots_for would skip casual_dress for school uniforms, and one_of would pick one alternative
+        tags = drawn(seed, clothing_style="school", casual_dress="sundress", character_count="1girl",
+                     character_2_action="waving")
+        assert tags["casual_dress"] == "sundress"
+        assert tags["character_2_action"] == "waving"
+        assert not {"school_uniform_top", "school_uniform_bottom", "school_uniform_footwear"} & set(tags)
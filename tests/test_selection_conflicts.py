@@ -0,0 +1,115 @@
+import json
+
+import pytest
+
+from Factory_cache import RESULT_CACHE
+from Factory_export import default_inputs, iter_prompts, negative_builder
+from Factory_negative_generator import FactoryPromptsNegativeGenerator, PonyNegativeToggleNode
+from Factory_prompt_generator import FactoryPromptsPositiveNode
+from Factory_prompt_spec import PromptSpec
+from Factory_tag_catalog import DEFAULT_TAGS_PATH, TagCatalog, get_catalog, install_catalog
+
+INPUTS = default_inputs(FactoryPromptsPositiveNode.INPUT_TYPES())
+# Every category enabled, so any dropped term shows
+NEGATIVE = {"preset": "professional", "include_style_control": True, "include_nsfw_filters": True,
+            "include_violence_filters": True}
+
+
+def positive_spec(**inputs):
+    return FactoryPromptsPositiveNode().generate_prompts(**dict(INPUTS, seed=1, **inputs))[2]
+
+
+def fixed_spec(*tags):
+    """A spec selecting exactly tags"""
+    return PromptSpec([(None, tags, "Custom Elements", "custom_elements")], [None])
+
+
+def dropped(spec, **negative):
+    generator = FactoryPromptsNegativeGenerator()
+    settings = dict(NEGATIVE, **negative)
+    plain = generator.build_negative_prompt(**settings).split(", ")
+    aware = generator.build_negative_prompt(prompt_spec=spec, **settings).split(", ")
+    assert set(aware) <= set(plain)
+    return set(plain) - set(aware)
+
+
+@pytest.mark.parametrize("tags, terms", [
+    (("crop_top",), {"revealing_clothes", "exposed_skin"}),
+    (("hoodie",), {"oversized_clothes"}),
+    (("handstand", "jumping"), {"unnatural_pose", "floating"}),
+    (("crowd_scene",), {"busy_background", "cluttered_background"}),
+    (("crying", "furious"), {"sad_expression", "angry_expression"}),
+    (("neutral_expression",), {"blank_expression", "emotionless"}),
+    (("dim", "rim_lighting"), {"underexposed", "multiple_light_sources"}),
+    (("ombre_hair", "scarred_legs"), {"inconsistent_hair_color", "scar"}),
+    (("floating_island",), {"floating_objects", "floating"}),
+    (("messy_hair",), {"messy_hair"}),
+    (("standing", "blue_eyes", "park"), set()),
+])
+def test_selection_drops_exactly_the_terms_it_contradicts(tags, terms):
+    assert dropped(fixed_spec(*tags)) == terms
+
+
+@pytest.mark.parametrize("inputs, terms", [
+    ({"clothing_style": "casual", "casual_dress": "mini_dress"}, {"revealing_clothes", "exposed_skin"}),
+    ({"pose": "cartwheel"}, {"unnatural_pose"}),
+    ({"character_count": "crowd", "multi_char_position": "festival_crowd"},
+     {"busy_background", "cluttered_background"}),
+    ({"lighting": "harsh_light"}, {"overexposed"}),
+])
+def test_positive_selections_drop_their_terms(inputs, terms):
+    assert terms <= dropped(positive_spec(**inputs))
+
+
+def test_source_style_drops_the_style_controls_aimed_at_it():
+    realistic = dropped(positive_spec(source_style="realistic"), preset="minimal")
+    assert {"realistic", "photorealistic", "3d", "lifelike"} <= realistic
+    assert dropped(positive_spec(source_style="cartoon"), preset="minimal") >= {"source_cartoon", "cartoon"}
+
+
+def test_toggle_node_reports_the_dropped_terms():
+    node = PonyNegativeToggleNode()
+    prompt, summary = node.generate_negative_toggles(seed=0, clothing_control=True, nsfw_filters=True,
+                                                     prompt_spec=fixed_spec("tank_top"))
+    assert "revealing_clothes" not in prompt.split(", ") and "exposed_skin" not in prompt.split(", ")
+    assert "Selection-Aware (2 conflicting terms dropped)" in summary
+
+
+def test_without_selection_awareness_the_negative_is_unchanged():
+    spec = fixed_spec("crop_top", "handstand", "source_realistic")
+    settings = dict(NEGATIVE, strength_boost=True)
+    plain = FactoryPromptsNegativeGenerator().build_negative_prompt(**settings)
+    assert negative_builder(dict(settings, selection_aware=False))(spec) == plain
+    assert negative_builder(settings)(spec) == plain
+    assert negative_builder(dict(settings, selection_aware=True))(spec) != plain
+
+    rows = list(iter_prompts(0, 8, {"pose": "handstand"}, dict(NEGATIVE, selection_aware=False)))
+    assert {negative for _seed, _positive, negative, _record in rows} == {
+        FactoryPromptsNegativeGenerator().build_negative_prompt(**NEGATIVE)}
+
+
+def test_conflicts_come_from_the_catalog_of_the_spec():
+    original = get_catalog()
+    with open(DEFAULT_TAGS_PATH, encoding="utf-8") as f:
+        tags = json.load(f)
+    tags["_conflicts"] = {"tags": {"handstand": ["bad_feet"]},
+                          "categories": {"lighting": ["bad_lighting"]}}
+    install_catalog(TagCatalog(tags, DEFAULT_TAGS_PATH, "test-conflicts"))
+    try:
+        RESULT_CACHE.clear()
+        spec = positive_spec(pose="handstand", lighting="dim")
+    finally:
+        install_catalog(original)
+        RESULT_CACHE.clear()
+    # The spec keeps its catalog, so the shared one being replaced does not matter
+    assert dropped(spec) == {"bad_feet", "bad_lighting"}
+    assert dropped(fixed_spec("handstand", "dim")) == {"unnatural_pose", "underexposed"}
+
+
+def test_unknown_conflict_entries_are_reported(capsys):
+    catalog = TagCatalog({"lighting": ["dim"], "_conflicts": {
+        "tags": {"dim": ["underexposed", "not_a_term"]}, "categories": {"missing.category": ["noise"]}}})
+    spec = PromptSpec([(None, ("dim",), "Lighting: dim", "lighting")], [None], catalog=catalog)
+    assert dropped(spec) == {"underexposed"}
+    err = capsys.readouterr().err
+    assert "dim -> 'not_a_term'" in err and "'missing.category'" in err
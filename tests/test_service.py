@@ -0,0 +1,77 @@
+import asyncio
+import threading
+
+import pytest
+
+from Factory_service import GenerateRequest, PromptBatcher, PromptService
+
+
+@pytest.mark.parametrize("params", [
+    {"source_style": "anime", "hair_color": "blonde_hair", "include_artist": False},
+    {"token_budget": 150, "custom_elements": "glowing runes", "weight_syntax": "a1111"},
+])
+def test_valid_params(params):
+    request = GenerateRequest({"params": params, "count": 2})
+    for name, value in params.items():
+        assert request.params[name] == value
+
+
+@pytest.mark.parametrize("params", [
+    {"source_style": 5},
+    {"source_style": "oil_painting"},
+    {"hair_color": "not_a_hair_color"},
+    {"include_artist": "yes"},
+    {"token_budget": 751},
+    {"token_budget": True},
+    {"token_budget": 1.5},
+    {"custom_elements": 3},
+    {"no_such_input": "random"},
+    {"seed": 1},
+])
+def test_invalid_params(params):
+    with pytest.raises(ValueError):
+        GenerateRequest({"params": params})
+
+
+def test_request_counter_is_locked():
+    batcher = PromptBatcher()
+    threads = [threading.Thread(target=lambda: [batcher.count_request() for _ in range(1000)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert batcher.stats()["requests"] == 8000
+
+
+async def collect(service, body):
+    return "".join([text async for text in service.stream(service.prepare(body))])
+
+
+def test_concurrent_requests_share_one_batch():
+    bodies = [{"params": {"source_style": "realistic"}, "seed": seed, "count": 3} for seed in (0, 10, 20, 30)]
+    bodies.append({"params": {"source_style": "realistic"}, "seed": 0, "count": 3, "negative": None})
+
+    async def concurrent():
+        service = PromptService()
+        texts = await asyncio.gather(*(collect(service, body) for body in bodies))
+        return texts, service.batcher.stats()
+
+    texts, stats = asyncio.run(concurrent())
+    assert (stats["requests"], stats["jobs"], stats["batches"], stats["prompts"]) == (5, 5, 1, 15)
+    # Coalescing does not change what each request gets back
+    for body, text in zip(bodies, texts):
+        assert text == asyncio.run(collect(PromptService(), body))
+        assert len(text.splitlines()) == 3
+
+
+def test_requests_with_different_inputs_are_not_merged():
+    bodies = [{"params": {"source_style": style}, "count": 2} for style in ("anime", "realistic")]
+
+    async def concurrent():
+        service = PromptService()
+        texts = await asyncio.gather(*(collect(service, body) for body in bodies))
+        return texts, service.batcher.stats()
+
+    texts, stats = asyncio.run(concurrent())
+    assert stats["batches"] == 2
+    assert texts[0] != texts[1]
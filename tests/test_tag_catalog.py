@@ -0,0 +1,52 @@
+import json
+import os
+
+import pytest
+
+from Factory_tag_catalog import MappedTagCatalog, TagCatalog, compile_catalog, load_catalog
+
+TAGS = {"poses": ["standing", "sitting"], "lighting": ["soft_light", "rim_lighting"],
+        "_weights": {"poses": {"standing": 3}}, "_rules": {"one_of": []}}
+
+
+def write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+@pytest.fixture
+def tags_path(tmp_path):
+    path = str(tmp_path / "factory_tags.json")
+    write_json(path, TAGS)
+    return path
+
+
+def test_compiled_catalog_matches_the_json(tags_path):
+    compile_catalog(tags_path)
+    mapped = load_catalog(tags_path)
+    parsed = TagCatalog(TAGS)
+    assert isinstance(mapped, MappedTagCatalog)
+    for path in (("poses",), ("lighting",)):
+        assert mapped.category(path) == parsed.category(path)
+    assert mapped.category(("poses",)).weights == (3.0, 1.0)
+    assert mapped.section("_rules") == {"one_of": ()}
+
+
+def test_stale_compiled_catalog_is_ignored_even_when_newer(tags_path, capsys):
+    compiled = compile_catalog(tags_path)
+    write_json(tags_path, dict(TAGS, poses=["kneeling"]))
+    # e.g. a checkout or an archive extract that keeps the older timestamp of the JSON
+    stat = os.stat(compiled)
+    os.utime(tags_path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10 ** 9))
+    catalog = load_catalog(tags_path)
+    assert not isinstance(catalog, MappedTagCatalog)
+    assert catalog.category(("poses",)) == ("kneeling",)
+    assert "built from a different" in capsys.readouterr().err
+
+
+def test_compiled_catalog_without_the_json(tags_path):
+    compile_catalog(tags_path)
+    os.remove(tags_path)
+    catalog = load_catalog(tags_path)
+    assert isinstance(catalog, MappedTagCatalog)
+    assert catalog.category(("lighting",)) == ("soft_light", "rim_lighting")
@@ -0,0 +1,55 @@
+import json
+import os
+
+import pytest
+
+import Factory_tag_catalog
+from Factory_tag_catalog import PackedTagCatalog, get_catalog
+
+
+def write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+@pytest.fixture
+def tags_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(Factory_tag_catalog, "RELOAD_CHECK_INTERVAL", 0)
+    path = str(tmp_path / "factory_tags.json")
+    write_json(path, {"poses": ["standing"], "lighting": ["soft_lighting"]})
+    os.mkdir(tmp_path / "tag_packs")
+    write_json(tmp_path / "tag_packs" / "manifest.json", {"packs": [
+        {"file": "lighting.json", "owns": ["lighting"], "version": "1"},
+        {"file": "weather.json", "owns": ["technical.weather"]},
+    ]})
+    write_json(tmp_path / "tag_packs" / "lighting.json", {"lighting": ["soft_lighting", "rim_lighting"]})
+    write_json(tmp_path / "tag_packs" / "weather.json", {"technical": {"weather": ["rain"]}})
+    return path
+
+
+def test_packs_parse_on_first_use(tags_path):
+    catalog = get_catalog(tags_path)
+    assert isinstance(catalog, PackedTagCatalog)
+    lighting, weather = catalog.packs
+    assert catalog.core_category(("lighting",)) == ("soft_lighting",)
+    assert catalog.category(("poses",)) == ("standing",)
+    assert not lighting.parsed and not weather.parsed
+    assert catalog.category(("lighting",)) == ("soft_lighting", "rim_lighting")
+    assert lighting.parsed and not weather.parsed
+    assert catalog.owned_by_pack(("technical", "weather")) and not catalog.owned_by_pack(("poses",))
+
+
+def test_pack_version_follows_content(tags_path):
+    catalog = get_catalog(tags_path)
+    catalog.category(("lighting",))
+    pack_path = catalog.packs[0].path
+    stat = os.stat(pack_path)
+    os.utime(pack_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert get_catalog(tags_path) is catalog
+
+    write_json(pack_path, {"lighting": ["golden_hour"]})
+    os.utime(pack_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10 ** 9))
+    reloaded = get_catalog(tags_path)
+    assert reloaded.version != catalog.version
+    assert reloaded.packs[1] is catalog.packs[1]
+    assert reloaded.category(("lighting",)) == ("soft_lighting", "golden_hour")
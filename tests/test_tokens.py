@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from Factory_tokens import CHUNK_TOKENS, fit_parts, layout, strip_emphasis
+
+
+@pytest.mark.parametrize("part, text, weight", [
+    ("tag", "tag", 1.0),
+    ("(tag)", "tag", 1.1),
+    ("((tag))", "tag", 1.21),
+    ("[tag]", "tag", 1 / 1.1),
+    ("(tag:1.3)", "tag", 1.3),
+    ("(a, b)", "a, b", 1.1),
+    ("(a) (b)", "(a) (b)", 1.0),
+    ("(a), (b)", "(a), (b)", 1.0),
+    ("[a] [b]", "[a] [b]", 1.0),
+    ("[(a)]", "a", 1.0),
+    (r"\(a\)", r"\(a\)", 1.0),
+])
+def test_strip_emphasis(part, text, weight):
+    stripped, stripped_weight = strip_emphasis(part)
+    assert stripped == text
+    assert stripped_weight == pytest.approx(weight)
+
+
+class Costs(dict):
+    def __missing__(self, part):
+        return int(part.split(":")[1])
+
+
+def fewest_drops(costs, priorities, budget):
+    """Reference: the smallest number of drops, in drop order, whose layout fits budget chunks"""
+    drop_order = sorted((i for i, priority in enumerate(priorities) if priority is not None),
+                        key=lambda i: (priorities[i], -i))
+    for drop_count in range(len(drop_order) + 1):
+        dropped = set(drop_order[:drop_count])
+        if layout(costs, [i not in dropped for i in range(len(costs))], True)[1] <= budget // CHUNK_TOKENS:
+            return drop_count
+    return len(drop_order)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_removing_a_part_never_adds_a_chunk(seed):
+    # fit_parts binary searches the number of drops, which relies on this
+    rng = random.Random(seed)
+    count = rng.randint(2, 12)
+    costs = [rng.choice((rng.randint(1, 12), rng.randint(20, 74), rng.randint(60, 160))) for _ in range(count)]
+    keep = [rng.random() < 0.8 for _ in range(count)]
+    chunks = layout(costs, keep, True)[1]
+    for i in range(count):
+        if keep[i]:
+            assert layout(costs, keep[:i] + [False] + keep[i + 1:], True)[1] <= chunks
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_fit_parts_drops_the_fewest_parts_with_chunk_breaks(seed):
+    rng = random.Random(seed)
+    count = rng.randint(2, 12)
+    costs = [rng.choice((rng.randint(1, 12), rng.randint(20, 74), rng.randint(60, 160))) for _ in range(count)]
+    parts = [f"p{i}:{cost}" for i, cost in enumerate(costs)]
+    priorities = [None if rng.random() < 0.2 else rng.randint(0, 3) for _ in range(count)]
+    budget = CHUNK_TOKENS * rng.randint(1, 3)
+    _prompt, dropped, _tokens, chunks = fit_parts(parts, priorities, budget, True, Costs())
+    assert len(dropped) == fewest_drops(costs, priorities, budget)
+
+
+def test_fit_parts_within_budget():
+    counts = Costs()
+    parts = [f"p{i}:10" for i in range(10)]
+    prompt, dropped, tokens, _chunks = fit_parts(parts, [1] * 10, 50, False, counts)
+    assert tokens <= 50
+    assert dropped == [4, 5, 6, 7, 8, 9]
+    assert prompt == ", ".join(parts[:4])
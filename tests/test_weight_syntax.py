@@ -0,0 +1,62 @@
+import pytest
+
+from Factory_export import default_inputs
+from Factory_negative_generator import CRITICAL_TERMS, FactoryPromptsNegativeGenerator
+from Factory_prompt_ast import DEFAULT_SYNTAX, serialize
+from Factory_prompt_generator import FactoryPromptsPositiveNode
+from Factory_prompt_spec import apply_emphasis
+from Factory_tag_catalog import get_catalog, iter_categories
+
+LEVELS = ("low", "medium", "high", "very_high", "unknown")
+INPUTS = default_inputs(FactoryPromptsPositiveNode.INPUT_TYPES())
+EMPHASIS_INPUTS = ("character_emphasis", "pose_emphasis", "clothing_emphasis", "location_emphasis",
+                   "art_style_emphasis")
+
+
+def old_apply_emphasis(tag, emphasis_level):
+    """Emphasis as written before the prompt AST: low, high and very_high nest 1, 2 and 3 brackets"""
+    depth = {"low": 1, "high": 2, "very_high": 3}.get(emphasis_level)
+    if not tag or depth is None:
+        return tag
+    return "(" * depth + tag + ")" * depth
+
+
+def test_default_syntax_is_brackets():
+    assert DEFAULT_SYNTAX == "brackets"
+
+
+@pytest.mark.parametrize("level", LEVELS)
+def test_default_syntax_writes_every_catalog_tag_as_before(level):
+    tags = {tag for _path, category in iter_categories(get_catalog().tags) for tag in category}
+    assert len(tags) > 500
+    for tag in sorted(tags):
+        assert apply_emphasis(tag, level) == old_apply_emphasis(tag, level)
+
+
+def old_prompt(spec):
+    """The prompt as the generator joined it before the AST, rebuilt from the spec's selections"""
+    parts = []
+    for _category, tag, _index, level, _random in spec.selections():
+        parts.append(old_apply_emphasis(tag, level) if tag.count(", ") == 0 else tag)
+    return ", ".join(parts)
+
+
+@pytest.mark.parametrize("level", LEVELS[:4])
+@pytest.mark.parametrize("explicit", [{}, {"hair_color": "blonde_hair", "pose": "sitting", "casual_top": "hoodie"}])
+def test_default_syntax_positive_prompts_are_unchanged(level, explicit):
+    node = FactoryPromptsPositiveNode()
+    for seed in range(25):
+        inputs = dict(INPUTS, seed=seed, clothing_style="casual", custom_elements="glowing runes, (mist)",
+                      **dict.fromkeys(EMPHASIS_INPUTS, level), **explicit)
+        prompt, _summary, spec = node.generate_prompts(**inputs)
+        assert prompt == old_prompt(spec)
+        assert prompt == spec.render() == serialize(spec.ast(), DEFAULT_SYNTAX)
+        assert prompt == FactoryPromptsPositiveNode().generate_prompts(**dict(inputs, weight_syntax="brackets"))[0]
+
+
+def test_default_negative_syntax_boosts_as_before():
+    prompt = FactoryPromptsNegativeGenerator().build_negative_prompt("professional", strength_boost=True)
+    boosted = [term for term in prompt.split(", ") if term.startswith("(")]
+    assert boosted == [f"({term}:1.2)" for term in ("bad_anatomy", "bad_hands", "worst_quality", "low_quality",
+                                                    "bad_face")]
+    assert set(CRITICAL_TERMS) == {term[1:-5] for term in boosted}